@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Archivo de páginas descargadas del scraper de DoctorPet.co
+
+Normalmente el HTML de cada página se descarta después de parsearlo: si
+luego se corrige la extracción, hay que volver a descargar todo de
+doctorpet.co. Este módulo guarda cada página descargada (URL, fecha,
+headers y contenido) en un archivo comprimido al que solo se añaden
+datos, y permite "reproducir" un scraping leyendo de él en lugar de la red.
+
+Formato:
+- Datos: un archivo WARC comprimido (.warc.gz), el formato estándar de los
+  archivos web (lo usa, por ejemplo, Internet Archive). Cada página es un
+  bloque gzip independiente, así que se puede leer una sin descomprimir
+  las anteriores.
+- Índice: un SQLite al lado ('.idx.sqlite') con la posición y el tamaño de
+  cada bloque. Si se pierde, se reconstruye recorriendo el archivo.
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+# Explicación para desarrolladores junior:
+# - gzip: Comprime cada página. Varios bloques gzip seguidos forman un archivo
+#   gzip válido (se puede abrir con zcat o cualquier lector WARC).
+# - uuid: Cada registro WARC lleva un identificador único.
+
+import argparse
+import gzip
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+import zlib
+from datetime import datetime, timezone
+from http import HTTPStatus
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from cache import CachedPage
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONSTANTES DE CONFIGURACIÓN
+# ============================================================================
+
+# Ruta por defecto del archivo de páginas
+ARCHIVE_PATH = "doctorpet_archivo.warc.gz"
+
+# Extensión del índice (se añade a la ruta del archivo)
+INDEX_SUFFIX = ".idx.sqlite"
+
+# Nivel de compresión gzip (1 = más rápido ... 9 = más pequeño)
+# Chain of Thought: El HTML de WooCommerce se repite mucho y comprime muy bien
+# incluso con niveles bajos; el 6 (el de gzip por defecto) es un buen equilibrio.
+ARCHIVE_COMPRESSION_LEVEL = 6
+
+# Bytes que se leen de cada vez al reconstruir el índice
+READ_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# Headers que NO se guardan
+# Chain of Thought: requests ya descomprimió el contenido, así que guardamos
+# el cuerpo descomprimido y estos headers (que describen el original) serían falsos
+DROPPED_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length'}
+
+
+# ============================================================================
+# PÁGINA ARCHIVADA
+# ============================================================================
+
+class ArchivedPage(CachedPage):
+    """
+    Página leída del archivo
+
+    Attributes:
+        url, body, encoding, headers: Igual que CachedPage
+        fecha: Momento de la descarga (ISO, hora local)
+        status: Código HTTP de la respuesta
+    """
+
+    def __init__(self, url: str, body: bytes, encoding: Optional[str], headers: Dict[str, str],
+                 fecha: str, status: int = 200):
+        super().__init__(url, body, encoding, headers)
+        self.fecha = fecha
+        self.status = status
+
+    def to_response(self) -> requests.Response:
+        """Construye un requests.Response igual al de la descarga original"""
+        response = super().to_response()
+        response.status_code = self.status
+        response.from_archive = True
+        return response
+
+
+def _warc_record(url: str, body: bytes, encoding: Optional[str], headers,
+                 status: int, fetched_at: datetime) -> bytes:
+    """
+    Construye un registro WARC 'response' (headers WARC + respuesta HTTP)
+
+    Nota para junior: Un registro WARC es texto parecido a un mensaje HTTP:
+    unas líneas de cabecera, una línea vacía y el contenido. El contenido es
+    a su vez la respuesta HTTP completa (línea de estado, headers y cuerpo).
+    """
+    reason = HTTPStatus(status).phrase if status in HTTPStatus._value2member_map_ else ''
+    http_lines = [f"HTTP/1.1 {status} {reason}"]
+    http_lines += [f"{name}: {value}" for name, value in headers.items()
+                   if name.lower() not in DROPPED_HEADERS]
+    http_lines.append(f"Content-Length: {len(body)}")
+    block = ("\r\n".join(http_lines) + "\r\n\r\n").encode('utf-8') + body
+
+    warc_lines = [
+        "WARC/1.1",
+        "WARC-Type: response",
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>",
+        f"WARC-Date: {fetched_at.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}",
+        f"WARC-Target-URI: {url}",
+        # Chain of Thought: Guardamos la codificación que usó el scraper para
+        # que al reproducir el texto sea idéntico (no siempre está en los headers)
+        f"WARC-X-Encoding: {encoding or ''}",
+        "Content-Type: application/http; msgtype=response",
+        f"Content-Length: {len(block)}",
+    ]
+    return ("\r\n".join(warc_lines) + "\r\n\r\n").encode('utf-8') + block + b"\r\n\r\n"
+
+
+def _parse_headers(lines: List[bytes]) -> Dict[str, str]:
+    """Convierte líneas 'Nombre: valor' en un diccionario"""
+    headers = {}
+    for line in lines:
+        name, _, value = line.decode('utf-8', errors='replace').partition(':')
+        headers[name.strip()] = value.strip()
+    return headers
+
+
+def _parse_warc_record(record: bytes) -> ArchivedPage:
+    """Lee un registro WARC creado por _warc_record()"""
+    warc_head, _, rest = record.partition(b"\r\n\r\n")
+    warc_headers = _parse_headers(warc_head.split(b"\r\n")[1:])
+    block = rest[:int(warc_headers['Content-Length'])]
+    http_head, _, body = block.partition(b"\r\n\r\n")
+    status_line, *header_lines = http_head.split(b"\r\n")
+    headers = _parse_headers(header_lines)
+    headers.pop('Content-Length', None)
+
+    fetched_at = datetime.strptime(warc_headers['WARC-Date'], '%Y-%m-%dT%H:%M:%SZ')
+    fecha = fetched_at.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    return ArchivedPage(
+        url=warc_headers['WARC-Target-URI'],
+        body=body,
+        encoding=warc_headers.get('WARC-X-Encoding') or None,
+        headers=headers,
+        fecha=fecha.isoformat(timespec='seconds'),
+        status=int(status_line.split()[1]),
+    )
+
+
+def _iter_gzip_members(file) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Recorre los bloques gzip de un archivo, leyéndolo por partes
+
+    Yields:
+        (posición, tamaño comprimido, contenido) de cada bloque completo. Se
+        detiene en el primer bloque incompleto o dañado.
+    """
+    file.seek(0)
+    offset = 0      # posición en el archivo del inicio de 'buffer'
+    buffer = b''
+    while True:
+        if not buffer:
+            buffer = file.read(READ_CHUNK_SIZE)
+            if not buffer:
+                return
+        decompressor = zlib.decompressobj(wbits=31)  # 31 = formato gzip
+        start = offset
+        parts = []
+        while True:
+            try:
+                parts.append(decompressor.decompress(buffer))
+            except zlib.error:
+                return
+            if decompressor.eof:
+                offset += len(buffer) - len(decompressor.unused_data)
+                buffer = decompressor.unused_data
+                break
+            offset += len(buffer)
+            buffer = file.read(READ_CHUNK_SIZE)
+            if not buffer:
+                return
+        yield start, offset - start, b''.join(parts)
+
+
+# ============================================================================
+# ARCHIVO DE PÁGINAS
+# ============================================================================
+# Chain of Thought: ¿Por qué un bloque gzip por página y no un único gzip?
+# Un gzip normal solo se puede leer desde el principio. Con un bloque por
+# página, el índice guarda dónde empieza cada uno y leer una página es
+# saltar a su posición y descomprimir solo ese bloque.
+
+class PageArchive:
+    """
+    Archivo comprimido (solo se añade) de las páginas descargadas, con índice
+
+    Uso básico:
+        # Guardar todo lo que se descarga
+        archivo = PageArchive("doctorpet_archivo.warc.gz")
+        scraper = DoctorPetScraper(archive=archivo)
+
+        # Repetir el scraping SIN red, leyendo del archivo
+        scraper = DoctorPetScraper(replay=PageArchive("doctorpet_archivo.warc.gz"))
+
+        # Las páginas tal como estaban un día concreto
+        scraper = DoctorPetScraper(replay=PageArchive("...", as_of="2024-09-30"))
+
+    Nota para junior: Si una URL se descargó varias veces, se guardan todas
+    las versiones; get() devuelve la más reciente (o la de 'as_of').
+    """
+
+    def __init__(self, path: str = ARCHIVE_PATH, as_of: Optional[str] = None):
+        """
+        Args:
+            path: Archivo .warc.gz (se crea si no existe)
+            as_of: Al leer, usar la última versión descargada hasta esta
+                fecha (ISO, ej: '2024-09-30'). None = la más reciente.
+        """
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        # Chain of Thought: Una fecha sin hora ('2024-09-30') debe incluir
+        # todo ese día, así que la completamos con el final del día
+        self.as_of = as_of + 'T23:59:59' if as_of and 'T' not in as_of else as_of
+
+        # Chain of Thought: Un mismo archivo se usa desde varios hilos
+        # (BatchCrawler, modo 'predict'); el lock protege el archivo y el índice
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        needs_index = not os.path.exists(self.index_path) and os.path.getsize(path) > 0
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS paginas (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                fecha TEXT NOT NULL,
+                estado INTEGER NOT NULL,
+                posicion INTEGER NOT NULL,
+                tamano INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_paginas_url ON paginas (url, fecha);
+            CREATE INDEX IF NOT EXISTS idx_paginas_fecha ON paginas (fecha);
+        """)
+        self._conn.commit()
+        if needs_index:
+            logger.warning(f"⚠ Falta el índice de {path}, reconstruyéndolo...")
+            self.rebuild_index()
+
+    def store(self, url: str, body: bytes, encoding: Optional[str], headers,
+              status: int = 200, fetched_at: Optional[datetime] = None) -> None:
+        """
+        Añade una página descargada al archivo
+
+        Args:
+            url: URL de la página
+            body: Contenido de la respuesta (ya descomprimido)
+            encoding: Codificación del texto (la de response.encoding)
+            headers: Headers de la respuesta (cualquier objeto tipo diccionario)
+            status: Código HTTP
+            fetched_at: Momento de la descarga (por defecto, ahora)
+        """
+        fetched_at = fetched_at or datetime.now()
+        record = gzip.compress(_warc_record(url, body, encoding, headers, status, fetched_at),
+                               compresslevel=ARCHIVE_COMPRESSION_LEVEL)
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            position = self._file.tell()
+            self._file.write(record)
+            # Chain of Thought: Primero los datos en disco y después el índice:
+            # si el programa se corta entre medias, el índice nunca apunta a
+            # datos que no existen
+            self._file.flush()
+            self._conn.execute(
+                "INSERT INTO paginas (url, fecha, estado, posicion, tamano) VALUES (?, ?, ?, ?, ?)",
+                (url, fetched_at.isoformat(timespec='seconds'), status, position, len(record))
+            )
+            self._conn.commit()
+
+    def _read(self, position: int, size: int) -> ArchivedPage:
+        """Lee y descomprime el bloque de una página (con el lock adquirido)"""
+        self._file.seek(position)
+        return _parse_warc_record(gzip.decompress(self._file.read(size)))
+
+    def get(self, url: str, as_of: Optional[str] = None) -> Optional[ArchivedPage]:
+        """
+        Busca la última versión archivada de una URL
+
+        Args:
+            url: URL de la página
+            as_of: Fecha límite (por defecto la del constructor)
+
+        Returns:
+            ArchivedPage, o None si la URL no está en el archivo
+        """
+        as_of = as_of or self.as_of
+        query = "SELECT posicion, tamano FROM paginas WHERE url = ?"
+        params: list = [url]
+        if as_of:
+            query += " AND fecha <= ?"
+            params.append(as_of)
+        with self._lock:
+            row = self._conn.execute(query + " ORDER BY fecha DESC, id DESC LIMIT 1",
+                                     params).fetchone()
+            return self._read(*row) if row else None
+
+    def iter_pages(self, since: Optional[str] = None,
+                   until: Optional[str] = None) -> Iterator[ArchivedPage]:
+        """
+        Recorre las páginas archivadas en el orden en que se descargaron
+
+        Args:
+            since: Solo las descargadas desde esta fecha (ISO)
+            until: Solo las descargadas hasta esta fecha (ISO)
+
+        Chain of Thought: Leemos en el orden del archivo, así el disco lee
+        seguido (sin saltos), que es lo más rápido para reprocesar mucho.
+        """
+        query = "SELECT posicion, tamano FROM paginas WHERE 1 = 1"
+        params: list = []
+        if since:
+            query += " AND fecha >= ?"
+            params.append(since)
+        if until:
+            query += " AND fecha <= ?"
+            params.append(until + 'T23:59:59' if 'T' not in until else until)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY posicion", params).fetchall()
+        for position, size in rows:
+            with self._lock:
+                page = self._read(position, size)
+            yield page
+
+    def rebuild_index(self) -> int:
+        """
+        Vuelve a crear el índice recorriendo el archivo
+
+        Returns:
+            Número de páginas encontradas
+
+        Chain of Thought: Si el programa se cortó a mitad de escribir una
+        página, el último bloque está incompleto: lo ignoramos y avisamos.
+        """
+        with self._lock:
+            entries: List[Tuple] = []
+            end = 0
+            for position, size, record in _iter_gzip_members(self._file):
+                page = _parse_warc_record(record)
+                entries.append((page.url, page.fecha, page.status, position, size))
+                end = position + size
+            file_size = os.path.getsize(self.path)
+            if end < file_size:
+                logger.warning(f"⚠ {file_size - end} bytes incompletos al final de {self.path}")
+
+            self._conn.execute("DELETE FROM paginas")
+            self._conn.executemany(
+                "INSERT INTO paginas (url, fecha, estado, posicion, tamano) VALUES (?, ?, ?, ?, ?)",
+                entries
+            )
+            self._conn.commit()
+        return len(entries)
+
+    def stats(self) -> Dict:
+        """
+        Resumen del archivo
+
+        Returns:
+            {'paginas', 'urls', 'desde', 'hasta', 'bytes'}
+        """
+        with self._lock:
+            pages, urls, since, until = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT url), MIN(fecha), MAX(fecha) FROM paginas"
+            ).fetchone()
+        return {'paginas': pages, 'urls': urls, 'desde': since, 'hasta': until,
+                'bytes': os.path.getsize(self.path)}
+
+    def __len__(self) -> int:
+        """Número de páginas archivadas (contando cada versión)"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM paginas").fetchone()[0]
+
+    def close(self) -> None:
+        """Cierra el archivo y el índice"""
+        with self._lock:
+            self._file.close()
+            self._conn.close()
+
+    def __enter__(self) -> 'PageArchive':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Utilidades para el archivo de páginas
+
+    Ejemplos:
+        python archive.py info doctorpet_archivo.warc.gz
+        python archive.py reindexar doctorpet_archivo.warc.gz
+
+    Para volver a extraer los productos sin red: python scraper.py --replay ARCHIVO
+    """
+    parser = argparse.ArgumentParser(description="Archivo de páginas de DoctorPet.co")
+    commands = parser.add_subparsers(dest='command', required=True)
+    info = commands.add_parser('info', help="Resumen del archivo")
+    info.add_argument('archivo')
+    reindex = commands.add_parser('reindexar', help="Reconstruir el índice del archivo")
+    reindex.add_argument('archivo')
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.archivo):
+        parser.error(f"no existe el archivo {args.archivo}")
+
+    with PageArchive(args.archivo) as archive:
+        if args.command == 'info':
+            stats = archive.stats()
+            print(f"{stats['paginas']} páginas ({stats['urls']} URLs distintas), "
+                  f"{stats['bytes'] / 1024 / 1024:.1f} MiB")
+            print(f"Desde {stats['desde']} hasta {stats['hasta']}")
+        elif args.command == 'reindexar':
+            print(f"{archive.rebuild_index()} páginas indexadas")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main()
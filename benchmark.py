@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks del scraper de DoctorPet.co
+
+Mide el rendimiento de partes concretas del scraper para comprobar, con
+números, que una optimización realmente mejora algo.
+
+Uso:
+    python benchmark.py memoria            # memoria de Product vs dict
+    python benchmark.py memoria --dias 90 --productos 2000
+
+    # Scraping completo contra un servidor local con páginas sintéticas
+    python benchmark.py scraping
+    python benchmark.py scraping --paginas 40 --latencia 0.05 --errores 0.02
+    python benchmark.py scraping --escenarios bs4 lxml --json hoy.json --baseline ayer.json
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+# Explicación para desarrolladores junior:
+# - tracemalloc: Módulo estándar que cuenta la memoria que reserva Python.
+#   Más preciso que mirar el administrador de tareas, porque solo cuenta
+#   los objetos creados durante la medición.
+# - resource: Memoria máxima (RSS) que ha usado el proceso. Solo existe en
+#   Linux/macOS; en Windows ese dato no se muestra.
+# - multiprocessing: Cada escenario del benchmark se ejecuta en un proceso
+#   nuevo, para que la memoria de uno no se sume a la del siguiente.
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import multiprocessing
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+import scraper as scraper_module
+from scraper import (AsyncDoctorPetScraper, DoctorPetScraper, PARSE_WORKERS, ParserPool,
+                     Product, RateLimiter)
+
+
+# ============================================================================
+# MEMORIA DE LOS PRODUCTOS
+# ============================================================================
+
+def _fresh(text: str) -> str:
+    """
+    Devuelve una copia NUEVA de un texto
+
+    Chain of Thought: Los textos que salen del parseo de HTML son objetos
+    nuevos aunque su contenido se repita ('Disponible' en mil productos son
+    mil objetos). Para medir de forma realista, simulamos lo mismo.
+    """
+    return (text + '.')[:-1]
+
+
+def make_crawl_rows(products: int, day: int) -> List[Dict[str, str]]:
+    """
+    Genera los datos de un scraping simulado, como los produce el extractor
+
+    Args:
+        products: Productos del catálogo
+        day: Día del scraping (cambia algunos precios de un día a otro)
+    """
+    rows = []
+    for i in range(products):
+        on_sale = (i + day) % 7 == 0
+        rows.append({
+            'nombre': _fresh(f"Alimento Premium para Perro Adulto Raza Mediana {i} 15kg"),
+            'precio': _fresh(f"{40 + (i % 50)}.{'900' if on_sale else '000'}\xa0$"),
+            'precio_anterior': _fresh(f"{45 + (i % 50)}.000\xa0$" if on_sale else 'N/A'),
+            'disponibilidad': _fresh('Agotado' if (i + day) % 11 == 0 else 'Disponible'),
+            'enlace': _fresh(f"https://doctorpet.co/producto/alimento-premium-perro-{i}/"),
+            'imagen': _fresh(f"https://doctorpet.co/wp-content/uploads/2024/09/producto-{i}.jpg"),
+        })
+    return rows
+
+
+def measure_memory(build: Callable[[], list]) -> int:
+    """
+    Mide los bytes que ocupa lo que construye 'build' (y que sigue vivo al final)
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return used
+
+
+def benchmark_product_memory(products: int = 1000, days: int = 30) -> Dict[str, int]:
+    """
+    Compara la memoria de guardar 'days' scrapings como dicts y como Product
+
+    Returns:
+        {'dict': bytes, 'Product': bytes, 'Product (intern_all)': bytes}
+    """
+    def as_dicts() -> list:
+        return [row for day in range(days) for row in make_crawl_rows(products, day)]
+
+    def as_products() -> list:
+        # Chain of Thought: Convertimos cada scraping según se genera, igual
+        # que hace el extractor, para no tener los dicts y los Product a la vez
+        return [Product(**row) for day in range(days) for row in make_crawl_rows(products, day)]
+
+    def as_interned_products() -> list:
+        return [Product.from_dict(row, intern_all=True)
+                for day in range(days) for row in make_crawl_rows(products, day)]
+
+    return {
+        'dict': measure_memory(as_dicts),
+        'Product': measure_memory(as_products),
+        'Product (intern_all)': measure_memory(as_interned_products),
+    }
+
+
+def print_memory_report(products: int, days: int) -> None:
+    """Ejecuta benchmark_product_memory y muestra los resultados"""
+    total = products * days
+    results = benchmark_product_memory(products, days)
+    print(f"\n{days} scrapings x {products} productos = {total} registros en memoria\n")
+    for name, used in results.items():
+        reduction = 1 - used / results['dict']
+        print(f"  {name:<22} {used / 1024 / 1024:8.1f} MiB   {used / total:6.0f} bytes/producto"
+              f"   (-{reduction:.0%})")
+
+
+# ============================================================================
+# PÁGINAS SINTÉTICAS DE WOOCOMMERCE
+# ============================================================================
+# Chain of Thought: Medir contra doctorpet.co daría números que dependen de
+# la red y del servidor (y le cargaríamos de peticiones). Generamos páginas
+# con la misma estructura que WooCommerce y las servimos en local: así los
+# resultados se pueden repetir y comparar de un día a otro.
+
+# Estilos de paginación que se pueden generar
+# - 'pretty': /tienda/page/2/ (el de DoctorPet)
+# - 'query': /tienda/?paged=2
+# - 'next-only': sin números, solo el enlace "Siguiente" (el modo 'predict'
+#   no puede predecir y vuelve a seguir enlaces)
+PAGINATION_STYLES = ('pretty', 'query', 'next-only')
+
+# Menú, scripts y pie de página que rodean a los productos en una página real
+# Chain of Thought: Sin este "ruido" el parseo parecería mucho más barato de
+# lo que es: en DoctorPet la mayor parte del HTML NO son productos.
+_PAGE_HEADER = (
+    '<header><nav class="main-menu"><ul>'
+    + ''.join(f'<li class="menu-item"><a href="/categoria-{i}/">Categoría {i}</a></li>' for i in range(60))
+    + '</ul></nav></header>'
+    + '<script>' + 'var config = {"tracking": true, "items": [1, 2, 3]};' * 80 + '</script>'
+)
+_PAGE_FOOTER = (
+    '<footer>' + ''.join(f'<p class="widget">Texto del pie de página {i}</p>' for i in range(40))
+    + '</footer>'
+)
+
+
+def _page_path(category: str, number: int, pagination: str) -> str:
+    """Ruta de la página 'number' de la categoría según el estilo de paginación"""
+    if number == 1:
+        return category
+    if pagination == 'query':
+        return f"{category}?paged={number}"
+    return f"{category}page/{number}/"
+
+
+def _product_html(rng: random.Random, page: int, index: int, sale_ratio: float,
+                  out_of_stock_ratio: float) -> str:
+    """Un <li class="product"> con la estructura de WooCommerce"""
+    price = rng.randrange(5, 400) * 1000
+    if rng.random() < sale_ratio:
+        price_html = (f'<del><span class="woocommerce-Price-amount">{price * 1.2:,.0f}&nbsp;$</span></del>'
+                      f'<ins><span class="woocommerce-Price-amount">{price:,.0f}&nbsp;$</span></ins>')
+    else:
+        price_html = f'<span class="woocommerce-Price-amount">{price:,.0f}&nbsp;$</span>'
+    price_html = price_html.replace(',', '.')
+    if rng.random() < out_of_stock_ratio:
+        stock_html = '<span class="stock out-of-stock">Agotado</span>'
+    else:
+        stock_html = '<a href="#" class="button add_to_cart_button">Añadir al carrito</a>'
+    # Chain of Thought: Algunas imágenes usan carga diferida (data-src), como en la web real
+    image_attr = 'data-src' if index % 3 == 0 else 'src'
+    slug = f"producto-{page}-{index}"
+    return (
+        f'<li class="product type-product instock">'
+        f'<a href="/producto/{slug}/" class="woocommerce-LoopProduct-link">'
+        f'<img {image_attr}="/wp-content/uploads/{slug}.jpg" alt="{slug}"/>'
+        f'<h2 class="woocommerce-loop-product__title">Alimento Premium {page}-{index} 15kg</h2>'
+        f'<span class="price">{price_html}</span></a>{stock_html}</li>'
+    )
+
+
+def _pagination_html(category: str, number: int, pages: int, pagination: str) -> str:
+    """
+    La paginación de WooCommerce: 1 … 4 5 [6] 7 8 … 40 →
+    """
+    links = []
+    if pagination != 'next-only':
+        shown = sorted({1, pages, *range(max(1, number - 2), min(pages, number + 2) + 1)})
+        previous = 0
+        for n in shown:
+            if n - previous > 1:
+                links.append('<span class="page-numbers dots">…</span>')
+            if n == number:
+                links.append(f'<span aria-current="page" class="page-numbers current">{n}</span>')
+            else:
+                links.append(f'<a class="page-numbers" href="{_page_path(category, n, pagination)}">{n}</a>')
+            previous = n
+    if number < pages:
+        links.append(f'<a class="next page-numbers" href="{_page_path(category, number + 1, pagination)}">→</a>')
+    return f'<nav class="woocommerce-pagination">{"".join(links)}</nav>'
+
+
+def make_category_pages(pages: int = 10, products_per_page: int = 24, sale_ratio: float = 0.2,
+                        out_of_stock_ratio: float = 0.1, pagination: str = 'pretty',
+                        category: str = '/tienda/', seed: int = 0) -> Dict[str, str]:
+    """
+    Genera las páginas de una categoría de WooCommerce
+
+    Args:
+        pages: Número de páginas
+        products_per_page: Productos por página
+        sale_ratio: Proporción de productos en oferta (precio tachado)
+        out_of_stock_ratio: Proporción de productos agotados
+        pagination: Estilo de paginación (ver PAGINATION_STYLES)
+        category: Ruta de la categoría
+        seed: Semilla de los datos aleatorios (misma semilla = mismas páginas)
+
+    Returns:
+        Diccionario {ruta: html}
+    """
+    if pagination not in PAGINATION_STYLES:
+        raise ValueError(f"Paginación desconocida: {pagination!r}. Opciones: {PAGINATION_STYLES}")
+    result = {}
+    for number in range(1, pages + 1):
+        rng = random.Random(seed * 100003 + number)
+        products = ''.join(_product_html(rng, number, i, sale_ratio, out_of_stock_ratio)
+                           for i in range(products_per_page))
+        result[_page_path(category, number, pagination)] = (
+            f'<!DOCTYPE html><html><head><meta charset="UTF-8"><title>Tienda - Página {number}</title>'
+            f'</head><body>{_PAGE_HEADER}<main><ul class="products columns-4">{products}</ul>'
+            f'{_pagination_html(category, number, pages, pagination)}</main>{_PAGE_FOOTER}</body></html>'
+        )
+    return result
+
+
+# ============================================================================
+# SERVIDOR LOCAL DE PRUEBAS
+# ============================================================================
+
+class FixtureServer:
+    """
+    Servidor HTTP local que sirve páginas con latencia y errores simulados
+
+    Uso básico:
+        with FixtureServer(make_category_pages(20), latency=0.05, error_rate=0.02) as server:
+            scraper = DoctorPetScraper(server.url + '/tienda/')
+
+    Nota para junior: ThreadingHTTPServer atiende cada petición en un hilo,
+    así varias peticiones simultáneas esperan su latencia a la vez, como
+    en un servidor real.
+    """
+
+    def __init__(self, pages: Dict[str, str], latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        """
+        Args:
+            pages: Diccionario {ruta: html} (ver make_category_pages)
+            latency: Segundos que tarda cada respuesta
+            jitter: Variación aleatoria de la latencia (+/- segundos)
+            error_rate: Proporción de peticiones que responden 503
+            seed: Semilla de la latencia y los errores
+        """
+        self.pages = {path: html.encode('utf-8') for path, html in pages.items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.url = ''
+
+    def _plan_response(self) -> tuple:
+        """Decide (latencia, ¿error?) de una petición"""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+    def start(self) -> 'FixtureServer':
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                delay, failed = fixture._plan_response()
+                if delay:
+                    time.sleep(delay)
+                body = fixture.pages.get(self.path)
+                status = 503 if failed else (404 if body is None else 200)
+                self.send_response(status)
+                if status != 200:
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_header('Content-Type', 'text/html; charset=UTF-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Silenciar el log del servidor
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self) -> 'FixtureServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+
+# ============================================================================
+# ESCENARIOS DE SCRAPING
+# ============================================================================
+
+# Formas de scrapear que se comparan
+# Chain of Thought: Cada escenario cambia UNA cosa respecto a otro, para
+# saber a qué se debe cada diferencia (motor, parseo parcial, descubrimiento
+# de páginas, procesos, asíncrono)
+SCENARIOS: Dict[str, Dict] = {
+    'bs4': {'engine': 'bs4'},
+    'bs4-parcial': {'engine': 'bs4', 'partial_parse': True},
+    'lxml': {'engine': 'lxml'},
+    'lxml-predict': {'engine': 'lxml', 'discovery': 'predict'},
+    'bs4-predict-procesos': {'engine': 'bs4', 'discovery': 'predict', 'parse_workers': PARSE_WORKERS},
+    'async-lxml-predict': {'engine': 'lxml', 'discovery': 'predict', 'async': True},
+}
+
+# Velocidad del limitador durante el benchmark
+# Chain of Thought: Medimos el scraper, no la pausa de cortesía con la web
+# real; con este valor el RateLimiter nunca hace esperar
+BENCHMARK_RATE = 1_000_000
+
+
+class BenchmarkResult(NamedTuple):
+    """Resultado de un escenario"""
+    escenario: str
+    paginas: int
+    productos: int
+    segundos: float
+    paginas_s: float
+    productos_s: float
+    p50_ms: float
+    p99_ms: float
+    rss_mib: Optional[float]  # memoria máxima del proceso (None si no se puede medir)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Percentil de una lista (ej: fraction=0.99 -> p99)
+
+    Nota para junior: El p99 es el valor por debajo del cual queda el 99% de
+    las medidas: muestra las peticiones más lentas, que la media esconde.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def peak_rss_mib() -> Optional[float]:
+    """Memoria máxima (RSS) que ha usado este proceso, en MiB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Chain of Thought: Linux da el valor en KiB y macOS en bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _time_requests(scraper, latencies: List[float]) -> None:
+    """
+    Mide cuánto tarda cada descarga correcta del scraper (reintentos incluidos)
+
+    Chain of Thought: Reemplazamos el método en ESTE objeto (no en la clase),
+    así el resto del scraper no cambia y otros scrapers no se ven afectados
+    """
+    if isinstance(scraper, AsyncDoctorPetScraper):
+        fetch = scraper._fetch
+
+        async def timed_fetch(*args, **kwargs):
+            start = time.perf_counter()
+            result = await fetch(*args, **kwargs)
+            if result is not None:
+                latencies.append(time.perf_counter() - start)
+            return result
+
+        scraper._fetch = timed_fetch
+    else:
+        make_request = scraper._make_request
+
+        def timed_request(*args, **kwargs):
+            start = time.perf_counter()
+            result = make_request(*args, **kwargs)
+            if result is not None:
+                latencies.append(time.perf_counter() - start)
+            return result
+
+        scraper._make_request = timed_request
+
+
+def run_scenario(category_url: str, name: str, max_pages: Optional[int] = None) -> BenchmarkResult:
+    """
+    Scrapea una categoría con las opciones de un escenario y mide el resultado
+
+    Args:
+        category_url: URL de la categoría (normalmente en un FixtureServer)
+        name: Nombre del escenario (ver SCENARIOS)
+        max_pages: Número máximo de páginas (None = todas)
+    """
+    options = dict(SCENARIOS[name])
+    discovery = options.pop('discovery', 'links')
+    use_async = options.pop('async', False)
+    parse_workers = options.pop('parse_workers', 0)
+
+    parser_pool = ParserPool(parse_workers) if parse_workers else None
+    scraper_class = AsyncDoctorPetScraper if use_async else DoctorPetScraper
+    scraper = scraper_class(category_url, rate_limiter=RateLimiter(BENCHMARK_RATE, burst=1000),
+                            parser_pool=parser_pool, **options)
+    latencies: List[float] = []
+    _time_requests(scraper, latencies)
+    try:
+        start = time.perf_counter()
+        if use_async:
+            products = asyncio.run(scraper.scrape_category_async(max_pages, discovery))
+        else:
+            products = scraper.scrape_category(max_pages, discovery)
+        elapsed = time.perf_counter() - start
+    finally:
+        if parser_pool is not None:
+            parser_pool.close()
+
+    return BenchmarkResult(
+        escenario=name,
+        paginas=len(latencies),
+        productos=len(products),
+        segundos=round(elapsed, 3),
+        paginas_s=round(len(latencies) / elapsed, 1),
+        productos_s=round(len(products) / elapsed, 1),
+        p50_ms=round(percentile(latencies, 0.50) * 1000, 1),
+        p99_ms=round(percentile(latencies, 0.99) * 1000, 1),
+        rss_mib=None if peak_rss_mib() is None else round(peak_rss_mib(), 1),
+    )
+
+
+def _scenario_process(connection, category_url: str, name: str, max_pages: Optional[int],
+                      retry_delay: float) -> None:
+    """Ejecuta run_scenario en un proceso nuevo y envía el resultado por 'connection'"""
+    # Chain of Thought: Los errores simulados ya se cuentan en el servidor;
+    # sus mensajes solo taparían la tabla de resultados
+    logging.disable(logging.ERROR)
+    # Chain of Thought: Con errores simulados el scraper reintenta, y la pausa
+    # normal entre reintentos (segundos) ocultaría todo lo demás
+    scraper_module.DELAY_BETWEEN_REQUESTS = retry_delay
+    try:
+        connection.send(run_scenario(category_url, name, max_pages)._asdict())
+    except Exception as e:
+        connection.send({'error': repr(e)})
+    finally:
+        connection.close()
+
+
+def run_scenario_isolated(category_url: str, name: str, max_pages: Optional[int] = None,
+                          retry_delay: float = 0.05) -> BenchmarkResult:
+    """
+    Igual que run_scenario, pero en un proceso nuevo
+
+    Chain of Thought: La memoria máxima (RSS) de un proceso nunca baja. Si
+    todos los escenarios se ejecutaran en el mismo proceso, cada uno
+    heredaría el máximo del anterior. Con un proceso por escenario, cada
+    cifra es solo suya. (La memoria de los procesos de ParserPool no se suma.)
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_scenario_process,
+                              args=(sender, category_url, name, max_pages, retry_delay))
+    process.start()
+    sender.close()
+    result = receiver.recv()
+    process.join()
+    if 'error' in result:
+        raise RuntimeError(f"El escenario {name} falló: {result['error']}")
+    return BenchmarkResult(**result)
+
+
+def compare_with_baseline(results: List[BenchmarkResult], baseline: List[Dict],
+                          tolerance: float = 0.2) -> List[str]:
+    """
+    Busca regresiones respecto a una ejecución anterior (guardada con --json)
+
+    Args:
+        results: Resultados de ahora
+        baseline: Resultados anteriores
+        tolerance: Caída de productos/s que se acepta (0.2 = 20%)
+
+    Returns:
+        Lista de mensajes, uno por escenario que empeoró (vacía si ninguno)
+    """
+    previous = {row['escenario']: row for row in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result.escenario)
+        if before and result.productos_s < before['productos_s'] * (1 - tolerance):
+            regressions.append(f"{result.escenario}: {before['productos_s']} -> "
+                               f"{result.productos_s} productos/s")
+    return regressions
+
+
+def print_scraping_report(results: List[BenchmarkResult]) -> None:
+    """Muestra los resultados en una tabla"""
+    print(f"\n{'escenario':<22}{'páginas/s':>11}{'productos/s':>13}{'p50 ms':>9}{'p99 ms':>9}{'RSS MiB':>9}")
+    for r in results:
+        rss = '-' if r.rss_mib is None else f"{r.rss_mib:.0f}"
+        print(f"{r.escenario:<22}{r.paginas_s:>11.1f}{r.productos_s:>13.1f}"
+              f"{r.p50_ms:>9.1f}{r.p99_ms:>9.1f}{rss:>9}")
+
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks del scraper de DoctorPet.co")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    memory = commands.add_parser('memoria', help="Memoria de Product frente a dict")
+    memory.add_argument('--productos', type=int, default=1000, help="Productos por scraping")
+    memory.add_argument('--dias', type=int, default=30, help="Número de scrapings")
+
+    crawl = commands.add_parser('scraping', help="Scraping completo contra un servidor local")
+    crawl.add_argument('--escenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    crawl.add_argument('--paginas', type=int, default=20, help="Páginas de la categoría")
+    crawl.add_argument('--productos', type=int, default=24, help="Productos por página")
+    crawl.add_argument('--ofertas', type=float, default=0.2, help="Proporción de productos en oferta")
+    crawl.add_argument('--agotados', type=float, default=0.1, help="Proporción de productos agotados")
+    crawl.add_argument('--paginacion', choices=PAGINATION_STYLES, default='pretty')
+    crawl.add_argument('--latencia', type=float, default=0.0, help="Segundos por respuesta")
+    crawl.add_argument('--jitter', type=float, default=0.0, help="Variación de la latencia (segundos)")
+    crawl.add_argument('--errores', type=float, default=0.0, help="Proporción de respuestas 503")
+    crawl.add_argument('--json', metavar='ARCHIVO', help="Guardar los resultados en JSON")
+    crawl.add_argument('--baseline', metavar='ARCHIVO',
+                       help="Comparar con un JSON anterior; termina con error si algo va más lento")
+    crawl.add_argument('--tolerancia', type=float, default=0.2,
+                       help="Caída de productos/s aceptada frente al baseline (0.2 = 20%%)")
+
+    args = parser.parse_args(argv)
+    if args.command == 'memoria':
+        print_memory_report(args.productos, args.dias)
+    elif args.command == 'scraping':
+        pages = make_category_pages(args.paginas, args.productos, args.ofertas, args.agotados,
+                                    args.paginacion)
+        with FixtureServer(pages, args.latencia, args.jitter, args.errores) as server:
+            print(f"\n{args.paginas} páginas x {args.productos} productos, "
+                  f"latencia {args.latencia * 1000:.0f} ms, errores {args.errores:.0%}")
+            results = [run_scenario_isolated(server.url + '/tienda/', name)
+                       for name in args.escenarios]
+            print(f"({server.requests} peticiones, {server.errors} errores simulados)")
+        print_scraping_report(results)
+
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump([r._asdict() for r in results], f, indent=2, ensure_ascii=False)
+        if args.baseline:
+            with open(args.baseline, encoding='utf-8') as f:
+                regressions = compare_with_baseline(results, json.load(f), args.tolerancia)
+            for message in regressions:
+                print(f"✗ Regresión: {message}")
+            if regressions:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
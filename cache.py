@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cachés en disco para el scraper de DoctorPet.co
+
+Este módulo contiene:
+- HTTPCache: Guarda las respuestas HTTP y sus "validadores" (ETag y
+  Last-Modified) para hacer peticiones condicionales. Si la página no ha
+  cambiado, el servidor responde 304 (Not Modified) sin enviar el contenido.
+- ParsedPageCache: Guarda el RESULTADO de parsear una página, indexado por
+  la huella (hash) de su HTML. Si el HTML es idéntico, no hace falta parsear.
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+# Explicación para desarrolladores junior:
+# - sqlite3: Base de datos en un solo archivo, incluida en Python (no hay que instalar nada)
+# - threading: Para que la caché se pueda usar desde varios hilos a la vez
+# - json: Para guardar los headers de la respuesta como texto
+# - hashlib: Para calcular la "huella" (hash) del HTML de una página
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONSTANTES DE CONFIGURACIÓN
+# ============================================================================
+
+# Ruta por defecto del archivo de la caché HTTP
+HTTP_CACHE_PATH = "doctorpet_http_cache.sqlite"
+
+# Tamaño máximo de la caché HTTP (suma de los cuerpos de las respuestas)
+# Chain of Thought: Sin un límite, la caché crecería sin parar. Cuando se
+# supera, borramos las entradas usadas hace más tiempo (LRU).
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 200 MB
+
+# Headers de la respuesta que guardamos junto al contenido
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+# Ruta por defecto y tamaño máximo (en páginas) de la caché de páginas parseadas
+PAGE_CACHE_PATH = "doctorpet_page_cache.sqlite"
+PAGE_CACHE_MAX_ENTRIES = 10000
+
+# Versión de la extracción de productos
+# Chain of Thought: Si cambias cómo se extraen los productos, sube este número.
+# Forma parte de la huella de cada página, así que los resultados guardados
+# con la lógica antigua dejan de usarse automáticamente.
+EXTRACTION_VERSION = 2  # 2: se añadió 'precio_anterior'
+
+
+# ============================================================================
+# CACHÉ HTTP
+# ============================================================================
+# Chain of Thought: Cómo funciona una petición condicional:
+# 1. La primera vez, el servidor nos manda la página con un header ETag
+#    (una "huella" de la versión) y/o Last-Modified (fecha de modificación)
+# 2. La siguiente vez, enviamos esos valores en If-None-Match / If-Modified-Since
+# 3. Si la página no cambió, el servidor responde 304 sin cuerpo: ahorramos
+#    ancho de banda y carga en el servidor, y usamos la copia guardada
+
+class CachedPage:
+    """
+    Entrada de la caché HTTP
+
+    Attributes:
+        url: URL de la página
+        body: Contenido de la respuesta (bytes)
+        encoding: Codificación del texto (ej: 'utf-8')
+        headers: Headers guardados de la respuesta original
+    """
+
+    def __init__(self, url: str, body: bytes, encoding: Optional[str], headers: Dict[str, str]):
+        self.url = url
+        self.body = body
+        self.encoding = encoding
+        self.headers = headers
+
+    def validators(self) -> Dict[str, str]:
+        """
+        Devuelve los headers para hacer una petición condicional
+
+        Returns:
+            Diccionario con If-None-Match y/o If-Modified-Since
+        """
+        conditional = {}
+        if self.headers.get('ETag'):
+            conditional['If-None-Match'] = self.headers['ETag']
+        if self.headers.get('Last-Modified'):
+            conditional['If-Modified-Since'] = self.headers['Last-Modified']
+        return conditional
+
+    def to_response(self) -> requests.Response:
+        """
+        Construye un requests.Response con el contenido guardado
+
+        Chain of Thought: Devolvemos un Response "normal" para que el resto del
+        scraper no tenga que distinguir entre una respuesta de red y una de caché.
+        El atributo from_cache permite saberlo si hace falta.
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response._content = self.body
+        response.encoding = self.encoding
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.from_cache = True
+        return response
+
+
+class HTTPCache:
+    """
+    Caché HTTP persistente en SQLite con peticiones condicionales y expulsión LRU
+
+    Uso básico:
+        cache = HTTPCache("mi_cache.sqlite")
+        scraper = DoctorPetScraper(http_cache=cache)
+
+    Nota para junior: LRU = Least Recently Used (usado hace más tiempo).
+    Cuando la caché se llena, se borran primero las páginas que llevan más
+    tiempo sin consultarse.
+    """
+
+    def __init__(self, path: str = HTTP_CACHE_PATH, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        """
+        Args:
+            path: Archivo SQLite donde se guarda la caché
+            max_bytes: Tamaño máximo total de los cuerpos guardados
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+
+        # Chain of Thought: check_same_thread=False + un lock propio permite
+        # compartir la caché entre hilos de forma segura
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                encoding TEXT,
+                headers TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses (last_access)")
+        self._conn.commit()
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """
+        Busca una URL en la caché
+
+        Returns:
+            CachedPage si está guardada, None si no
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, encoding, headers FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        body, encoding, headers = row
+        return CachedPage(url, body, encoding, json.loads(headers))
+
+    def touch(self, url: str) -> None:
+        """Marca una entrada como usada ahora (para el orden LRU)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url)
+            )
+            self._conn.commit()
+
+    def store(self, url: str, body: bytes, encoding: Optional[str], headers) -> bool:
+        """
+        Guarda una respuesta si tiene validadores (ETag o Last-Modified)
+
+        Args:
+            url: URL de la página
+            body: Contenido de la respuesta
+            encoding: Codificación del texto
+            headers: Headers de la respuesta (cualquier objeto tipo diccionario)
+
+        Returns:
+            True si se guardó, False si no tenía validadores o es demasiado grande
+
+        Chain of Thought: Sin ETag ni Last-Modified no podemos hacer peticiones
+        condicionales, así que guardar la página no nos ahorraría nada.
+        """
+        saved_headers = {name: headers[name] for name in CACHED_HEADERS if headers.get(name)}
+        if 'ETag' not in saved_headers and 'Last-Modified' not in saved_headers:
+            return False
+        if len(body) > self.max_bytes:
+            return False
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (url, body, encoding, json.dumps(saved_headers), len(body), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+        return True
+
+    def _evict(self) -> None:
+        """
+        Borra las entradas usadas hace más tiempo hasta cumplir max_bytes
+
+        Nota para junior: Se llama con el lock ya adquirido (desde store()).
+        """
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        to_delete = []
+        for url, size in self._conn.execute("SELECT url, size FROM responses ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            to_delete.append((url,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE url = ?", to_delete)
+        logger.debug(f"Caché HTTP: {len(to_delete)} entradas expulsadas (LRU)")
+
+    def total_bytes(self) -> int:
+        """Tamaño total de los cuerpos guardados"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            self._conn.close()
+
+
+# ============================================================================
+# CACHÉ DE PÁGINAS PARSEADAS
+# ============================================================================
+# Chain of Thought: Aunque el HTML de una página sea idéntico al de la última
+# ejecución, parsearlo y extraer cada producto cuesta CPU. Si guardamos el
+# resultado indexado por la huella del HTML, la próxima vez basta con calcular
+# la huella (muy rápido) y leer el resultado guardado.
+#
+# Nota para junior: Un hash es como una "huella dactilar" del texto: si cambia
+# un solo carácter, la huella es completamente distinta.
+
+class ParsedPageCache:
+    """
+    Caché persistente (SQLite) de páginas ya parseadas, con expulsión LRU
+
+    Uso básico:
+        page_cache = ParsedPageCache("paginas.sqlite")
+        scraper = DoctorPetScraper(page_cache=page_cache)
+    """
+
+    def __init__(self, path: str = PAGE_CACHE_PATH, max_entries: int = PAGE_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            path: Archivo SQLite donde se guarda la caché
+            max_entries: Máximo de páginas guardadas
+        """
+        self.path = path
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS parsed_pages (
+                key TEXT PRIMARY KEY,
+                products TEXT NOT NULL,
+                next_url TEXT,
+                element_count INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_parsed_access ON parsed_pages (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(html: str, url: str) -> str:
+        """
+        Calcula la huella de una página
+
+        Chain of Thought: Incluimos la URL porque la siguiente página se resuelve
+        a partir de ella (enlaces relativos), y la versión de la extracción para
+        invalidar resultados antiguos. Usamos blake2b porque es más rápido que sha256.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{EXTRACTION_VERSION}\0{url}\0".encode('utf-8'))
+        digest.update(html.encode('utf-8', errors='surrogatepass'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[List[Dict[str, str]], Optional[str], int]]:
+        """
+        Busca una página por su huella
+
+        Returns:
+            (productos, siguiente_url, número_de_elementos) o None si no está
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT products, next_url, element_count FROM parsed_pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE parsed_pages SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+        products, next_url, element_count = row
+        return json.loads(products), next_url, element_count
+
+    def store(self, key: str, products: List[Mapping[str, str]], next_url: Optional[str],
+              element_count: int) -> None:
+        """
+        Guarda el resultado de parsear una página
+
+        Chain of Thought: Los productos pueden ser Product (scraper.py) o
+        diccionarios; dict(p) convierte ambos en algo que json sabe guardar
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parsed_pages VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps([dict(p) for p in products], ensure_ascii=False), next_url,
+                 element_count, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Borra las páginas usadas hace más tiempo si se supera max_entries"""
+        excess = self._conn.execute("SELECT COUNT(*) FROM parsed_pages").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM parsed_pages WHERE key IN "
+                "(SELECT key FROM parsed_pages ORDER BY last_access LIMIT ?)", (excess,)
+            )
+            logger.debug(f"Caché de páginas: {excess} entradas expulsadas (LRU)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM parsed_pages").fetchone()[0]
+
+    def close(self) -> None:
+        """Cierra la conexión con la base de datos"""
+        with self._lock:
+            self._conn.close()
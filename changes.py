@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Detección de cambios entre scrapings de DoctorPet.co
+
+Para vigilar precios y stock no hace falta el catálogo completo en cada
+ejecución: basta con saber QUÉ CAMBIÓ. Este módulo guarda el último estado
+conocido de cada producto (por su enlace) y compara cada scraping con él:
+- 'nuevo': el producto no estaba en el scraping anterior
+- 'modificado': cambió alguno de sus campos (precio, disponibilidad...)
+- 'eliminado': estaba antes y ya no aparece
+
+Cada cambio se guarda además en un registro histórico (tabla 'cambios').
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONSTANTES DE CONFIGURACIÓN
+# ============================================================================
+
+# Ruta por defecto de la base de datos con el último estado de cada producto
+STATE_DB_PATH = "doctorpet_estado.sqlite"
+
+# Campos que se comparan para decidir si un producto cambió
+TRACKED_FIELDS = ('nombre', 'precio', 'precio_anterior', 'disponibilidad', 'imagen')
+
+# Tipos de cambio
+ADDED = 'nuevo'
+CHANGED = 'modificado'
+REMOVED = 'eliminado'
+
+# Columnas que se añaden a los productos al guardar solo los cambios
+CHANGE_FIELDNAMES = ['cambio', 'campos_cambiados']
+
+# Cada cuántos productos se confirma (commit) el estado en disco
+STATE_COMMIT_EVERY = 500
+
+
+class ProductChange(NamedTuple):
+    """
+    Un cambio detectado en un producto
+
+    Attributes:
+        tipo: ADDED, CHANGED o REMOVED
+        enlace: URL del producto (su identificador)
+        producto: Datos actuales (para REMOVED, los últimos conocidos)
+        campos: {campo: (valor_anterior, valor_nuevo)} de los campos que cambiaron
+    """
+    tipo: str
+    enlace: str
+    producto: Dict[str, str]
+    campos: Dict[str, Tuple[Optional[str], Optional[str]]]
+
+
+def change_to_row(change: ProductChange) -> Dict[str, str]:
+    """
+    Convierte un cambio en una fila para save_products (CSV, SQLite...)
+
+    Ejemplo: {..., 'cambio': 'modificado', 'campos_cambiados': 'precio,disponibilidad'}
+    """
+    return {**change.producto, 'cambio': change.tipo, 'campos_cambiados': ','.join(change.campos)}
+
+
+# ============================================================================
+# ESTADO DE LOS PRODUCTOS
+# ============================================================================
+# Chain of Thought: Comparar dos CSV completos obliga a recorrer uno por cada
+# fila del otro (o a cargarlos enteros en memoria). Guardando el estado en
+# SQLite con 'enlace' como clave primaria, comprobar un producto es una sola
+# búsqueda en el índice, y el trabajo total crece con el número de productos
+# del scraping, no con el tamaño de los dos catálogos multiplicados.
+
+class ProductStateStore:
+    """
+    Último estado conocido de cada producto y registro de cambios
+
+    Uso básico:
+        store = ProductStateStore("estado.sqlite")
+        for cambio in store.diff(scraper.iter_products(), origin=scraper.base_url):
+            print(cambio.tipo, cambio.enlace, cambio.campos)
+
+    Nota para junior: La primera vez todos los productos salen como 'nuevo'
+    (no hay estado anterior con el que comparar).
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH):
+        """
+        Args:
+            path: Archivo SQLite donde se guarda el estado
+        """
+        self.path = path
+        # Chain of Thought: BatchCrawler compara varias categorías desde varios
+        # hilos a la vez; el lock evita que usen la conexión simultáneamente
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS productos (
+                enlace TEXT PRIMARY KEY,
+                origen TEXT NOT NULL,
+                datos TEXT NOT NULL,
+                scraping_id INTEGER NOT NULL,
+                visto_en TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_productos_origen
+                ON productos (origen, scraping_id);
+            CREATE TABLE IF NOT EXISTS scrapings (
+                id INTEGER PRIMARY KEY,
+                origen TEXT NOT NULL,
+                inicio TEXT NOT NULL,
+                terminado INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS cambios (
+                id INTEGER PRIMARY KEY,
+                fecha TEXT NOT NULL,
+                scraping_id INTEGER NOT NULL,
+                tipo TEXT NOT NULL,
+                enlace TEXT NOT NULL,
+                campos TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cambios_enlace ON cambios (enlace, fecha);
+        """)
+        self._conn.commit()
+
+    def _start_crawl(self, origin: str, resume: bool) -> int:
+        """
+        Devuelve el id del scraping: uno nuevo o, al reanudar, el último sin terminar
+
+        Chain of Thought: Al reanudar (--resume) los productos ya vistos antes
+        del corte quedaron marcados con el id del scraping interrumpido. Si
+        usáramos un id nuevo, al final parecerían "eliminados".
+        """
+        if resume:
+            row = self._conn.execute(
+                "SELECT id FROM scrapings WHERE origen = ? AND terminado = 0 ORDER BY id DESC LIMIT 1",
+                (origin,)
+            ).fetchone()
+            if row:
+                return row[0]
+        cursor = self._conn.execute(
+            "INSERT INTO scrapings (origen, inicio) VALUES (?, ?)",
+            (origin, datetime.now().isoformat(timespec='seconds'))
+        )
+        self._conn.commit()
+        return cursor.lastrowid
+
+    def _log(self, crawl_id: int, now: str, change: ProductChange) -> None:
+        self._conn.execute(
+            "INSERT INTO cambios (fecha, scraping_id, tipo, enlace, campos) VALUES (?, ?, ?, ?, ?)",
+            (now, crawl_id, change.tipo, change.enlace, json.dumps(change.campos, ensure_ascii=False))
+        )
+
+    def _compare(self, product: Dict[str, str], origin: str, crawl_id: int,
+                 now: str) -> Optional[ProductChange]:
+        """Compara un producto con su estado guardado y actualiza el estado"""
+        link = product['enlace']
+        current = {field: product.get(field) for field in TRACKED_FIELDS}
+        row = self._conn.execute("SELECT datos FROM productos WHERE enlace = ?", (link,)).fetchone()
+
+        change = None
+        if row is None:
+            change = ProductChange(ADDED, link, product, {})
+        else:
+            previous = json.loads(row[0])
+            changed = {
+                field: (previous.get(field), current[field])
+                for field in TRACKED_FIELDS if previous.get(field) != current[field]
+            }
+            if changed:
+                change = ProductChange(CHANGED, link, product, changed)
+
+        self._conn.execute(
+            "INSERT OR REPLACE INTO productos (enlace, origen, datos, scraping_id, visto_en) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (link, origin, json.dumps(current, ensure_ascii=False), crawl_id, now)
+        )
+        if change:
+            self._log(crawl_id, now, change)
+        return change
+
+    def _removed(self, origin: str, crawl_id: int, now: str) -> List[ProductChange]:
+        """Borra del estado (y devuelve) los productos del origen que no se vieron en este scraping"""
+        rows = self._conn.execute(
+            "SELECT enlace, datos FROM productos WHERE origen = ? AND scraping_id < ?",
+            (origin, crawl_id)
+        ).fetchall()
+        changes = []
+        for link, data in rows:
+            change = ProductChange(REMOVED, link, {**json.loads(data), 'enlace': link}, {})
+            self._log(crawl_id, now, change)
+            changes.append(change)
+        self._conn.execute("DELETE FROM productos WHERE origen = ? AND scraping_id < ?",
+                           (origin, crawl_id))
+        self._conn.execute("UPDATE scrapings SET terminado = 1 WHERE id = ?", (crawl_id,))
+        return changes
+
+    def diff(self, products: Iterable[Dict[str, str]], origin: str = '',
+             detect_removed: bool = True, resume: bool = False) -> Iterator[ProductChange]:
+        """
+        Compara un scraping con el estado guardado y entrega solo los cambios
+
+        Args:
+            products: Productos del scraping (acepta iter_products())
+            origin: Identificador del scraping (ej: la URL de la categoría).
+                Los 'eliminados' se buscan solo entre productos del mismo origen.
+            detect_removed: Buscar productos eliminados al terminar. Ponlo en
+                False si el scraping es parcial (ej: max_pages), o todos los
+                productos de las páginas no visitadas saldrían como eliminados.
+            resume: Continuar el último scraping sin terminar de este origen
+
+        Yields:
+            ProductChange de cada producto nuevo o modificado, según llegan, y
+            al final los eliminados
+
+        Chain of Thought: Es un generador, igual que iter_products(): cada
+        producto se compara en cuanto se extrae, sin esperar al final.
+        """
+        with self._lock:
+            crawl_id = self._start_crawl(origin, resume)
+        pending = 0
+        skipped = 0
+        try:
+            for product in products:
+                # Chain of Thought: Sin enlace no hay forma de saber si es el
+                # mismo producto que la vez anterior, así que no se compara
+                if product.get('enlace', 'N/A') == 'N/A':
+                    skipped += 1
+                    continue
+                now = datetime.now().isoformat(timespec='seconds')
+                with self._lock:
+                    change = self._compare(product, origin, crawl_id, now)
+                    pending += 1
+                    if pending >= STATE_COMMIT_EVERY:
+                        self._conn.commit()
+                        pending = 0
+                if change:
+                    yield change
+
+            if skipped:
+                logger.warning(f"⚠ {skipped} productos sin enlace no se compararon")
+            if detect_removed:
+                now = datetime.now().isoformat(timespec='seconds')
+                with self._lock:
+                    removed = self._removed(origin, crawl_id, now)
+                yield from removed
+        finally:
+            # Chain of Thought: Confirmamos lo procesado aunque el scraping se
+            # corte (Ctrl+C): el estado refleja todo lo que ya se comparó
+            with self._lock:
+                self._conn.commit()
+
+    def change_log(self, enlace: Optional[str] = None, since: Optional[str] = None) -> List[Dict]:
+        """
+        Consulta el registro de cambios
+
+        Args:
+            enlace: Solo los cambios de este producto
+            since: Solo los cambios desde esta fecha (ISO, ej: '2024-09-30')
+
+        Returns:
+            Lista de {'fecha', 'tipo', 'enlace', 'campos'}, del más antiguo al más reciente
+        """
+        query = "SELECT fecha, tipo, enlace, campos FROM cambios WHERE 1 = 1"
+        params: list = []
+        if enlace:
+            query += " AND enlace = ?"
+            params.append(enlace)
+        if since:
+            query += " AND fecha >= ?"
+            params.append(since)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [
+            {'fecha': fecha, 'tipo': tipo, 'enlace': link, 'campos': json.loads(campos)}
+            for fecha, tipo, link, campos in rows
+        ]
+
+    def __len__(self) -> int:
+        """Número de productos en el estado"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM productos").fetchone()[0]
+
+    def close(self) -> None:
+        """Cierra la base de datos"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Datos de la ficha de cada producto de DoctorPet.co
+
+Las páginas de listado solo muestran nombre, precio, disponibilidad, enlace
+e imagen. Este módulo visita la página de DETALLE de cada producto (su
+'enlace') y añade:
+- sku: referencia del producto
+- marca, peso y tamano: de la tabla de "Información adicional"
+- descripcion: descripción corta (o la larga si no hay corta)
+- stock: unidades disponibles, cuando la tienda las muestra
+
+extract_product_page() saca además de la ficha los campos del listado
+(nombre, precio, disponibilidad...), para cuando los productos se descubren
+sin pasar por el listado (ver sitemaps.py).
+
+WooCommerce incluye en cada ficha un bloque JSON-LD (<script
+type="application/ld+json">) con los datos del producto en formato
+schema.org; se usa primero, y el HTML visible solo para lo que falte.
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+# Explicación para desarrolladores junior:
+# - concurrent.futures: Pool de hilos. Descargar una ficha es casi todo
+#   esperar a la red, así que varios hilos solapan esas esperas.
+# - lxml: El mismo parser rápido que usa el motor engine='lxml' del scraper.
+
+import json
+import logging
+import re
+import sys
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+import lxml.html
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONSTANTES DE CONFIGURACIÓN
+# ============================================================================
+
+# Columnas que añaden los detalles (después de las del CSV)
+DETAIL_FIELDNAMES = ['sku', 'marca', 'peso', 'tamano', 'descripcion', 'stock']
+
+# Hilos que descargan fichas a la vez
+# Chain of Thought: Igual que en PAGE_WORKERS, más hilos NO significan más
+# peticiones por segundo: todas pasan por el RateLimiter del scraper. Los
+# hilos solo solapan las esperas de la red.
+DETAIL_WORKERS = 4
+
+# Campos del listado que extract_product_page() saca de la ficha
+# (los de CSV_FIELDNAMES del scraper, salvo 'enlace', que ya se conoce)
+PAGE_FIELDNAMES = ['nombre', 'precio', 'precio_anterior', 'disponibilidad', 'imagen']
+
+# Fichas pendientes por hilo en enrich() (para no adelantarse demasiado)
+DETAIL_PENDING_PER_WORKER = 4
+
+# Fichas ya descargadas que se recuerdan para no repetirlas (caché LRU)
+# Chain of Thought: Recordarlas TODAS haría crecer la memoria con el tamaño
+# del catálogo. Los repetidos suelen estar cerca (el mismo producto en
+# varias categorías que se recorren a la vez), así que basta con las últimas.
+DETAIL_CACHE_SIZE = 5000
+
+# Valor de los campos que no se encuentran (el mismo que usa el scraper)
+MISSING = sys.intern('N/A')
+
+# Clases de las filas de "Información adicional" para cada campo
+# Chain of Thought: WooCommerce marca cada fila con la clase
+# woocommerce-product-attributes-item--<atributo>. 'weight' y 'dimensions'
+# son los campos propios de WooCommerce; los 'attribute_pa_*' son atributos
+# creados por la tienda (probamos los nombres habituales en español).
+ATTRIBUTE_ROWS = {
+    'marca': ('attribute_pa_marca', 'attribute_pa_brand'),
+    'peso': ('weight', 'attribute_pa_peso', 'attribute_pa_presentacion'),
+    'tamano': ('dimensions', 'attribute_pa_tamano', 'attribute_pa_talla'),
+}
+
+# Primer número de un texto como "23 disponibles" o "Solo quedan 5 en stock"
+_STOCK_NUMBER = re.compile(r'(\d+)')
+
+
+def _has_class(class_name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+_XP_JSON_LD = etree.XPath("//script[@type='application/ld+json']/text()")
+_XP_SKU = etree.XPath(f"(//*[{_has_class('sku')}])[1]")
+_XP_STOCK = etree.XPath(f"(//*[{_has_class('stock')}])[1]")
+_XP_SHORT_DESCRIPTION = etree.XPath(
+    f"(//*[{_has_class('woocommerce-product-details__short-description')}])[1]")
+_XP_LONG_DESCRIPTION = etree.XPath("(//*[@id='tab-description'])[1]")
+_XP_ATTRIBUTE_ROW = etree.XPath(
+    "(//tr[contains(concat(' ', normalize-space(@class), ' '), $row)])[1]/td")
+_XP_TITLE = etree.XPath(f"(//h1[{_has_class('product_title')}])[1]")
+_XP_PRICE = etree.XPath(
+    f"(//*[{_has_class('summary')}]//*[{_has_class('price')}] | //p[{_has_class('price')}])[1]")
+_XP_AMOUNT = etree.XPath(f"(descendant::*[{_has_class('woocommerce-Price-amount')}])[1]")
+_XP_OG_IMAGE = etree.XPath("(//meta[@property='og:image']/@content)[1]")
+_XP_GALLERY_IMAGE = etree.XPath(f"(//*[{_has_class('woocommerce-product-gallery')}]//img)[1]")
+
+
+# ============================================================================
+# EXTRACCIÓN DE LA FICHA
+# ============================================================================
+
+def _clean(text: Optional[str]) -> str:
+    """Junta los espacios y saltos de línea (MISSING si no queda nada)"""
+    text = ' '.join((text or '').split())
+    return text or MISSING
+
+
+def _html_to_text(html: str) -> str:
+    """Texto de un fragmento HTML (la descripción del JSON-LD lo lleva)"""
+    try:
+        return lxml.html.fromstring(html).text_content()
+    except (etree.ParserError, ValueError):
+        return html
+
+
+def _iter_json_ld_products(root) -> Iterator[dict]:
+    """
+    Entrega los objetos schema.org de tipo Product de los bloques JSON-LD
+
+    Chain of Thought: El Product puede venir solo, dentro de una lista o
+    dentro de '@graph' (así lo ponen plugins de SEO como Yoast), así que
+    recorremos todo el JSON buscándolo.
+    """
+    for block in _XP_JSON_LD(root):
+        try:
+            data = json.loads(block)
+        except ValueError:
+            continue
+        pending = [data]
+        while pending:
+            item = pending.pop()
+            if isinstance(item, list):
+                pending.extend(item)
+            elif isinstance(item, dict):
+                types = item.get('@type')
+                if types == 'Product' or (isinstance(types, list) and 'Product' in types):
+                    yield item
+                elif '@graph' in item:
+                    pending.append(item['@graph'])
+
+
+def _json_ld_value(value) -> Optional[str]:
+    """Texto de un valor schema.org: "x", {"name": "x"} o {"value": 2, "unitCode": "KGM"}"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        if 'name' in value:
+            return str(value['name'])
+        if 'value' in value:
+            unit = value.get('unitText') or value.get('unitCode') or ''
+            return f"{value['value']} {unit}".strip()
+        return None
+    return None if value in (None, '') else str(value)
+
+
+def _json_ld_details(product: dict) -> Dict[str, str]:
+    """Campos de DETAIL_FIELDNAMES que se pueden sacar del JSON-LD"""
+    offers = product.get('offers')
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    inventory = _json_ld_value(offers.get('inventoryLevel')) if isinstance(offers, dict) else None
+    details = {
+        'sku': _json_ld_value(product.get('sku')),
+        'marca': _json_ld_value(product.get('brand')),
+        'peso': _json_ld_value(product.get('weight')),
+        'tamano': _json_ld_value(product.get('size')),
+        # Chain of Thought: WooCommerce pone HTML dentro de la descripción
+        'descripcion': _html_to_text(str(product.get('description') or '')),
+        'stock': inventory,
+    }
+    details = {field: _clean(value) for field, value in details.items()}
+    return {field: value for field, value in details.items() if value != MISSING}
+
+
+def _html_details(root) -> Dict[str, str]:
+    """Campos de DETAIL_FIELDNAMES que se pueden sacar del HTML visible"""
+    details = {}
+    sku = _XP_SKU(root)
+    if sku:
+        details['sku'] = _clean(sku[0].text_content())
+    for field, rows in ATTRIBUTE_ROWS.items():
+        for row in rows:
+            cells = _XP_ATTRIBUTE_ROW(root, row=f' woocommerce-product-attributes-item--{row} ')
+            if cells:
+                details[field] = _clean(cells[0].text_content())
+                break
+    description = _XP_SHORT_DESCRIPTION(root) or _XP_LONG_DESCRIPTION(root)
+    if description:
+        details['descripcion'] = _clean(description[0].text_content())
+    stock = _XP_STOCK(root)
+    if stock:
+        number = _STOCK_NUMBER.search(stock[0].text_content())
+        if number:
+            details['stock'] = number.group(1)
+    return {field: value for field, value in details.items() if value != MISSING}
+
+
+def _parse(html: str):
+    try:
+        return lxml.html.fromstring(html)
+    except ValueError:
+        # Chain of Thought: lxml no acepta str con declaración de encoding
+        return lxml.html.fromstring(html.encode('utf-8'))
+
+
+def extract_product_details(html: str) -> Dict[str, str]:
+    """
+    Extrae los campos de DETAIL_FIELDNAMES de la página de un producto
+
+    Returns:
+        Diccionario con TODOS los campos de DETAIL_FIELDNAMES (MISSING los
+        que no se encuentran)
+
+    Ejemplo:
+        extract_product_details(html)
+        -> {'sku': 'DP-123', 'marca': 'Chunky', 'peso': '2 kg', 'tamano': 'N/A',
+            'descripcion': 'Alimento para perros adultos...', 'stock': '23'}
+    """
+    details = dict.fromkeys(DETAIL_FIELDNAMES, MISSING)
+    if not html or not html.strip():
+        return details
+    return _details_from_root(_parse(html))
+
+
+def _details_from_root(root) -> Dict[str, str]:
+    details = dict.fromkeys(DETAIL_FIELDNAMES, MISSING)
+    # Chain of Thought: Primero el HTML y luego el JSON-LD encima: los datos
+    # estructurados son más fiables que el texto pensado para personas
+    details.update(_html_details(root))
+    for product in _iter_json_ld_products(root):
+        details.update(_json_ld_details(product))
+        break
+    return details
+
+
+def _joined_text(element) -> str:
+    """Texto sin espacios entre nodos (como get_text(strip=True) en el listado)"""
+    return ''.join(text.strip() for text in element.itertext()) or MISSING
+
+
+def _html_listing_fields(root) -> Dict[str, str]:
+    """Campos de PAGE_FIELDNAMES que se pueden sacar del HTML visible"""
+    fields = {}
+    title = _XP_TITLE(root)
+    if title:
+        fields['nombre'] = _clean(title[0].text_content())
+    price = _XP_PRICE(root)
+    if price:
+        # Chain of Thought: Mismo criterio que el listado: en una oferta el
+        # precio actual está en <ins> y el anterior en <del>
+        current, previous = price[0].find('.//ins'), price[0].find('.//del')
+        amount = _XP_AMOUNT(current if current is not None else price[0])
+        fields['precio'] = _joined_text(amount[0] if amount else price[0])
+        if previous is not None:
+            amount = _XP_AMOUNT(previous)
+            fields['precio_anterior'] = _joined_text(amount[0] if amount else previous)
+    stock = _XP_STOCK(root)
+    if stock:
+        classes = (stock[0].get('class') or '').split()
+        if 'out-of-stock' in classes:
+            fields['disponibilidad'] = 'Agotado'
+        elif 'in-stock' in classes:
+            fields['disponibilidad'] = 'Disponible'
+    image = _XP_OG_IMAGE(root)
+    if not image:
+        image = [img.get('src') or img.get('data-src') for img in _XP_GALLERY_IMAGE(root)]
+    if image and image[0]:
+        fields['imagen'] = str(image[0])
+    return fields
+
+
+def _json_ld_listing_fields(product: dict) -> Dict[str, str]:
+    """Campos de PAGE_FIELDNAMES que se pueden sacar del JSON-LD"""
+    fields = {'nombre': _clean(_json_ld_value(product.get('name')))}
+    offers = product.get('offers')
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    availability = str(offers.get('availability') or '') if isinstance(offers, dict) else ''
+    if availability.endswith('OutOfStock'):
+        fields['disponibilidad'] = 'Agotado'
+    elif availability.endswith('InStock'):
+        fields['disponibilidad'] = 'Disponible'
+    image = product.get('image')
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get('url')
+    if image:
+        fields['imagen'] = str(image)
+    return {field: value for field, value in fields.items() if value != MISSING}
+
+
+def extract_product_page(html: str) -> Dict[str, str]:
+    """
+    Extrae de la ficha de un producto los campos del listado Y los de detalle
+
+    Returns:
+        Diccionario con PAGE_FIELDNAMES + DETAIL_FIELDNAMES (MISSING los que
+        no se encuentran; 'nombre' es MISSING si la página no es un producto)
+
+    Chain of Thought: Los precios salen del HTML y no del JSON-LD: el JSON-LD
+    los da como número ("28000") y el listado como texto ("28.000$"). Con el
+    mismo formato, changes.py e history.py no ven cambios donde no los hay.
+    """
+    fields = dict.fromkeys(PAGE_FIELDNAMES, MISSING)
+    if not html or not html.strip():
+        return {**fields, **extract_product_details('')}
+    root = _parse(html)
+    fields.update(_html_listing_fields(root))
+    for product in _iter_json_ld_products(root):
+        # Chain of Thought: El nombre del JSON-LD solo se usa si no hay <h1>
+        json_ld = _json_ld_listing_fields(product)
+        if fields['nombre'] != MISSING:
+            json_ld.pop('nombre', None)
+        fields.update(json_ld)
+        break
+    return {**fields, **_details_from_root(root)}
+
+
+def merge_details(product: Mapping[str, str], details: Mapping[str, str]):
+    """
+    Devuelve el producto con los campos de detalle añadidos
+
+    Nota para junior: Los Product del scraper son inmutables, así que
+    replace() devuelve uno nuevo; a un diccionario normal se le añaden.
+    """
+    if hasattr(product, 'replace'):
+        return product.replace(**details)
+    return {**product, **details}
+
+
+# ============================================================================
+# DESCARGA CONCURRENTE DE FICHAS
+# ============================================================================
+# Chain of Thought: Con miles de productos, visitar las fichas una detrás de
+# otra lleva horas, casi todas esperando a la red. Un pool de hilos solapa
+# esas esperas (el RateLimiter sigue marcando la velocidad máxima), y cada
+# URL se descarga UNA sola vez aunque el producto aparezca en varias
+# categorías o varias veces en el mismo listado.
+
+FetchFunction = Callable[[str], Optional[str]]
+
+
+class DetailEnricher:
+    """
+    Añade a cada producto los datos de su ficha, descargándolas en paralelo
+
+    Uso básico:
+        with DetailEnricher(workers=4) as details:
+            for producto in details.enrich(scraper.iter_products(), scraper.fetch_html):
+                print(producto['sku'], producto['stock'])
+
+        # O página a página dentro del scraper (respeta el checkpoint):
+        scraper.iter_products(details=DetailEnricher())
+
+    Chain of Thought: La función que descarga ('fetch') se pasa en cada
+    llamada en lugar de en el constructor: así un mismo DetailEnricher (y su
+    registro de URLs ya descargadas) sirve para todas las categorías de
+    BatchCrawler, cada una descargando con su propio scraper.
+    """
+
+    def __init__(self, workers: int = DETAIL_WORKERS,
+                 extract: Callable[[str], Dict[str, str]] = extract_product_details,
+                 cache_size: int = DETAIL_CACHE_SIZE):
+        """
+        Args:
+            workers: Fichas que se descargan a la vez
+            extract: Qué se saca de cada ficha (extract_product_page para
+                tener también los campos del listado)
+            cache_size: Fichas ya descargadas que se recuerdan (las usadas
+                hace más tiempo se olvidan y se volverían a descargar)
+        """
+        if workers < 1:
+            raise ValueError("workers debe ser >= 1")
+        self.workers = workers
+        self.extract = extract
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='detalles')
+        # {enlace: Future con los detalles}, del usado hace más tiempo al más reciente
+        self._results: 'OrderedDict[str, Future]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fetch_details(self, url: str, fetch: FetchFunction) -> Dict[str, str]:
+        html = fetch(url)
+        if html is None:
+            logger.warning("⚠ No se pudo obtener la ficha de %s", url)
+        return self.extract(html or '')
+
+    def details(self, url: str, fetch: FetchFunction) -> Future:
+        """
+        Detalles de un producto (Future); cada URL se descarga una sola vez
+
+        Chain of Thought: El Future se guarda ANTES de que termine la
+        descarga: si otro hilo pide la misma URL mientras tanto, espera ese
+        mismo Future en lugar de descargarla otra vez.
+        """
+        with self._lock:
+            future = self._results.get(url)
+            if future is not None:
+                self._results.move_to_end(url)
+                return future
+            future = self._executor.submit(self._fetch_details, url, fetch)
+            self._results[url] = future
+            self._evict()
+            return future
+
+    def _evict(self) -> None:
+        """
+        Olvida las fichas usadas hace más tiempo si se supera cache_size
+
+        Nota para junior: Las descargas en curso no se olvidan nunca: otro
+        hilo podría estar esperando ese mismo Future.
+
+        Chain of Thought: Se recorre desde la más antigua y se para en cuanto
+        hay 'excess' terminadas: normalmente basta mirar la primera. Recorrer
+        toda la caché con el lock cogido frenaría a todos los hilos.
+        """
+        excess = len(self._results) - self.cache_size
+        if excess <= 0:
+            return
+        done = (url for url, future in self._results.items() if future.done())
+        for url in list(islice(done, excess)):
+            del self._results[url]
+
+    def _submit(self, product: Mapping[str, str], fetch: FetchFunction) -> Optional[Future]:
+        url = product.get('enlace', MISSING)
+        return None if url == MISSING else self.details(url, fetch)
+
+    def _merge(self, product: Mapping[str, str], future: Optional[Future]):
+        if future is None:
+            return merge_details(product, dict.fromkeys(DETAIL_FIELDNAMES, MISSING))
+        return merge_details(product, future.result())
+
+    def enrich_page(self, products: Sequence[Mapping[str, str]], fetch: FetchFunction) -> List:
+        """
+        Añade los detalles a una lista de productos (ej: los de una página)
+
+        Todas sus fichas se descargan a la vez y los productos se devuelven
+        en el mismo orden.
+        """
+        futures = [self._submit(product, fetch) for product in products]
+        return [self._merge(product, future) for product, future in zip(products, futures)]
+
+    def enrich(self, products: Iterable[Mapping[str, str]], fetch: FetchFunction) -> Iterator:
+        """
+        Etapa de detalles para un flujo de productos (ej: iter_products())
+
+        Yields:
+            Cada producto con los campos de DETAIL_FIELDNAMES, en el mismo orden
+
+        Chain of Thought: Va descargando fichas por delante de lo que se
+        entrega, pero como mucho workers * DETAIL_PENDING_PER_WORKER: si quien
+        consume es lento, no acumulamos miles de fichas en memoria.
+        """
+        max_pending = self.workers * DETAIL_PENDING_PER_WORKER
+        pending: deque = deque()
+        for product in products:
+            pending.append((product, self._submit(product, fetch)))
+            if len(pending) >= max_pending:
+                yield self._merge(*pending.popleft())
+        while pending:
+            yield self._merge(*pending.popleft())
+
+    def __len__(self) -> int:
+        """Número de fichas recordadas (como mucho cache_size, más las que se descargan)"""
+        with self._lock:
+            return len(self._results)
+
+    def close(self) -> None:
+        """Termina los hilos (espera a las descargas en curso)"""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> 'DetailEnricher':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
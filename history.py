@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Histórico de precios de DoctorPet.co
+
+Cada scraping genera un CSV nuevo, así que saber "cómo cambió el precio de
+este producto en los últimos 90 días" obligaba a abrir cientos de archivos.
+Este módulo guarda todas las observaciones en UNA base de datos SQLite:
+- Tabla 'productos' (dimensión): un registro por producto, con su enlace
+- Tabla 'observaciones' (hechos): (producto, fecha, precio, stock), compacta
+  y ordenada por producto y fecha para que las consultas por rango sean rápidas
+
+Uso desde la línea de comandos:
+    python history.py importar doctorpet_alimentos_*.csv
+    python history.py serie https://doctorpet.co/producto/... --dias 90
+    python history.py dia 2024-09-30
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+
+import argparse
+import csv
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from prices import parse_price_array
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONSTANTES DE CONFIGURACIÓN
+# ============================================================================
+
+# Ruta por defecto de la base de datos del histórico
+HISTORY_DB_PATH = "doctorpet_historico.sqlite"
+
+# Productos que se guardan juntos (una transacción por lote)
+HISTORY_BATCH_SIZE = 500
+
+# Chain of Thought: SQLite admite como mucho 999 parámetros "?" por consulta
+# en versiones antiguas; buscamos los ids de los enlaces en trozos más pequeños
+_SQL_CHUNK = 500
+
+# Fecha y hora en el nombre de los CSV del scraper (doctorpet_alimentos_20240930_143025.csv)
+_CSV_TIMESTAMP = re.compile(r'(\d{8}_\d{6})')
+
+
+class Observation(NamedTuple):
+    """Una observación de un producto en un momento dado"""
+    fecha: str                        # ISO, ej: '2024-09-30T14:30:25'
+    precio: Optional[float]
+    precio_anterior: Optional[float]
+    disponible: Optional[bool]        # None si no se sabe
+
+
+def _stock_code(disponibilidad: Optional[str]) -> Optional[int]:
+    """
+    Convierte el texto de disponibilidad en 1 (hay stock), 0 (agotado) o None
+
+    Chain of Thought: Guardar un entero en lugar del texto hace la tabla de
+    observaciones mucho más pequeña (se repite en cada scraping)
+    """
+    if not disponibilidad or disponibilidad == 'N/A':
+        return None
+    text = disponibilidad.lower()
+    return 0 if 'agotado' in text or 'out of stock' in text else 1
+
+
+def _nan_to_none(value: float) -> Optional[float]:
+    return None if value != value else value  # NaN es el único valor distinto de sí mismo
+
+
+# ============================================================================
+# HISTÓRICO
+# ============================================================================
+
+class PriceHistory:
+    """
+    Histórico de precios y stock en SQLite (solo se añaden datos, nunca se borran)
+
+    Uso básico:
+        historico = PriceHistory()
+        historico.record(scraper.scrape_category())
+        historico.series("https://doctorpet.co/producto/...", since="2024-07-01")
+    """
+
+    def __init__(self, path: str = HISTORY_DB_PATH):
+        """
+        Args:
+            path: Archivo SQLite del histórico
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Chain of Thought: Con WAL (write-ahead log) y synchronous=NORMAL cada
+        # commit no espera a que el disco confirme dos escrituras; guardar un
+        # scraping completo pasa a ser unas pocas escrituras seguidas. Las
+        # consultas pueden leer mientras otro proceso escribe.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Chain of Thought: La clave primaria (producto_id, ts) de una tabla
+        # WITHOUT ROWID hace que SQLite guarde las filas ORDENADAS por producto
+        # y fecha: la serie de un producto es una lectura seguida del disco.
+        # El índice por ts sirve para las "fotos" de un día concreto.
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS productos (
+                id INTEGER PRIMARY KEY,
+                enlace TEXT NOT NULL UNIQUE,
+                nombre TEXT,
+                imagen TEXT,
+                primera_vez INTEGER NOT NULL,
+                ultima_vez INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS observaciones (
+                producto_id INTEGER NOT NULL REFERENCES productos (id),
+                ts INTEGER NOT NULL,
+                precio REAL,
+                precio_anterior REAL,
+                disponible INTEGER,
+                PRIMARY KEY (producto_id, ts)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_observaciones_ts ON observaciones (ts);
+        """)
+        self._conn.commit()
+
+    # ------------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------------
+
+    def record(self, products: Iterable[Dict[str, str]],
+               observed_at: Optional[datetime] = None) -> int:
+        """
+        Guarda una observación de cada producto
+
+        Args:
+            products: Productos de un scraping (ej: scrape_category() o iter_products())
+            observed_at: Momento del scraping (por defecto, ahora). Todos los
+                productos de la llamada comparten la misma fecha.
+
+        Returns:
+            Número de observaciones guardadas
+        """
+        timestamp = int((observed_at or datetime.now()).timestamp())
+        products = iter(products)
+        total = 0
+        while True:
+            batch = list(islice(products, HISTORY_BATCH_SIZE))
+            if not batch:
+                return total
+            total += self._record_batch(batch, timestamp)
+
+    def iter_record(self, products: Iterable[Dict[str, str]],
+                    observed_at: Optional[datetime] = None) -> Iterator[Dict[str, str]]:
+        """
+        Deja pasar los productos sin cambiarlos y los va guardando en el histórico
+
+        Uso básico (guardar el CSV y el histórico a la vez):
+            scraper.save_to_csv(historico.iter_record(scraper.iter_products()))
+        """
+        timestamp = int((observed_at or datetime.now()).timestamp())
+        batch: List[Dict[str, str]] = []
+        try:
+            for product in products:
+                batch.append(product)
+                if len(batch) >= HISTORY_BATCH_SIZE:
+                    self._record_batch(batch, timestamp)
+                    batch = []
+                yield product
+        finally:
+            # Chain of Thought: Aunque el scraping se corte, guardamos lo ya visto
+            if batch:
+                self._record_batch(batch, timestamp)
+
+    def _record_batch(self, batch: List[Dict[str, str]], timestamp: int) -> int:
+        """Guarda un lote: actualiza la dimensión de productos y añade las observaciones"""
+        batch = [p for p in batch if p.get('enlace', 'N/A') != 'N/A']
+        if not batch:
+            return 0
+        # Chain of Thought: Convertimos todos los precios del lote de una vez (NumPy)
+        prices = parse_price_array([p.get('precio') or '' for p in batch]).tolist()
+        previous = parse_price_array([p.get('precio_anterior') or '' for p in batch]).tolist()
+
+        with self._lock:
+            self._conn.executemany("""
+                INSERT INTO productos (enlace, nombre, imagen, primera_vez, ultima_vez)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (enlace) DO UPDATE SET
+                    nombre = excluded.nombre,
+                    imagen = excluded.imagen,
+                    ultima_vez = MAX(ultima_vez, excluded.ultima_vez)
+            """, [(p['enlace'], p.get('nombre'), p.get('imagen'), timestamp, timestamp) for p in batch])
+
+            ids = self._product_ids([p['enlace'] for p in batch])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO observaciones VALUES (?, ?, ?, ?, ?)",
+                [(ids[p['enlace']], timestamp, _nan_to_none(price), _nan_to_none(old),
+                  _stock_code(p.get('disponibilidad')))
+                 for p, price, old in zip(batch, prices, previous)]
+            )
+            self._conn.commit()
+        return len(batch)
+
+    def _product_ids(self, links: List[str]) -> Dict[str, int]:
+        """Busca los ids de varios enlaces con pocas consultas (IN (...))"""
+        ids = {}
+        unique = list(dict.fromkeys(links))
+        for start in range(0, len(unique), _SQL_CHUNK):
+            chunk = unique[start:start + _SQL_CHUNK]
+            placeholders = ', '.join('?' for _ in chunk)
+            ids.update(self._conn.execute(
+                f"SELECT enlace, id FROM productos WHERE enlace IN ({placeholders})", chunk
+            ).fetchall())
+        return ids
+
+    def import_csv(self, filename: str, observed_at: Optional[datetime] = None) -> int:
+        """
+        Importa un CSV generado por el scraper
+
+        Args:
+            filename: Ruta del CSV
+            observed_at: Fecha del scraping. Si no se indica, se lee del nombre
+                del archivo (doctorpet_alimentos_20240930_143025.csv) o, si no
+                la tiene, se usa la fecha de modificación del archivo.
+        """
+        if observed_at is None:
+            match = _CSV_TIMESTAMP.search(os.path.basename(filename))
+            observed_at = (datetime.strptime(match.group(1), "%Y%m%d_%H%M%S") if match
+                           else datetime.fromtimestamp(os.path.getmtime(filename)))
+        with open(filename, newline='', encoding='utf-8-sig') as f:
+            return self.record(csv.DictReader(f), observed_at)
+
+    # ------------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------------
+
+    def series(self, enlace: str, since: Optional[str] = None,
+               until: Optional[str] = None) -> List[Observation]:
+        """
+        Evolución de un producto en un rango de fechas
+
+        Args:
+            enlace: URL del producto
+            since: Desde esta fecha (ISO, ej: '2024-07-01'); None = desde el principio
+            until: Hasta esta fecha, sin incluirla; None = hasta hoy
+
+        Returns:
+            Observaciones ordenadas de la más antigua a la más reciente
+        """
+        start = int(datetime.fromisoformat(since).timestamp()) if since else 0
+        end = int(datetime.fromisoformat(until).timestamp()) if until else 2 ** 62
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT o.ts, o.precio, o.precio_anterior, o.disponible
+                FROM productos p JOIN observaciones o ON o.producto_id = p.id
+                WHERE p.enlace = ? AND o.ts >= ? AND o.ts < ?
+                ORDER BY o.ts
+            """, (enlace, start, end)).fetchall()
+        return [
+            Observation(datetime.fromtimestamp(ts).isoformat(), price, old,
+                        None if stock is None else bool(stock))
+            for ts, price, old, stock in rows
+        ]
+
+    def snapshot(self, day: str) -> List[Dict]:
+        """
+        "Foto" del catálogo en un día: la última observación de cada producto ese día
+
+        Args:
+            day: Fecha ISO, ej: '2024-09-30'
+
+        Returns:
+            Lista de {'enlace', 'nombre', 'fecha', 'precio', 'precio_anterior', 'disponible'}
+        """
+        start = datetime.fromisoformat(day)
+        begin, end = int(start.timestamp()), int((start + timedelta(days=1)).timestamp())
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT p.enlace, p.nombre, o.ts, o.precio, o.precio_anterior, o.disponible
+                FROM observaciones o JOIN productos p ON p.id = o.producto_id
+                WHERE o.ts >= ? AND o.ts < ?
+                  AND o.ts = (SELECT MAX(ts) FROM observaciones
+                              WHERE producto_id = o.producto_id AND ts >= ? AND ts < ?)
+                ORDER BY p.nombre
+            """, (begin, end, begin, end)).fetchall()
+        return [
+            {'enlace': link, 'nombre': name, 'fecha': datetime.fromtimestamp(ts).isoformat(),
+             'precio': price, 'precio_anterior': old,
+             'disponible': None if stock is None else bool(stock)}
+            for link, name, ts, price, old, stock in rows
+        ]
+
+    def search(self, text: str) -> List[Dict[str, str]]:
+        """Busca productos cuyo nombre contiene el texto (para encontrar su enlace)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT enlace, nombre FROM productos WHERE nombre LIKE ? ORDER BY nombre",
+                (f"%{text}%",)
+            ).fetchall()
+        return [{'enlace': link, 'nombre': name} for link, name in rows]
+
+    def __len__(self) -> int:
+        """Número de observaciones guardadas"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM observaciones").fetchone()[0]
+
+    def close(self) -> None:
+        """Cierra la base de datos"""
+        with self._lock:
+            self._conn.close()
+
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Consultas rápidas al histórico
+
+    Ejemplos:
+        python history.py importar resultados/*.csv
+        python history.py buscar "gato cachorro"
+        python history.py serie https://doctorpet.co/producto/... --dias 90
+        python history.py dia 2024-09-30
+    """
+    parser = argparse.ArgumentParser(description="Histórico de precios de DoctorPet.co")
+    parser.add_argument('--db', default=HISTORY_DB_PATH, help="Archivo del histórico")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    importar = commands.add_parser('importar', help="Importar CSV generados por el scraper")
+    importar.add_argument('archivos', nargs='+')
+
+    buscar = commands.add_parser('buscar', help="Buscar productos por nombre")
+    buscar.add_argument('texto')
+
+    serie = commands.add_parser('serie', help="Evolución del precio de un producto")
+    serie.add_argument('enlace')
+    serie.add_argument('--dias', type=int, default=90, help="Días hacia atrás")
+
+    dia = commands.add_parser('dia', help="Precios de todos los productos en un día")
+    dia.add_argument('fecha', help="Fecha ISO, ej: 2024-09-30")
+
+    args = parser.parse_args(argv)
+    history = PriceHistory(args.db)
+    started = time.perf_counter()
+    writer = csv.writer(sys.stdout)
+
+    if args.command == 'importar':
+        for filename in args.archivos:
+            print(f"{filename}: {history.import_csv(filename)} observaciones")
+    elif args.command == 'buscar':
+        for product in history.search(args.texto):
+            writer.writerow([product['nombre'], product['enlace']])
+    elif args.command == 'serie':
+        since = (datetime.now() - timedelta(days=args.dias)).date().isoformat()
+        writer.writerow(Observation._fields)
+        for observation in history.series(args.enlace, since=since):
+            writer.writerow(observation)
+    elif args.command == 'dia':
+        rows = history.snapshot(args.fecha)
+        if rows:
+            writer.writerow(rows[0].keys())
+            writer.writerows(row.values() for row in rows)
+
+    history.close()
+    logger.info(f"Consulta resuelta en {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main()
@@ -0,0 +1,654 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cola de trabajo compartida para scrapear con varios procesos o máquinas
+
+scraper.py recorre una categoría en UN proceso. Para repartir el trabajo,
+este módulo guarda las páginas pendientes en una cola SQLite que varios
+workers (procesos, o máquinas que comparten el archivo) consumen a la vez:
+- Cada worker "alquila" (lease) una página durante LEASE_SECONDS y la
+  renueva mientras trabaja en ella
+- Si un worker muere, su alquiler caduca y otro worker retoma la página
+  (visibility timeout): no se pierde ninguna
+- Los productos se guardan en la misma transacción que marca la página como
+  hecha, y solo si el alquiler sigue siendo suyo: no se duplica ninguna
+- Las páginas que fallan MAX_JOB_ATTEMPTS veces, o con un error que no se
+  arregla reintentando (404, 410), pasan a la cola de "muertos"
+  (dead-letter) para revisarlas a mano
+- El límite de velocidad (SharedRateLimiter) también está en la cola: es
+  el TOTAL de todos los workers, no el de cada uno
+
+Uso desde la línea de comandos:
+    python jobqueue.py encolar https://doctorpet.co/producto-category/alimentos/
+    python jobqueue.py trabajar            # en cada proceso / máquina
+    python jobqueue.py estado
+    python jobqueue.py exportar productos.csv
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import requests
+
+from scraper import (CSV_FIELDNAMES, OUTPUT_FORMATS, PARSER_ENGINES, REQUEST_BURST,
+                     REQUESTS_PER_SECOND, DoctorPetScraper, RateLimiter, RetryPolicy,
+                     category_slug, open_product_sink)
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONSTANTES DE CONFIGURACIÓN
+# ============================================================================
+
+# Ruta por defecto de la base de datos de la cola
+QUEUE_DB_PATH = "doctorpet_cola.sqlite"
+
+# Segundos que dura el alquiler de una página (visibility timeout)
+# Chain of Thought: Debe cubrir de sobra una página con todos sus reintentos;
+# aun así el worker lo renueva cada LEASE_SECONDS / 3 mientras trabaja
+LEASE_SECONDS = 120
+
+# Veces que se intenta una página antes de mandarla a los muertos
+MAX_JOB_ATTEMPTS = 3
+
+# Segundos antes de volver a ofrecer una página que falló (x número de intento)
+JOB_RETRY_DELAY = 30
+
+# Segundos entre consultas de un worker sin trabajo (otros aún pueden añadir páginas)
+QUEUE_POLL_INTERVAL = 1.0
+
+# Segundos que se espera a que otro proceso suelte el bloqueo de SQLite
+QUEUE_BUSY_TIMEOUT = 30
+
+# Productos que se leen de la cola de una vez al exportar
+EXPORT_BATCH_SIZE = 1000
+
+# Estados de una página en la cola
+PENDING = 'pendiente'
+LEASED = 'en_curso'
+DONE = 'hecho'
+DEAD = 'muerto'
+
+
+class Job(NamedTuple):
+    """
+    Una página alquilada por un worker
+
+    Attributes:
+        id: Identificador en la cola
+        url: Página a descargar
+        categoria: URL de la categoría a la que pertenece
+        intentos: Número de este intento (1 = el primero). Junto con el
+            worker, identifica el alquiler: si otro worker retoma la página,
+            los intentos cambian y el alquiler antiguo deja de valer
+    """
+    id: int
+    url: str
+    categoria: str
+    intentos: int
+
+
+def default_worker_id() -> str:
+    """Nombre del worker: máquina y proceso (ej: 'scraper-2-4711')"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+# ============================================================================
+# COLA
+# ============================================================================
+# Chain of Thought: Cada operación es UNA transacción corta con
+# BEGIN IMMEDIATE, que toma el bloqueo de escritura al empezar. Así dos
+# workers nunca pueden alquilar la misma página: el segundo espera a que el
+# primero termine su transacción y ya la ve alquilada.
+#
+# Nota para junior: Para varias máquinas, el archivo tiene que estar en un
+# disco compartido con bloqueos de archivo que funcionen (no todos los NFS
+# lo hacen bien). Por eso no se usa el modo WAL de SQLite, que no funciona
+# en discos de red. Las horas se comparan entre máquinas: mantén los
+# relojes sincronizados (NTP).
+
+class JobQueue:
+    """
+    Cola de páginas por scrapear compartida entre procesos
+
+    Uso básico:
+        queue = JobQueue("cola.sqlite")
+        queue.enqueue_category("https://doctorpet.co/producto-category/alimentos/")
+        run_worker(queue)                   # en cada proceso
+        for producto in queue.iter_products():
+            print(producto['nombre'], producto['categoria'])
+    """
+
+    def __init__(self, path: str = QUEUE_DB_PATH, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_JOB_ATTEMPTS, retry_delay: float = JOB_RETRY_DELAY):
+        """
+        Args:
+            path: Archivo SQLite de la cola (el mismo para todos los workers)
+            lease_seconds: Duración de cada alquiler
+            max_attempts: Intentos de cada página antes de darla por muerta
+            retry_delay: Espera antes de reintentar una página que falló
+                (se multiplica por el número de intento)
+        """
+        if lease_seconds <= 0 or max_attempts < 1:
+            raise ValueError("lease_seconds debe ser > 0 y max_attempts >= 1")
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # Chain of Thought: isolation_level=None = sin transacciones
+        # automáticas de Python; las abrimos nosotros con BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=QUEUE_BUSY_TIMEOUT,
+                                     isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS trabajos (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                categoria TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                visible_en REAL NOT NULL,
+                trabajador TEXT,
+                error TEXT,
+                actualizado TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS trabajos_visibles ON trabajos (estado, visible_en);
+            CREATE TABLE IF NOT EXISTS productos (
+                trabajo_id INTEGER NOT NULL REFERENCES trabajos (id),
+                posicion INTEGER NOT NULL,
+                datos TEXT NOT NULL,
+                PRIMARY KEY (trabajo_id, posicion)
+            );
+            CREATE TABLE IF NOT EXISTS limite_velocidad (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                fichas REAL NOT NULL,
+                actualizado REAL NOT NULL
+            );
+        """)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Transacción con el bloqueo de escritura tomado desde el principio
+
+        Nota para junior: 'with self._transaction() as conn:' hace COMMIT al
+        salir, o ROLLBACK si hubo una excepción.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _now_text() -> str:
+        return datetime.now().isoformat(timespec='seconds')
+
+    # ------------------------------------------------------------------
+    # Productor
+    # ------------------------------------------------------------------
+    def enqueue(self, urls: Iterable[str], category: str) -> int:
+        """
+        Añade páginas a la cola (las que ya estaban se ignoran)
+
+        Returns:
+            Número de páginas nuevas
+
+        Chain of Thought: 'url' es UNIQUE: si dos workers descubren la misma
+        página siguiente, solo se encola una vez.
+        """
+        with self._transaction() as conn:
+            return self._insert(conn, urls, category)
+
+    def _insert(self, conn: sqlite3.Connection, urls: Iterable[str], category: str) -> int:
+        now, added = time.time(), 0
+        for url in urls:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO trabajos (url, categoria, estado, visible_en, actualizado) "
+                "VALUES (?, ?, ?, ?, ?)", (url, category, PENDING, now, self._now_text()))
+            added += cursor.rowcount
+        return added
+
+    def enqueue_category(self, category_url: str) -> int:
+        """Añade la primera página de una categoría (el resto lo descubren los workers)"""
+        return self.enqueue([category_url], category_url)
+
+    # ------------------------------------------------------------------
+    # Consumidor
+    # ------------------------------------------------------------------
+    def lease(self, worker_id: str, limit: int = 1) -> List[Job]:
+        """
+        Alquila hasta 'limit' páginas disponibles
+
+        Returns:
+            Las páginas alquiladas (lista vacía si no hay ninguna disponible)
+
+        Chain of Thought: Una página 'en_curso' cuyo alquiler caducó (su
+        worker murió o se colgó) vuelve a estar disponible. Si ya había
+        gastado todos sus intentos, va directamente a los muertos.
+        """
+        jobs: List[Job] = []
+        with self._transaction() as conn:
+            now = time.time()
+            while len(jobs) < limit:
+                rows = conn.execute(
+                    "SELECT id, url, categoria, intentos FROM trabajos "
+                    "WHERE estado IN (?, ?) AND visible_en <= ? ORDER BY id LIMIT ?",
+                    (PENDING, LEASED, now, limit - len(jobs))).fetchall()
+                if not rows:
+                    break
+                for job_id, url, category, attempts in rows:
+                    if attempts >= self.max_attempts:
+                        conn.execute(
+                            "UPDATE trabajos SET estado = ?, error = ?, actualizado = ? WHERE id = ?",
+                            (DEAD, "El alquiler caducó en el último intento", self._now_text(),
+                             job_id))
+                        logger.error("☠ %s agotó sus %d intentos", url, attempts)
+                        continue
+                    conn.execute(
+                        "UPDATE trabajos SET estado = ?, intentos = ?, trabajador = ?, "
+                        "visible_en = ?, actualizado = ? WHERE id = ?",
+                        (LEASED, attempts + 1, worker_id, now + self.lease_seconds,
+                         self._now_text(), job_id))
+                    jobs.append(Job(job_id, url, category, attempts + 1))
+        return jobs
+
+    def _owned(self, conn: sqlite3.Connection, job: Job, worker_id: str) -> bool:
+        """¿Sigue 'job' alquilada por 'worker_id' (y en el mismo intento)?"""
+        row = conn.execute("SELECT estado, trabajador, intentos FROM trabajos WHERE id = ?",
+                           (job.id,)).fetchone()
+        return row == (LEASED, worker_id, job.intentos)
+
+    def renew(self, job: Job, worker_id: str) -> bool:
+        """
+        Alarga el alquiler de una página mientras se trabaja en ella
+
+        Returns:
+            False si el alquiler ya no es de este worker (otro la retomó)
+        """
+        with self._transaction() as conn:
+            if not self._owned(conn, job, worker_id):
+                return False
+            conn.execute("UPDATE trabajos SET visible_en = ? WHERE id = ?",
+                         (time.time() + self.lease_seconds, job.id))
+            return True
+
+    def complete(self, job: Job, worker_id: str, products: Iterable, new_urls: Iterable[str] = ()) -> bool:
+        """
+        Marca una página como hecha, con sus productos y las páginas que descubrió
+
+        Returns:
+            False si el alquiler ya no es de este worker: entonces NO se
+            guarda nada (la página la está haciendo otro)
+
+        Chain of Thought: Todo en UNA transacción: si el worker muere a la
+        mitad, no queda ni la página hecha sin productos, ni productos de una
+        página que se volverá a hacer, ni páginas siguientes sin encolar.
+        """
+        with self._transaction() as conn:
+            if not self._owned(conn, job, worker_id):
+                return False
+            conn.executemany(
+                "INSERT OR REPLACE INTO productos (trabajo_id, posicion, datos) VALUES (?, ?, ?)",
+                ((job.id, position, json.dumps(dict(product), ensure_ascii=False))
+                 for position, product in enumerate(products)))
+            self._insert(conn, new_urls, job.categoria)
+            conn.execute("UPDATE trabajos SET estado = ?, error = NULL, actualizado = ? WHERE id = ?",
+                         (DONE, self._now_text(), job.id))
+            return True
+
+    def fail(self, job: Job, worker_id: str, error: str, retryable: bool = True) -> Optional[str]:
+        """
+        Devuelve a la cola una página que falló (o la manda a los muertos)
+
+        Args:
+            retryable: False si reintentar no cambiaría nada (ej: un 404): la
+                página va a los muertos sin gastar el resto de sus intentos
+
+        Returns:
+            El nuevo estado (PENDING o DEAD), o None si el alquiler ya no era suyo
+        """
+        with self._transaction() as conn:
+            if not self._owned(conn, job, worker_id):
+                return None
+            state = DEAD if not retryable or job.intentos >= self.max_attempts else PENDING
+            conn.execute(
+                "UPDATE trabajos SET estado = ?, error = ?, visible_en = ?, actualizado = ? "
+                "WHERE id = ?",
+                (state, error, time.time() + self.retry_delay * job.intentos,
+                 self._now_text(), job.id))
+            return state
+
+    def _reserve_token(self, rate: float, burst: int) -> float:
+        """
+        Token bucket guardado en la cola (ver SharedRateLimiter)
+
+        Returns:
+            Segundos que hay que esperar para usar la ficha reservada
+        """
+        with self._transaction() as conn:
+            now = time.time()
+            row = conn.execute("SELECT fichas, actualizado FROM limite_velocidad WHERE id = 0").fetchone()
+            tokens = float(burst) if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO limite_velocidad (id, fichas, actualizado) "
+                         "VALUES (0, ?, ?)", (tokens, now))
+        return 0.0 if tokens >= 0 else -tokens / rate
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, int]:
+        """Páginas en cada estado (ej: {'pendiente': 3, 'hecho': 40, ...})"""
+        with self._lock:
+            rows = self._conn.execute("SELECT estado, COUNT(*) FROM trabajos GROUP BY estado")
+            counts = dict.fromkeys((PENDING, LEASED, DONE, DEAD), 0)
+            counts.update(rows.fetchall())
+            counts['productos'] = self._conn.execute("SELECT COUNT(*) FROM productos").fetchone()[0]
+        return counts
+
+    def is_drained(self) -> bool:
+        """True si no queda nada pendiente ni en curso (ya no aparecerán páginas nuevas)"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM trabajos WHERE estado IN (?, ?) LIMIT 1",
+                                     (PENDING, LEASED)).fetchone()
+        return row is None
+
+    def dead_letters(self) -> List[Dict[str, str]]:
+        """Páginas que agotaron sus intentos, con el último error"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, categoria, intentos, error FROM trabajos WHERE estado = ? ORDER BY id",
+                (DEAD,)).fetchall()
+        return [dict(zip(('url', 'categoria', 'intentos', 'error'), row)) for row in rows]
+
+    def retry_dead(self) -> int:
+        """Vuelve a poner en la cola las páginas muertas (ej: tras arreglar la causa)"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE trabajos SET estado = ?, intentos = 0, visible_en = ?, actualizado = ? "
+                "WHERE estado = ?", (PENDING, time.time(), self._now_text(), DEAD)).rowcount
+
+    def iter_products(self) -> Iterator[Dict[str, str]]:
+        """
+        Productos de todas las páginas hechas, con la columna 'categoria'
+
+        Chain of Thought: En el orden en que se encolaron las páginas (y en
+        el de la página dentro de cada una), no en el que se terminaron: así
+        el resultado no depende de qué worker fue más rápido.
+
+        Nota para junior: Se leen de EXPORT_BATCH_SIZE en EXPORT_BATCH_SIZE
+        (continuando desde la última clave leída), así la memoria no crece con
+        la cola. Un solo cursor abierto durante toda la exportación mantendría
+        el bloqueo de lectura de SQLite y los workers no podrían guardar nada.
+        """
+        last = (-1, -1)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT p.trabajo_id, p.posicion, t.categoria, p.datos "
+                    "FROM productos p JOIN trabajos t ON t.id = p.trabajo_id "
+                    "WHERE (p.trabajo_id, p.posicion) > (?, ?) "
+                    "ORDER BY p.trabajo_id, p.posicion LIMIT ?",
+                    (*last, EXPORT_BATCH_SIZE)).fetchall()
+            for _, _, category, data in rows:
+                yield {**json.loads(data), 'categoria': category_slug(category)}
+            if len(rows) < EXPORT_BATCH_SIZE:
+                return
+            last = rows[-1][:2]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> 'JobQueue':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+# ============================================================================
+# LÍMITE DE VELOCIDAD COMPARTIDO
+# ============================================================================
+# Chain of Thought: Con un RateLimiter en cada worker, N workers harían N
+# veces más peticiones a la web. Guardando el cubo de fichas en la propia
+# cola, todos los workers (de todas las máquinas) sacan las fichas del
+# mismo cubo y la velocidad total es la configurada.
+
+class SharedRateLimiter(RateLimiter):
+    """
+    RateLimiter cuyo cubo de fichas está en la cola y comparten todos los workers
+
+    Uso básico:
+        limiter = SharedRateLimiter(queue, rate=0.5)   # 0.5 peticiones/s EN TOTAL
+        scraper = DoctorPetScraper(url, rate_limiter=limiter)
+
+    Nota para junior: Cada petición hace una transacción corta en la cola,
+    nada comparado con la petición HTTP. Usa el mismo 'rate' en todos los
+    workers: cada uno rellena el cubo con el suyo. Como con los alquileres,
+    las máquinas necesitan los relojes sincronizados.
+    """
+
+    def __init__(self, queue: JobQueue, rate: float = REQUESTS_PER_SECOND,
+                 burst: int = REQUEST_BURST):
+        """
+        Args:
+            queue: Cola donde se guarda el cubo de fichas
+            rate: Peticiones por segundo entre TODOS los workers
+            burst: Máximo de fichas acumuladas
+        """
+        super().__init__(rate, burst)
+        self.queue = queue
+
+    def _reserve(self) -> float:
+        return self.queue._reserve_token(self.rate, self.burst)
+
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+class LeaseKeeper:
+    """
+    Renueva el alquiler de una página en segundo plano mientras se procesa
+
+    Uso básico:
+        with LeaseKeeper(queue, job, worker_id) as keeper:
+            ...  # trabajo largo
+        if keeper.lost:
+            ...  # otro worker retomó la página
+
+    Chain of Thought: Con un hilo aparte, una página lenta (muchos
+    reintentos, un servidor lento) no pierde el alquiler aunque tarde más
+    que LEASE_SECONDS, y el alquiler puede ser corto: si el worker muere de
+    verdad, la página se retoma pronto.
+    """
+
+    def __init__(self, queue: JobQueue, job: Job, worker_id: str):
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f"lease-{job.id}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            if not self.queue.renew(self.job, self.worker_id):
+                logger.warning("⚠ Se perdió el alquiler de %s", self.job.url)
+                self.lost = True
+                return
+
+    def __enter__(self) -> 'LeaseKeeper':
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(queue: JobQueue, worker_id: Optional[str] = None,
+               poll_interval: float = QUEUE_POLL_INTERVAL, max_jobs: Optional[int] = None,
+               **scraper_options) -> int:
+    """
+    Procesa páginas de la cola hasta que no quede nada por hacer
+
+    Args:
+        queue: Cola compartida
+        worker_id: Nombre de este worker (None = máquina y proceso)
+        poll_interval: Espera cuando no hay páginas disponibles pero otros
+            workers aún pueden añadir más
+        max_jobs: Parar tras este número de páginas (None = hasta vaciar la cola)
+        **scraper_options: Opciones de DoctorPetScraper (engine, rate_limiter...)
+
+    Returns:
+        Número de páginas que completó este worker
+
+    Chain of Thought: Un scraper por categoría, todos con la misma sesión,
+    RateLimiter y RetryPolicy. Por defecto el límite de velocidad es un
+    SharedRateLimiter: REQUESTS_PER_SECOND entre todos los workers juntos.
+    """
+    worker_id = worker_id or default_worker_id()
+    scraper_options.setdefault('rate_limiter', SharedRateLimiter(queue))
+    scraper_options.setdefault('retry_policy', RetryPolicy())
+    scraper_options.setdefault('session', requests.Session())
+    scrapers: Dict[str, DoctorPetScraper] = {}
+    done = 0
+    logger.info("👷 Worker %s empezando (cola: %s)", worker_id, queue.path)
+    while max_jobs is None or done < max_jobs:
+        jobs = queue.lease(worker_id)
+        if not jobs:
+            if queue.is_drained():
+                break
+            time.sleep(poll_interval)
+            continue
+        job = jobs[0]
+        scraper = scrapers.get(job.categoria)
+        if scraper is None:
+            scraper = scrapers[job.categoria] = DoctorPetScraper(job.categoria, **scraper_options)
+
+        error, retryable = "No se pudo obtener la página", True
+        with LeaseKeeper(queue, job, worker_id) as keeper:
+            try:
+                # Chain of Thought: Desde la primera página se predicen todas
+                # las demás, así los otros workers pueden empezar enseguida
+                page, new_urls = scraper.fetch_page(job.url, predict=job.url == job.categoria)
+            except requests.exceptions.HTTPError as e:
+                # Un 404 o un 410 no se arreglan reintentando
+                page, new_urls, error, retryable = None, [], str(e), False
+            except Exception as e:
+                logger.error("✗ Error procesando %s: %s", job.url, e, exc_info=True)
+                page, new_urls, error = None, [], str(e)
+        if keeper.lost:
+            continue
+        if page is None:
+            state = queue.fail(job, worker_id, error, retryable)
+            logger.warning("⚠ %s falló (intento %d): %s", job.url, job.intentos,
+                           'muerta' if state == DEAD else 'se reintentará')
+        elif queue.complete(job, worker_id, page.products, new_urls):
+            done += 1
+            logger.info("✓ %s: %d productos, %d páginas nuevas conocidas",
+                        job.url, len(page.products), len(new_urls))
+        else:
+            logger.warning("⚠ %s ya la retomó otro worker; se descarta", job.url)
+    logger.info("👷 Worker %s terminó: %d páginas", worker_id, done)
+    return done
+
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Gestión de la cola y workers
+
+    Ejemplos:
+        python jobqueue.py encolar URL_CATEGORIA1 URL_CATEGORIA2
+        python jobqueue.py trabajar --rate 1        # en cada proceso / máquina (1/s en total)
+        python jobqueue.py estado
+        python jobqueue.py reintentar               # volver a encolar los muertos
+        python jobqueue.py exportar productos.csv
+    """
+    parser = argparse.ArgumentParser(description="Cola de trabajo compartida para DoctorPet.co")
+    parser.add_argument('--db', default=QUEUE_DB_PATH, help="Archivo de la cola")
+    parser.add_argument('--lease', type=float, default=LEASE_SECONDS, metavar='SEGUNDOS',
+                        help="Duración del alquiler de cada página")
+    parser.add_argument('--intentos', type=int, default=MAX_JOB_ATTEMPTS,
+                        help="Intentos por página antes de darla por muerta")
+    parser.add_argument('--espera', type=float, default=JOB_RETRY_DELAY, metavar='SEGUNDOS',
+                        help="Espera antes de reintentar una página que falló")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    encolar = commands.add_parser('encolar', help="Añadir categorías a la cola")
+    encolar.add_argument('categorias', nargs='+', metavar='URL')
+
+    trabajar = commands.add_parser('trabajar', help="Procesar páginas hasta vaciar la cola")
+    trabajar.add_argument('--id', help="Nombre del worker (por defecto: máquina-proceso)")
+    trabajar.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND,
+                          help="Peticiones por segundo de TODOS los workers juntos (usa el "
+                               "mismo valor en todos)")
+    trabajar.add_argument('--engine', choices=PARSER_ENGINES, default='bs4',
+                          help="Motor de extracción de productos")
+
+    commands.add_parser('estado', help="Páginas en cada estado y páginas muertas")
+    commands.add_parser('reintentar', help="Volver a encolar las páginas muertas")
+
+    exportar = commands.add_parser('exportar', help="Guardar los productos de la cola")
+    exportar.add_argument('archivo')
+    exportar.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='csv')
+
+    args = parser.parse_args(argv)
+    with JobQueue(args.db, lease_seconds=args.lease, max_attempts=args.intentos,
+                  retry_delay=args.espera) as queue:
+        if args.command == 'encolar':
+            for url in args.categorias:
+                print(f"{url}: {'encolada' if queue.enqueue_category(url) else 'ya estaba'}")
+        elif args.command == 'trabajar':
+            run_worker(queue, args.id, engine=args.engine,
+                       rate_limiter=SharedRateLimiter(queue, rate=args.rate))
+        elif args.command == 'estado':
+            for state, count in queue.stats().items():
+                print(f"{state}: {count}")
+            for job in queue.dead_letters():
+                print(f"☠ {job['url']} ({job['intentos']} intentos): {job['error']}")
+        elif args.command == 'reintentar':
+            print(f"{queue.retry_dead()} páginas vueltas a encolar")
+        elif args.command == 'exportar':
+            written = 0
+            with open_product_sink(args.output_format, args.archivo,
+                                   fieldnames=CSV_FIELDNAMES + ['categoria']) as sink:
+                for product in queue.iter_products():
+                    sink.write(product)
+                    written += 1
+            print(f"{written} productos guardados en {args.archivo}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main()
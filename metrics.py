@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Métricas del scraper de DoctorPet.co
+
+Los mensajes de log dicen QUÉ pasó, pero no DÓNDE se va el tiempo. Este
+módulo mide cada etapa del scraping (espera del limitador, conexión,
+primer byte, descarga, parseo, extracción y escritura) y cuenta peticiones,
+códigos HTTP, reintentos, bytes y aciertos de caché, por categoría.
+
+Al terminar, las métricas se pueden guardar en JSON o en el formato de
+texto de Prometheus, y una función (callback) puede recibir cada medida
+en el momento en que se toma.
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+# Explicación para desarrolladores junior:
+# - bisect: Busca en qué "cubo" (bucket) del histograma cae cada medida
+#   sin recorrer todos los cubos.
+# - urllib3: La librería que usa requests por debajo para abrir conexiones.
+#   La usamos para medir cuánto tarda en abrirse cada conexión nueva.
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+# ============================================================================
+# CONSTANTES DE CONFIGURACIÓN
+# ============================================================================
+
+# Prefijo de todas las métricas (así se distinguen de otras en Prometheus)
+METRIC_PREFIX = "doctorpet_"
+
+# Límites superiores (en segundos) de los cubos de los histogramas
+# Chain of Thought: Van de 1 ms a 10 s; así sirven tanto para etapas muy
+# rápidas (extraer un producto) como para descargas lentas
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Etapas medidas, en el orden en que ocurren
+# - rate_limit: espera del limitador de velocidad
+# - dns / connect: resolver el nombre y abrir la conexión (solo conexiones nuevas;
+#   con requests, 'connect' incluye el DNS)
+# - ttfb: desde enviar la petición hasta recibir los headers (time to first byte)
+# - download: recibir el cuerpo de la respuesta
+# - parse: construir el árbol HTML; extract: sacar los productos de él
+# - write: escribir los productos en el archivo de salida
+STAGES = ('rate_limit', 'dns', 'connect', 'ttfb', 'download', 'parse', 'extract', 'write')
+
+# Nombre de la métrica con la duración de cada etapa
+STAGE_METRIC = "stage_seconds"
+
+# Tipo de la función que recibe cada medida: (nombre, etiquetas, valor)
+MetricsCallback = Callable[[str, Dict[str, str], float], None]
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Histograma acumulado: cuántas medidas caen por debajo de cada límite
+
+    Nota para junior: En lugar de guardar todas las medidas (que con millones
+    de peticiones ocuparía mucho), solo contamos cuántas caen en cada cubo.
+    Con eso se pueden estimar percentiles (p50, p99) con poca memoria.
+    """
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # el último cubo es "+Inf"
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, fraction: float) -> float:
+        """Estimación del percentil (el límite del cubo donde cae)"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for limit, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return limit
+        return float('inf')
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = key + extra
+    if not items:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+# ============================================================================
+# REGISTRO DE MÉTRICAS
+# ============================================================================
+
+class Metrics:
+    """
+    Contadores e histogramas del scraping, compartibles entre hilos
+
+    Uso básico:
+        metrics = Metrics()
+        scraper = DoctorPetScraper(metrics=metrics)
+        scraper.save_to_csv(scraper.iter_products())
+        metrics.dump("metricas.prom")     # o "metricas.json"
+        print("\\n".join(metrics.summary_lines()))
+
+        # Recibir cada medida al momento (ej: para enviarla a otro sistema)
+        metrics = Metrics(callback=lambda nombre, etiquetas, valor: print(nombre, etiquetas, valor))
+    """
+
+    def __init__(self, callback: Optional[MetricsCallback] = None,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Args:
+            callback: Función que recibe (nombre, etiquetas, valor) de cada medida
+            buckets: Límites de los cubos de los histogramas (en segundos)
+        """
+        self.callback = callback
+        self.buckets = buckets
+        # Chain of Thought: Un lock para todo: las operaciones son tan cortas
+        # que varios locks no compensarían la complejidad
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Suma 'value' a un contador (ej: inc('requests_total', status='200'))"""
+        key = _key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+        if self.callback is not None:
+            self.callback(name, labels, value)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Añade una medida a un histograma"""
+        key = _key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+        if self.callback is not None:
+            self.callback(name, labels, value)
+
+    def stage(self, stage: str, seconds: float, **labels: str) -> None:
+        """Registra la duración de una etapa (ver STAGES)"""
+        self.observe(STAGE_METRIC, seconds, stage=stage, **labels)
+
+    @contextmanager
+    def timer(self, stage: str, **labels: str) -> Iterator[None]:
+        """
+        Mide lo que tarda el bloque 'with' como una etapa
+
+        Uso:
+            with metrics.timer('write', category='alimentos'):
+                sink.write(producto)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage(stage, time.perf_counter() - start, **labels)
+
+    def counter(self, name: str, **labels: str) -> float:
+        """Valor actual de un contador (0 si no existe)"""
+        with self._lock:
+            return self._counters.get(name, {}).get(_key(labels), 0)
+
+    def histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        """Histograma de una métrica con esas etiquetas exactas (o None)"""
+        with self._lock:
+            return self._histograms.get(name, {}).get(_key(labels))
+
+    def stage_totals(self, **labels: str) -> Dict[str, float]:
+        """
+        Segundos totales por etapa, sumando las series que tengan esas etiquetas
+
+        Ejemplo: stage_totals(category='alimentos') -> {'ttfb': 12.3, 'parse': 4.5, ...}
+        """
+        wanted = set(labels.items())
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for key, histogram in self._histograms.get(STAGE_METRIC, {}).items():
+                if wanted <= set(key):
+                    stage = dict(key)['stage']
+                    totals[stage] = totals.get(stage, 0.0) + histogram.sum
+        return {stage: totals[stage] for stage in STAGES if stage in totals}
+
+    def to_dict(self) -> Dict:
+        """Todas las métricas como diccionario (para guardarlas en JSON)"""
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': METRIC_PREFIX + name, 'labels': dict(key), 'value': value}
+                    for name, series in sorted(self._counters.items())
+                    for key, value in sorted(series.items())
+                ],
+                'histograms': [
+                    {'name': METRIC_PREFIX + name, 'labels': dict(key), 'count': h.count,
+                     'sum': round(h.sum, 6), 'p50': h.quantile(0.5), 'p99': h.quantile(0.99),
+                     'buckets': dict(zip([str(b) for b in h.buckets] + ['+Inf'], h.counts))}
+                    for name, series in sorted(self._histograms.items())
+                    for key, h in sorted(series.items())
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Todas las métricas en el formato de texto de Prometheus
+
+        Nota para junior: Es el formato que entienden Prometheus, Grafana
+        Agent y otras herramientas de monitorización. Cada línea es
+        'nombre{etiquetas} valor'; en los histogramas, los cubos son
+        acumulados (cada uno incluye a los anteriores).
+        """
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full_name = METRIC_PREFIX + name
+                lines.append(f"# TYPE {full_name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full_name}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                full_name = METRIC_PREFIX + name
+                lines.append(f"# TYPE {full_name} histogram")
+                for key, h in sorted(series.items()):
+                    cumulative = 0
+                    for limit, count in zip([f"{b:g}" for b in h.buckets] + ['+Inf'], h.counts):
+                        cumulative += count
+                        lines.append(f"{full_name}_bucket{_format_labels(key, (('le', limit),))} {cumulative}")
+                    lines.append(f"{full_name}_sum{_format_labels(key)} {h.sum:.6f}")
+                    lines.append(f"{full_name}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """Guarda las métricas: JSON si el archivo termina en .json, Prometheus si no"""
+        with open(path, 'w', encoding='utf-8') as f:
+            if path.endswith('.json'):
+                json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+            else:
+                f.write(self.to_prometheus())
+
+    def summary_lines(self) -> List[str]:
+        """
+        Resumen legible: en qué etapa se fue el tiempo de cada categoría
+
+        Ejemplo: "alimentos: ttfb 12.3s (61%), parse 4.5s (22%), ..."
+        """
+        with self._lock:
+            categories = sorted({dict(key).get('category', '')
+                                 for key in self._histograms.get(STAGE_METRIC, {})})
+        lines = []
+        for category in categories:
+            totals = self.stage_totals(category=category)
+            total = sum(totals.values()) or 1.0
+            parts = ", ".join(f"{stage} {seconds:.2f}s ({seconds / total:.0%})"
+                              for stage, seconds in totals.items())
+            lines.append(f"{category or '-'}: {parts}")
+        return lines
+
+
+# ============================================================================
+# TIEMPO DE CONEXIÓN CON REQUESTS
+# ============================================================================
+# Chain of Thought: requests no dice cuánto tardó en abrir la conexión. Le
+# damos a urllib3 una clase de conexión que mide su connect() y deja el
+# resultado en una variable del HILO actual: la petición que abrió la
+# conexión es la que se está ejecutando en ese hilo, así que el scraper lo
+# recoge justo después con take_connect_time().
+#
+# Nota para junior: threading.local() es una variable con un valor distinto
+# en cada hilo; así los hilos no se pisan las medidas entre sí.
+
+_connect_times = threading.local()
+
+
+def take_connect_time() -> float:
+    """Devuelve (y pone a cero) los segundos de conexión medidos en este hilo"""
+    seconds = getattr(_connect_times, 'seconds', 0.0)
+    _connect_times.seconds = 0.0
+    return seconds
+
+
+class _TimedConnectMixin:
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_times.seconds = (getattr(_connect_times, 'seconds', 0.0)
+                                      + time.perf_counter() - start)
+
+
+class _TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """Adaptador de requests cuyas conexiones miden su tiempo de apertura"""
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+def instrument_session(session) -> None:
+    """
+    Cambia los adaptadores de una sesión de requests por TimedHTTPAdapter
+
+    Chain of Thought: Copiamos el tamaño del pool del adaptador actual, así
+    no se pierde la configuración de BatchCrawler (pool_maxsize)
+    """
+    for prefix in ('https://', 'http://'):
+        current = session.get_adapter(prefix)
+        if isinstance(current, TimedHTTPAdapter):
+            continue
+        session.mount(prefix, TimedHTTPAdapter(
+            pool_connections=getattr(current, '_pool_connections', 10),
+            pool_maxsize=getattr(current, '_pool_maxsize', 10),
+            max_retries=getattr(current, 'max_retries', 0),
+            pool_block=getattr(current, '_pool_block', False),
+        ))
+
+
+# ============================================================================
+# TIEMPOS CON AIOHTTP (MODO ASÍNCRONO)
+# ============================================================================
+
+def aiohttp_trace_config(metrics: Metrics, **labels: str):
+    """
+    Crea un TraceConfig de aiohttp que mide DNS, conexión y primer byte
+
+    Nota para junior: aiohttp avisa a las funciones de un TraceConfig en
+    cada paso de una petición (empieza el DNS, termina la conexión...).
+    Cada petición tiene su propio 'trace_config_ctx' donde apuntamos
+    cuándo empezó cada paso.
+    """
+    import aiohttp
+
+    trace = aiohttp.TraceConfig()
+
+    async def on_request_start(session, ctx, params):
+        ctx.started = time.perf_counter()
+        ctx.network = 0.0
+
+    async def on_dns_start(session, ctx, params):
+        ctx.dns_started = time.perf_counter()
+
+    async def on_dns_end(session, ctx, params):
+        seconds = time.perf_counter() - ctx.dns_started
+        ctx.network += seconds
+        metrics.stage('dns', seconds, **labels)
+
+    async def on_connection_start(session, ctx, params):
+        ctx.connect_started = time.perf_counter()
+
+    async def on_connection_end(session, ctx, params):
+        # Chain of Thought: aiohttp incluye el DNS dentro de la creación de
+        # la conexión; se lo restamos para no contarlo dos veces
+        seconds = time.perf_counter() - ctx.connect_started - ctx.network
+        ctx.network += seconds
+        metrics.stage('connect', max(seconds, 0.0), **labels)
+
+    async def on_request_end(session, ctx, params):
+        # on_request_end llega al recibir los headers: es el primer byte
+        metrics.stage('ttfb', time.perf_counter() - ctx.started - ctx.network, **labels)
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_dns_resolvehost_start.append(on_dns_start)
+    trace.on_dns_resolvehost_end.append(on_dns_end)
+    trace.on_connection_create_start.append(on_connection_start)
+    trace.on_connection_create_end.append(on_connection_end)
+    trace.on_request_end.append(on_request_end)
+    return trace
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Normalización de precios del scraper de DoctorPet.co
+
+El scraper guarda los precios tal como se ven en la web ("45.000 $"). Este
+módulo los convierte en NÚMEROS, procesando muchos productos de una vez
+con NumPy:
+- precio_num: precio actual (el de oferta si la hay)
+- precio_anterior_num: precio tachado (<del>) antes de la oferta
+- moneda: 'COP' si el precio lleva símbolo de moneda
+- descuento_pct: porcentaje de descuento sobre el precio anterior
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+# Explicación para desarrolladores junior:
+# - numpy: Trabaja con "arrays" (listas de datos del mismo tipo) y aplica cada
+#   operación a TODOS los elementos a la vez, en código compilado, en lugar
+#   de recorrerlos uno a uno con un bucle de Python.
+
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Mapping, NamedTuple, Sequence
+
+import numpy as np
+
+
+# ============================================================================
+# CONSTANTES DE CONFIGURACIÓN
+# ============================================================================
+
+# Columnas que añade la normalización (después de las del CSV)
+NORMALIZED_FIELDNAMES = ['precio_num', 'precio_anterior_num', 'moneda', 'descuento_pct']
+
+# Productos que se normalizan juntos en iter_normalized()
+# Chain of Thought: NumPy es rápido con arrays grandes; con lotes de pocos
+# productos el coste fijo de crear los arrays pesaría más que el trabajo.
+PRICE_BATCH_SIZE = 1000
+
+# Moneda de la tienda (DoctorPet.co es de Colombia: "$" son pesos colombianos)
+DEFAULT_CURRENCY = 'COP'
+
+
+class PriceColumns(NamedTuple):
+    """Precios normalizados de un lote de productos, una columna (array) por campo"""
+    precio: np.ndarray           # float64, NaN si no hay precio
+    precio_anterior: np.ndarray  # float64, NaN si no hay precio tachado
+    moneda: np.ndarray           # str, '' si no se reconoce
+    descuento_pct: np.ndarray    # float64, NaN si no hay descuento
+
+
+# ============================================================================
+# CONVERSIÓN VECTORIZADA
+# ============================================================================
+
+def parse_price_array(texts: Sequence[str]) -> np.ndarray:
+    """
+    Convierte textos de precio colombianos en números, todos a la vez
+
+    Ejemplos: "45.000\xa0$" -> 45000.0, "$ 1.250.000" -> 1250000.0,
+    "12.500,50 $" -> 12500.5, "N/A" -> nan
+
+    Si el texto contiene varios importes (el texto completo de un precio en
+    oferta, ej: "35.000 $28.000 $"), se toma el ÚLTIMO, que es el vigente.
+
+    Args:
+        texts: Textos de precio (lista, tupla o array)
+
+    Returns:
+        Array float64 con un número por texto (NaN si no tiene dígitos)
+
+    Chain of Thought: En lugar de limpiar cada texto con operaciones de
+    string (un bucle de Python por producto), vemos el lote como una MATRIZ
+    de códigos de carácter: una fila por POSICIÓN y una columna por texto.
+    Recorremos las posiciones (unas pocas decenas) y en cada una
+    actualizamos a la vez el número que se está leyendo en TODOS los textos,
+    igual que leerías un número a mano: valor = valor * 10 + dígito.
+    En formato colombiano '.' separa miles (se ignora) y ',' los decimales.
+    """
+    values = np.asarray(texts, dtype=str).ravel()
+    count = values.size
+    width = values.dtype.itemsize // 4  # NumPy guarda cada carácter en 4 bytes (UTF-32)
+    result = np.full(count, np.nan)
+    if count == 0 or width == 0:
+        return result
+
+    # Chain of Thought: Transponemos para que los caracteres de una misma
+    # posición estén seguidos en memoria (cada paso del bucle lee una fila)
+    chars = np.ascontiguousarray(values.view(np.uint32).reshape(count, width).T)
+
+    value = np.zeros(count)                    # dígitos leídos del número actual
+    decimals = np.full(count, -1, np.int64)    # dígitos tras la última coma (-1 = sin coma)
+    reading = np.zeros(count, dtype=bool)      # ¿el número actual tiene algún dígito?
+
+    def finish_numbers(ended: np.ndarray) -> None:
+        # Guardamos el número que acaba de terminar (el último gana)
+        # Nota para junior: 10.0 ** n funciona con cualquier cantidad de
+        # decimales (con una tabla de potencias, un texto raro la desbordaría)
+        divisor = 10.0 ** np.clip(decimals[ended], 0, None)
+        result[ended] = value[ended] / divisor
+
+    for column in chars:
+        is_digit = (column >= ord('0')) & (column <= ord('9'))
+        is_comma = column == ord(',')
+        in_number = is_digit | is_comma | (column == ord('.'))
+
+        ended = reading & ~in_number
+        if ended.any():
+            finish_numbers(ended)
+        # Fuera de un número empezamos de cero
+        value[~in_number] = 0
+        decimals[~in_number | is_comma] = np.where(is_comma, 0, -1)[~in_number | is_comma]
+        reading &= in_number
+
+        value = np.where(is_digit, value * 10 + (column - ord('0')), value)
+        decimals += (is_digit & (decimals >= 0))
+        reading |= is_digit
+
+    finish_numbers(reading)
+    return result
+
+
+def detect_currency(texts: Sequence[str]) -> np.ndarray:
+    """Devuelve DEFAULT_CURRENCY para los textos con '$' o 'COP' y '' para el resto"""
+    values = np.asarray(texts, dtype=str)
+    has_symbol = (np.char.find(values, '$') >= 0) | (np.char.find(values, 'COP') >= 0)
+    return np.where(has_symbol, DEFAULT_CURRENCY, '')
+
+
+def normalize_prices(products: Sequence[Mapping[str, str]]) -> PriceColumns:
+    """
+    Normaliza los precios de un lote de productos
+
+    Args:
+        products: Productos con 'precio' y (opcionalmente) 'precio_anterior'
+
+    Returns:
+        PriceColumns con un array por campo, en el orden de los productos
+    """
+    current = [product.get('precio') or '' for product in products]
+    previous = [product.get('precio_anterior') or '' for product in products]
+
+    precio = parse_price_array(current)
+    precio_anterior = parse_price_array(previous)
+
+    # Chain of Thought: Solo hay descuento si el precio anterior es MAYOR que
+    # el actual (las comparaciones con NaN dan False, así que no hace falta
+    # comprobar aparte los precios que faltan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        has_discount = precio_anterior > precio
+        descuento = np.where(has_discount,
+                             np.round((precio_anterior - precio) / precio_anterior * 100, 1),
+                             np.nan)
+
+    return PriceColumns(precio, precio_anterior, detect_currency(current), descuento)
+
+
+def _to_python(value):
+    """Convierte un valor de NumPy en uno de Python (NaN -> None) para CSV/JSON/SQLite"""
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else float(value)
+    return str(value) or None
+
+
+def add_normalized_prices(products: Sequence[Mapping[str, str]]) -> List[Dict]:
+    """
+    Devuelve los productos con las columnas de NORMALIZED_FIELDNAMES añadidas
+
+    Ejemplo:
+        {'precio': '28.000 $', 'precio_anterior': '35.000 $', ...}
+        -> {..., 'precio_num': 28000.0, 'precio_anterior_num': 35000.0,
+            'moneda': 'COP', 'descuento_pct': 20.0}
+    """
+    columns = normalize_prices(products)
+    # Chain of Thought: tolist() convierte cada columna entera a valores de
+    # Python de una vez, más rápido que leer el array elemento a elemento
+    rows = zip(columns.precio.tolist(), columns.precio_anterior.tolist(),
+               columns.moneda.tolist(), columns.descuento_pct.tolist())
+    return [
+        {**product, **{field: _to_python(value) for field, value in zip(NORMALIZED_FIELDNAMES, row)}}
+        for product, row in zip(products, rows)
+    ]
+
+
+def iter_normalized(products: Iterable[Mapping[str, str]],
+                    batch_size: int = PRICE_BATCH_SIZE) -> Iterator[Dict]:
+    """
+    Etapa de normalización para un flujo de productos (ej: iter_products())
+
+    Agrupa los productos en lotes de 'batch_size', normaliza cada lote de
+    una vez y los vuelve a entregar uno a uno, en el mismo orden.
+
+    Uso básico:
+        productos = iter_normalized(scraper.iter_products())
+        scraper.save_products(productos, fieldnames=CSV_FIELDNAMES + NORMALIZED_FIELDNAMES)
+    """
+    products = iter(products)
+    while True:
+        batch = list(islice(products, batch_size))
+        if not batch:
+            return
+        yield from add_normalized_prices(batch)
@@ -26,15 +26,49 @@ ORIENTADO A: Desarrollador Junior
 # - csv: Biblioteca estándar de Python para trabajar con archivos CSV
 # - time: Para añadir pausas entre peticiones (evitar bloqueos)
 # - datetime: Para añadir timestamps a los archivos generados
+# - asyncio / aiohttp: Para hacer varias peticiones "a la vez" (modo asíncrono)
+# - lxml: Parser HTML muy rápido; lo usamos directamente en el modo engine='lxml'
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from lxml import etree
+import lxml.html
+import argparse
+import asyncio
 import csv
+import io
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
 import time
-from datetime import datetime
-from typing import List, Dict, Optional
+from collections.abc import Mapping
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Optional, NamedTuple, Iterable, Iterator, Tuple, Union, Generator, BinaryIO, Callable
+from urllib.parse import urljoin, urlparse
 import logging
 
+from archive import PageArchive
+from cache import HTTP_CACHE_PATH, PAGE_CACHE_PATH, HTTPCache, ParsedPageCache
+from metrics import Metrics, aiohttp_trace_config, instrument_session, take_connect_time
+from store_api import STORE_API_PATHS, STORE_API_PER_PAGE, StoreAPIError, parse_api_page, store_api_url
+
+# Chain of Thought: aiohttp es una dependencia OPCIONAL. Solo se necesita para
+# el modo asíncrono (AsyncDoctorPetScraper). Si no está instalada, el scraper
+# normal sigue funcionando igual.
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - depende del entorno
+    aiohttp = None
+
 # ============================================================================
 # CONFIGURACIÓN DE LOGGING
 # ============================================================================
@@ -74,13 +108,18 @@ HEADERS = {
     'Upgrade-Insecure-Requests': '1'
 }
 
-# Configuración de delays (pausas) entre peticiones
-# Chain of Thought: Añadimos delays porque:
+# Límite de velocidad de las peticiones (rate limiting)
+# Chain of Thought: Limitamos las peticiones porque:
 # 1. Evita sobrecargar el servidor del sitio web
 # 2. Previene que nos bloqueen por hacer muchas peticiones rápidas
 # 3. Es una práctica ética de web scraping
-DELAY_BETWEEN_REQUESTS = 2  # segundos entre peticiones de páginas
-DELAY_BETWEEN_PRODUCTS = 0.5  # segundos al procesar cada producto
+# Solo limitamos las PETICIONES de red: procesar productos ya descargados es
+# trabajo local y no molesta al servidor, así que ahí no hace falta esperar.
+REQUESTS_PER_SECOND = 0.5  # velocidad sostenida (0.5 = una petición cada 2s)
+REQUEST_BURST = 2  # peticiones que se pueden hacer seguidas antes de esperar
+
+# Pausa base entre reintentos de una petición fallida
+DELAY_BETWEEN_REQUESTS = 2  # segundos
 
 # Timeout para las peticiones HTTP
 # Chain of Thought: Si una petición tarda mucho, es mejor cancelarla
@@ -90,6 +129,833 @@ REQUEST_TIMEOUT = 30  # segundos
 # Número máximo de reintentos si falla una petición
 MAX_RETRIES = 3
 
+# Pausa máxima entre reintentos (el backoff exponencial no pasa de aquí)
+RETRY_MAX_DELAY = 60  # segundos
+
+# Mayor 'Retry-After' que estamos dispuestos a esperar; si el servidor pide
+# más, damos la página por fallida en lugar de quedarnos parados
+RETRY_AFTER_MAX = 300  # segundos
+
+# Códigos HTTP que indican un problema temporal y merecen otro intento
+# - 429: demasiadas peticiones; 5xx: error o sobrecarga del servidor
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Códigos HTTP que indican que la página no existe (ni existirá): ni otro
+# intento más tarde lo arreglaría
+# Chain of Thought: Un 403 o un 401 NO están aquí: pueden ser un bloqueo
+# temporal (ej: un cortafuegos que nos frena unos minutos)
+PERMANENT_HTTP_STATUSES = (404, 410)
+
+# Circuit breaker: fallos SEGUIDOS contra un mismo servidor antes de
+# pausarlo, y cuánto dura la pausa
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN = 60  # segundos
+
+# Columnas del CSV de salida (en este orden)
+# - precio: precio vigente (el de oferta si la hay)
+# - precio_anterior: precio tachado (<del>) cuando el producto está en oferta
+# Chain of Thought: Las columnas nuevas van AL FINAL: así los programas que
+# leen los CSV antiguos por posición siguen funcionando
+CSV_FIELDNAMES = ['nombre', 'precio', 'disponibilidad', 'enlace', 'imagen', 'precio_anterior']
+
+# Cada cuántos productos se vuelca el CSV a disco durante el scraping
+CSV_FLUSH_EVERY = 50
+
+# Formatos de salida disponibles (ver sinks.py para los que no son CSV)
+# - 'csv': el original, fácil de abrir en Excel
+# - 'sqlite': base de datos con índice por enlace
+# - 'jsonl': un JSON por línea, comprimido con gzip
+# - 'parquet': columnar y tipado, para análisis (requiere pyarrow)
+OUTPUT_FORMATS = ('csv', 'sqlite', 'jsonl', 'parquet')
+
+# Formatos a los que se puede añadir productos (y por tanto reanudar con --resume)
+# Chain of Thought: Un Parquet solo es legible cuando se cierra, así que un
+# scraping interrumpido no se puede continuar sobre él (ver sinks.py)
+APPENDABLE_FORMATS = ('csv', 'sqlite', 'jsonl')
+
+# Motores de extracción disponibles
+# - 'bs4': BeautifulSoup (el original, más fácil de leer y modificar)
+# - 'lxml': lxml con selectores XPath precompilados (mismo resultado, mucho más rápido)
+PARSER_ENGINES = ('bs4', 'lxml')
+
+# Clases CSS que se conservan en el modo de parseo parcial (partial_parse=True)
+# Chain of Thought: De cada página solo necesitamos los productos
+# (<li class="product">) y la paginación (<nav class="woocommerce-pagination">,
+# <a class="next">). Todo lo demás (menús, footer, scripts...) se puede saltar.
+PARTIAL_PARSE_CLASSES = {'product', 'woocommerce-pagination', 'next', 'next-page'}
+
+# Modos de descubrimiento de páginas (parámetro discovery de iter_pages)
+# - 'links': seguir el enlace "Siguiente" página a página (el original)
+# - 'predict': leer el número de páginas de la paginación de la página 1 y
+#   descargar el resto en paralelo usando el patrón /page/N/ de WooCommerce
+DISCOVERY_MODES = ('links', 'predict')
+
+# De dónde se leen los productos (parámetro source de DoctorPetScraper)
+# - 'html': las páginas de la categoría, como las ve un navegador (el original)
+# - 'api': la Store API de WooCommerce (JSON, 100 productos por petición);
+#   si no está disponible se vuelve automáticamente al HTML
+FETCH_SOURCES = ('html', 'api')
+
+# Hilos que descargan páginas en paralelo en el modo discovery='predict'
+# Chain of Thought: Más hilos NO significan más peticiones por segundo:
+# todas pasan por el mismo RateLimiter. Los hilos solo solapan las esperas.
+PAGE_WORKERS = 4
+
+# Páginas predichas por hilo que se encargan por adelantado
+# Chain of Thought: Si se encargaran todas de golpe, parar el generador
+# (Ctrl+C, o quien consume ya no quiere más) esperaría a que se descargaran
+# TODAS, para tirarlas. Así solo se espera a las que ya están en marcha.
+PREDICTED_PAGES_PER_WORKER = 2
+
+# Patrón del número de página en las URLs de WooCommerce:
+# .../page/3/ (enlaces "bonitos") o ...?paged=3
+PAGE_NUMBER_PATTERN = re.compile(r'(?:/page/|[?&]paged=)(\d+)')
+
+# Categorías que se scrapean a la vez en el modo por lotes (BatchCrawler)
+BATCH_WORKERS = 4
+
+# Procesos que parsean HTML en paralelo (ver ParserPool)
+# Chain of Thought: Parsear es trabajo de CPU. Con hilos, el GIL de Python
+# deja que solo uno parsee a la vez; con procesos cada núcleo parsea una página.
+PARSE_WORKERS = os.cpu_count() or 1
+
+# Páginas por proceso que pueden esperar a ser parseadas
+# Chain of Thought: Si las descargas van más rápido que el parseo, las
+# páginas descargadas se acumularían en memoria. Con este límite, quien
+# descarga espera a que haya sitio en la cola (backpressure).
+PARSE_QUEUE_PER_WORKER = 2
+
+# Control adaptativo de peticiones simultáneas (ver ConcurrencyController)
+# Chain of Thought: Con valores fijos, o vamos lentos cuando la web va bien o
+# la saturamos cuando va mal. El controlador sube el límite de uno en uno
+# mientras la latencia (p95) y los errores se mantienen bajos, y lo divide
+# entre dos en cuanto el servidor da señales de saturación (AIMD, como TCP).
+# Con él, el ritmo lo marcan las peticiones en vuelo (límite / latencia
+# peticiones por segundo) y REQUESTS_PER_SECOND se sustituye por un techo
+# más alto (ADAPTIVE_MAX_RATE): con el límite fijo de siempre, subir el
+# número de peticiones simultáneas no podría acelerar nada.
+ADAPTIVE_MIN_CONCURRENCY = 1
+ADAPTIVE_INITIAL_CONCURRENCY = PAGE_WORKERS  # se empieza como sin --adaptive
+ADAPTIVE_MAX_CONCURRENCY = 16  # techo: nunca más peticiones en vuelo que esto
+ADAPTIVE_MAX_RATE = 5.0  # techo de peticiones por segundo, por cortesía con la web
+ADAPTIVE_LATENCY_TARGET = 2.0  # segundos; p95 por encima = el servidor sufre
+ADAPTIVE_ERROR_THRESHOLD = 0.05  # proporción de peticiones fallidas tolerada
+ADAPTIVE_DECREASE_FACTOR = 0.5  # el límite se multiplica por esto al bajar
+ADAPTIVE_WINDOW = 20  # peticiones que se miran antes de decidir subir
+ADAPTIVE_POLL_INTERVAL = 0.01  # segundos entre comprobaciones en modo asíncrono
+
+# Número máximo de peticiones simultáneas en el modo asíncrono
+# Chain of Thought: Aunque el modo asíncrono puede lanzar muchas peticiones a la
+# vez, ponemos un límite para no abrir cientos de conexiones contra el servidor.
+ASYNC_MAX_CONCURRENCY = 5
+
+
+# ============================================================================
+# LIMITADOR DE VELOCIDAD (TOKEN BUCKET)
+# ============================================================================
+# Chain of Thought: Un "token bucket" (cubo de fichas) funciona así:
+# - El cubo se llena con fichas a una velocidad fija (rate fichas por segundo)
+# - El cubo tiene una capacidad máxima (burst)
+# - Cada petición gasta una ficha; si no hay fichas, hay que esperar
+# Así permitimos pequeñas ráfagas pero la velocidad media nunca supera 'rate'.
+
+class RateLimiter:
+    """
+    Limitador de velocidad tipo token bucket, seguro para hilos y tareas asyncio
+    
+    Uso básico:
+        limiter = RateLimiter(rate=0.5, burst=2)
+        limiter.acquire()              # código normal (bloquea si hace falta)
+        await limiter.acquire_async()  # código asíncrono
+    
+    Chain of Thought: Un mismo limitador puede compartirse entre varios hilos o
+    tareas. Cada llamada "reserva" su ficha dentro de un lock y luego espera
+    fuera del lock, así nadie bloquea a los demás mientras duerme.
+    """
+    
+    def __init__(self, rate: float = REQUESTS_PER_SECOND, burst: int = REQUEST_BURST,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Args:
+            rate: Fichas (peticiones) por segundo de forma sostenida
+            burst: Máximo de fichas acumuladas (tamaño de la ráfaga)
+            clock: Reloj en segundos (los tests pasan uno falso)
+            sleep: Función de espera de acquire() (los tests pasan una falsa)
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate debe ser > 0 y burst >= 1")
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+    
+    def _reserve(self) -> float:
+        """
+        Reserva una ficha y devuelve cuántos segundos hay que esperar para usarla
+        
+        Nota para junior: Las fichas pueden quedar en negativo. Eso significa
+        que hay peticiones "en cola" esperando a que el cubo se rellene.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+    
+    def acquire(self) -> None:
+        """Espera (bloqueando) hasta poder hacer una petición"""
+        wait_time = self._reserve()
+        if wait_time > 0:
+            self._sleep(wait_time)
+    
+    async def acquire_async(self) -> None:
+        """Espera (sin bloquear el event loop) hasta poder hacer una petición"""
+        wait_time = self._reserve()
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+
+# ============================================================================
+# POLÍTICA DE REINTENTOS (BACKOFF, RETRY-AFTER Y CIRCUIT BREAKER)
+# ============================================================================
+# Chain of Thought: Si el servidor falla y todos los hilos reintentan tras la
+# misma pausa fija, todos vuelven A LA VEZ y lo tumban de nuevo. Por eso:
+# - Backoff exponencial: cada reintento espera el doble que el anterior
+# - Jitter: la pausa es un número al azar entre 0 y ese máximo, así los
+#   reintentos de distintos hilos se reparten en el tiempo
+# - Retry-After: si el servidor dice cuánto esperar (429/503), le hacemos caso
+# - Circuit breaker: tras varios fallos seguidos contra un servidor, se pausa
+#   ese servidor un rato para TODOS los hilos, en lugar de seguir insistiendo
+# - Deadline: un tiempo total máximo para el scraping; al agotarse no se
+#   lanzan más peticiones (y --resume permite continuar después)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Convierte el header Retry-After en segundos de espera
+
+    Ejemplos: "120" -> 120.0; "Wed, 21 Oct 2026 07:28:00 GMT" -> segundos hasta esa fecha
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """
+    Decide cuánto esperar entre reintentos y cuándo dejar de intentarlo
+
+    Uso básico:
+        policy = RetryPolicy(deadline=3600)        # como mucho una hora en total
+        scraper = DoctorPetScraper(retry_policy=policy)
+
+    Chain of Thought: Igual que RateLimiter, no duerme nunca: sus métodos
+    DEVUELVEN los segundos de espera y quien llama duerme con time.sleep()
+    o con asyncio.sleep(). Así la misma política sirve al scraper normal y al
+    asíncrono, y puede compartirse entre varios scrapers (ver BatchCrawler)
+    para que el circuit breaker y el deadline sean comunes.
+    """
+
+    def __init__(self, max_attempts: int = MAX_RETRIES, base_delay: Optional[float] = None,
+                 max_delay: float = RETRY_MAX_DELAY, max_retry_after: float = RETRY_AFTER_MAX,
+                 failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 cooldown: float = CIRCUIT_COOLDOWN, deadline: Optional[float] = None,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            max_attempts: Intentos por petición (el primero incluido)
+            base_delay: Pausa máxima tras el primer fallo; se dobla en cada
+                reintento (None = DELAY_BETWEEN_REQUESTS)
+            max_delay: Límite de la pausa entre reintentos
+            max_retry_after: Mayor Retry-After que se respeta; si el servidor
+                pide más, la petición se da por fallida
+            failure_threshold: Fallos seguidos contra un servidor antes de pausarlo
+            cooldown: Segundos que dura la pausa de un servidor
+            deadline: Segundos totales del scraping (None = sin límite). Se
+                empiezan a contar en start()
+            seed: Semilla del azar del jitter (para pruebas reproducibles)
+        """
+        if max_attempts < 1 or failure_threshold < 1:
+            raise ValueError("max_attempts y failure_threshold deben ser >= 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.deadline = deadline
+        self._random = random.Random(seed)
+        self._deadline_at: Optional[float] = None
+        # {servidor: [fallos seguidos, pausado hasta (time.monotonic())]}
+        self._hosts: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Deadline
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """
+        Empieza a contar el deadline (solo la primera vez)
+
+        Nota para junior: Si varios scrapers comparten la política, el primero
+        que empieza pone en marcha el reloj y el límite es para todos juntos.
+        """
+        with self._lock:
+            if self.deadline is not None and self._deadline_at is None:
+                self._deadline_at = time.monotonic() + self.deadline
+
+    def remaining(self) -> Optional[float]:
+        """Segundos que quedan del deadline (None = sin límite)"""
+        if self._deadline_at is None:
+            return None
+        return max(0.0, self._deadline_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """True si se agotó el deadline"""
+        return self.remaining() == 0.0
+
+    def fits(self, wait_time: float) -> bool:
+        """True si da tiempo a esperar 'wait_time' segundos antes del deadline"""
+        remaining = self.remaining()
+        return remaining is None or wait_time < remaining
+
+    def timeout(self, default: float = REQUEST_TIMEOUT) -> float:
+        """Timeout de una petición, recortado para no pasarse del deadline"""
+        remaining = self.remaining()
+        return default if remaining is None else max(0.1, min(default, remaining))
+
+    # ------------------------------------------------------------------
+    # Backoff
+    # ------------------------------------------------------------------
+    def is_retryable(self, status: int) -> bool:
+        """True si el código HTTP indica un problema temporal (ver RETRY_STATUSES)"""
+        return status in RETRY_STATUSES
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Segundos a esperar antes del siguiente intento
+
+        Args:
+            attempt: Intento que acaba de fallar (0 = el primero)
+            retry_after: Segundos que pidió el servidor (header Retry-After)
+
+        Returns:
+            Segundos de espera, o None si no hay que reintentar (el servidor
+            pide esperar demasiado o no da tiempo antes del deadline)
+
+        Chain of Thought: "Full jitter": la pausa es un valor al azar entre 0
+        y base * 2^intento. De media se espera la mitad que con una pausa
+        fija, y los hilos que fallaron a la vez ya no reintentan a la vez.
+        """
+        if retry_after is not None and retry_after > self.max_retry_after:
+            return None
+        base = DELAY_BETWEEN_REQUESTS if self.base_delay is None else self.base_delay
+        with self._lock:
+            wait_time = self._random.uniform(0, min(self.max_delay, base * 2 ** attempt))
+        if retry_after is not None:
+            wait_time = max(wait_time, retry_after)
+        return wait_time if self.fits(wait_time) else None
+
+    # ------------------------------------------------------------------
+    # Circuit breaker (por servidor)
+    # ------------------------------------------------------------------
+    def host_wait(self, host: str) -> float:
+        """Segundos que faltan para que el servidor deje de estar pausado (0 = disponible)"""
+        with self._lock:
+            state = self._hosts.get(host)
+            return max(0.0, state[1] - time.monotonic()) if state else 0.0
+
+    def record_success(self, host: str) -> None:
+        """Una petición al servidor funcionó: se reinicia su cuenta de fallos"""
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host: str, retry_after: Optional[float] = None) -> bool:
+        """
+        Una petición al servidor falló (timeout, conexión, 429 o 5xx)
+
+        Args:
+            host: Servidor (ej: 'doctorpet.co')
+            retry_after: Si el servidor pidió esperar, se pausa al menos ese
+                tiempo para TODAS las peticiones a él, no solo esta
+
+        Returns:
+            True si con este fallo el servidor queda pausado (circuito abierto)
+
+        Nota para junior: Tras la pausa no se pone la cuenta a cero: si la
+        primera petición después de la pausa vuelve a fallar, el servidor se
+        pausa otra vez enseguida ("half-open"). Un solo éxito lo reinicia.
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._hosts.setdefault(host, [0, 0.0])
+            state[0] += 1
+            paused_until = state[1]
+            if state[0] >= self.failure_threshold:
+                state[1] = max(state[1], now + self.cooldown)
+            if retry_after is not None:
+                state[1] = max(state[1], now + min(retry_after, self.max_retry_after))
+            return state[1] > max(paused_until, now)
+
+
+# ============================================================================
+# CONTROL ADAPTATIVO DE CONCURRENCIA (AIMD)
+# ============================================================================
+# Chain of Thought: AIMD = "Additive Increase, Multiplicative Decrease":
+# - Mientras el servidor responde rápido y sin errores, el límite de
+#   peticiones en vuelo sube de uno en uno (se tantea con cuidado)
+# - Ante un 429, un 5xx o un timeout (o si la latencia se dispara), el límite
+#   se divide entre dos (se retrocede rápido)
+# Así el scraping va tan rápido como la web aguanta en cada momento, sin
+# pasarse nunca del techo configurado ni del RateLimiter.
+
+class ConcurrencyController:
+    """
+    Límite de peticiones simultáneas que se ajusta solo según la latencia y los errores
+
+    Uso básico:
+        controller = ConcurrencyController(max_limit=8)
+        scraper = DoctorPetScraper(concurrency=controller)
+        ...
+        print(controller.limit)  # límite al que se llegó
+
+        # A mano (el scraper lo hace en cada petición):
+        ticket = controller.acquire()
+        ...  # hacer la petición
+        controller.release(ticket, latencia, overload=(status == 503))
+
+    Chain of Thought: Cada acquire() devuelve un número de "ticket". Cuando
+    el límite baja, las peticiones que ya estaban en vuelo (tickets
+    anteriores) pueden fallar también, pero solo por el mismo problema: sus
+    fallos no vuelven a bajar el límite. Sin esto, 8 peticiones que fallan a
+    la vez dividirían el límite entre 256.
+
+    Nota para junior: Se puede compartir entre varios scrapers (hilos) y con
+    el modo asíncrono; es el mismo servidor y la misma capacidad. Los
+    scrapers que lo usan sin un rate_limiter propio usan su 'rate_limiter'
+    (el techo max_rate) en lugar del límite fijo de REQUESTS_PER_SECOND.
+    """
+
+    def __init__(self, max_limit: int = ADAPTIVE_MAX_CONCURRENCY,
+                 min_limit: int = ADAPTIVE_MIN_CONCURRENCY, initial_limit: Optional[int] = None,
+                 latency_target: float = ADAPTIVE_LATENCY_TARGET,
+                 error_threshold: float = ADAPTIVE_ERROR_THRESHOLD,
+                 decrease_factor: float = ADAPTIVE_DECREASE_FACTOR,
+                 window: int = ADAPTIVE_WINDOW, max_rate: float = ADAPTIVE_MAX_RATE):
+        """
+        Args:
+            max_limit: Techo de peticiones en vuelo
+            min_limit: Suelo (nunca se baja de aquí)
+            initial_limit: Límite al empezar (None = ADAPTIVE_INITIAL_CONCURRENCY,
+                dentro de [min_limit, max_limit])
+            latency_target: p95 de latencia (segundos) por encima del cual se baja
+            error_threshold: Proporción de errores por encima de la cual se baja
+            decrease_factor: Factor por el que se multiplica el límite al bajar
+            window: Peticiones terminadas que se evalúan antes de subir
+            max_rate: Techo de peticiones por segundo (ver 'rate_limiter')
+        """
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Se necesita 1 <= min_limit <= max_limit")
+        if not 0 < decrease_factor < 1 or window < 1:
+            raise ValueError("decrease_factor debe estar entre 0 y 1, y window >= 1")
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.decrease_factor = decrease_factor
+        self.window = window
+        self.rate_limiter = RateLimiter(rate=max_rate)
+        if initial_limit is None:
+            initial_limit = ADAPTIVE_INITIAL_CONCURRENCY
+        # Chain of Thought: float para que las bajadas sucesivas no se
+        # redondeen siempre hacia abajo (5 -> 2.5 -> 1.25...)
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._issued = 0  # tickets entregados
+        self._decreased_at = 0  # último ticket entregado cuando se bajó el límite
+        self._saturated = False  # ¿se llegó al límite en esta ventana?
+        self._samples: List[Tuple[float, bool]] = []  # (latencia, falló)
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """Peticiones que pueden estar en vuelo ahora mismo"""
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        """Peticiones en vuelo ahora mismo"""
+        return self._in_flight
+
+    def _try_acquire(self) -> Optional[int]:
+        """Ocupa un hueco si lo hay (llamar con el lock tomado)"""
+        if self._in_flight >= self.limit:
+            self._saturated = True
+            return None
+        self._in_flight += 1
+        self._issued += 1
+        if self._in_flight >= self.limit:
+            self._saturated = True
+        return self._issued
+
+    def acquire(self) -> int:
+        """Espera (bloqueando) a que haya hueco y devuelve el ticket de la petición"""
+        with self._condition:
+            ticket = self._try_acquire()
+            while ticket is None:
+                self._condition.wait()
+                ticket = self._try_acquire()
+            return ticket
+
+    async def acquire_async(self) -> int:
+        """
+        Versión asíncrona de acquire()
+
+        Chain of Thought: El controlador se comparte con hilos normales, que
+        no pueden despertar al event loop desde un Condition. Comprobamos
+        cada ADAPTIVE_POLL_INTERVAL: 10 ms es nada frente a una petición HTTP.
+        """
+        while True:
+            with self._condition:
+                ticket = self._try_acquire()
+            if ticket is not None:
+                return ticket
+            await asyncio.sleep(ADAPTIVE_POLL_INTERVAL)
+
+    def release(self, ticket: int, latency: float, error: bool = False,
+                overload: bool = False) -> Optional[str]:
+        """
+        Libera el hueco de una petición terminada y ajusta el límite
+
+        Args:
+            ticket: El que devolvió acquire()
+            latency: Segundos que tardó la petición
+            error: La petición falló (cualquier motivo)
+            overload: El fallo indica saturación del servidor (429, 5xx,
+                timeout, conexión rechazada): baja el límite enseguida
+
+        Returns:
+            'increase' o 'decrease' si el límite cambió, None si no
+        """
+        with self._condition:
+            self._in_flight -= 1
+            self._samples.append((latency, error or overload))
+            change = None
+            if overload:
+                change = self._decrease(ticket)
+            elif len(self._samples) >= self.window:
+                change = self._evaluate(ticket)
+            self._condition.notify_all()
+            return change
+
+    def _p95(self) -> float:
+        latencies = sorted(latency for latency, _ in self._samples)
+        return latencies[max(0, math.ceil(len(latencies) * 0.95) - 1)]
+
+    def _evaluate(self, ticket: int) -> Optional[str]:
+        """Decide con la ventana completa: subir, bajar o dejarlo igual"""
+        error_rate = sum(failed for _, failed in self._samples) / len(self._samples)
+        if self._p95() > self.latency_target or error_rate > self.error_threshold:
+            return self._decrease(ticket)
+        # Chain of Thought: Solo se sube si el límite se llegó a usar: si
+        # nunca hubo tantas peticiones a la vez, no sabemos si el servidor
+        # aguantaría una más
+        saturated = self._saturated
+        self._samples.clear()
+        self._saturated = False
+        if saturated and self._limit < self.max_limit:
+            self._limit = min(self.max_limit, self._limit + 1)
+            return 'increase'
+        return None
+
+    def _decrease(self, ticket: int) -> Optional[str]:
+        # Chain of Thought: La ventana se vacía SIEMPRE, también si la bajada
+        # se descarta: si no, esas mismas muestras malas bajarían el límite
+        # otra vez en cuanto termine una petición nueva
+        self._samples.clear()
+        self._saturated = False
+        if ticket <= self._decreased_at:
+            return None  # ya estaba en vuelo cuando se bajó por este problema
+        self._decreased_at = self._issued
+        new_limit = max(self.min_limit, self._limit * self.decrease_factor)
+        changed = int(new_limit) != self.limit
+        self._limit = new_limit
+        return 'decrease' if changed else None
+
+
+# ============================================================================
+# REGISTRO COMPACTO DE PRODUCTO
+# ============================================================================
+# Chain of Thought: Un diccionario de Python por producto ocupa bastante más
+# que sus datos: guarda una tabla hash con espacio libre, y cada texto
+# repetido ('Disponible', 'N/A', el mismo precio...) es un objeto distinto.
+# Con millones de productos en memoria (ej: meses de scrapings para un
+# análisis) eso domina el consumo. Product usa __slots__ (atributos fijos, sin
+# diccionario interno) y comparte los textos repetidos.
+
+# Valor de los campos que no se encontraron
+# Nota para junior: sys.intern() garantiza que todos los 'N/A' son el MISMO
+# objeto en memoria, en lugar de miles de copias iguales
+MISSING = sys.intern('N/A')
+
+
+def _shared(value):
+    """Devuelve la copia compartida (interned) de un texto repetitivo"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def _restore_product(values: tuple, extra: Optional[dict]) -> 'Product':
+    """Reconstruye un Product (lo usa pickle, ej: al pasarlo entre procesos)"""
+    return Product(*values, **(extra or {}))
+
+
+class Product(Mapping):
+    """
+    Un producto extraído: compacto, inmutable y usable como un diccionario
+    
+    Uso básico:
+        producto = Product(nombre="Snack", precio="12.500 $", enlace="https://...")
+        producto.nombre          # 'Snack'
+        producto['precio']       # '12.500 $' (igual que con el dict de antes)
+        producto.get('imagen')   # 'N/A' (los campos sin valor valen MISSING)
+        dict(producto)           # {'nombre': 'Snack', ...}
+    
+    Los campos fijos son los de CSV_FIELDNAMES; cualquier campo adicional
+    (ej: precios normalizados) se guarda en 'extra'.
+    
+    Nota para junior: "inmutable" significa que no se puede modificar
+    (producto.precio = "x" da error). Para obtener una versión cambiada usa
+    producto.replace(precio="x"), que devuelve un Product nuevo.
+    """
+    
+    __slots__ = ('nombre', 'precio', 'precio_anterior', 'disponibilidad', 'enlace', 'imagen', 'extra')
+    FIELDS = tuple(CSV_FIELDNAMES)
+    
+    def __init__(self, nombre: str = MISSING, precio: str = MISSING, precio_anterior: str = MISSING,
+                 disponibilidad: str = MISSING, enlace: str = MISSING, imagen: str = MISSING,
+                 **extra):
+        # Chain of Thought: Los precios y la disponibilidad se repiten muchísimo
+        # entre productos y entre scrapings, así que compartimos sus textos
+        _set = object.__setattr__
+        _set(self, 'nombre', nombre)
+        _set(self, 'precio', _shared(precio))
+        _set(self, 'precio_anterior', _shared(precio_anterior))
+        _set(self, 'disponibilidad', _shared(disponibilidad))
+        _set(self, 'enlace', enlace)
+        _set(self, 'imagen', imagen)
+        _set(self, 'extra', extra or None)
+    
+    @classmethod
+    def from_dict(cls, data: Mapping, intern_all: bool = False) -> 'Product':
+        """
+        Crea un Product a partir de un diccionario (ej: una fila de CSV o JSON)
+        
+        Args:
+            data: Diccionario con los campos del producto
+            intern_all: Compartir también nombre, enlace e imagen. Útil al
+                juntar muchos scrapings en memoria: el mismo producto aparece
+                en cada uno con los mismos textos, y así se guardan una sola vez.
+        """
+        if intern_all:
+            return cls(**{key: _shared(value) for key, value in data.items()})
+        return data if type(data) is cls else cls(**data)
+    
+    def replace(self, **changes) -> 'Product':
+        """Devuelve una copia con algunos campos cambiados"""
+        return Product(**{**self, **changes})
+    
+    def to_dict(self) -> Dict[str, str]:
+        """Devuelve un diccionario normal (ej: para guardarlo como JSON)"""
+        return dict(self)
+    
+    # --- Interfaz de diccionario (Mapping) ---
+    
+    def __getitem__(self, key: str):
+        if key in _PRODUCT_FIELD_SET:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        yield from self.FIELDS
+        if self.extra:
+            yield from self.extra
+    
+    def __len__(self) -> int:
+        return len(self.FIELDS) + len(self.extra or ())
+    
+    def __contains__(self, key) -> bool:
+        return key in _PRODUCT_FIELD_SET or bool(self.extra and key in self.extra)
+    
+    # --- Inmutabilidad, comparación y copia ---
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("Product es inmutable; usa producto.replace(...)")
+    
+    __delattr__ = __setattr__
+    
+    def _values(self) -> tuple:
+        return (self.nombre, self.precio, self.precio_anterior, self.disponibilidad,
+                self.enlace, self.imagen)
+    
+    def __eq__(self, other):
+        if type(other) is Product:
+            return self._values() == other._values() and self.extra == other.extra
+        return Mapping.__eq__(self, other)
+    
+    def __hash__(self) -> int:
+        return hash((self._values(), tuple(self.extra.items()) if self.extra else None))
+    
+    def __reduce__(self):
+        return _restore_product, (self._values(), self.extra)
+    
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{key}={value!r}" for key, value in self.items())
+        return f"Product({fields})"
+
+
+_PRODUCT_FIELD_SET = frozenset(Product.FIELDS)
+
+
+class ListingPage(NamedTuple):
+    """
+    Resultado de procesar una página de listado de productos
+
+    Attributes:
+        url: URL de la página procesada
+        products: Productos extraídos de la página
+        next_url: URL de la siguiente página (None si es la última)
+        element_count: Número de elementos <li class="product"> encontrados
+
+    Nota para junior: NamedTuple es una tupla con nombres en sus campos,
+    así podemos escribir page.products en lugar de page[0].
+    """
+    url: str
+    products: List[Product]
+    next_url: Optional[str]
+    element_count: int
+
+
+# ============================================================================
+# PARSEO PARCIAL CON SOUPSTRAINER
+# ============================================================================
+# Chain of Thought: Un SoupStrainer le dice a BeautifulSoup qué etiquetas
+# guardar MIENTRAS parsea. Las etiquetas que no encajan (y todo su contenido)
+# ni siquiera se convierten en objetos Python, así que se ahorra tiempo y memoria.
+
+def _is_listing_class(class_value: Optional[str]) -> bool:
+    """
+    Indica si el atributo class contiene alguna de PARTIAL_PARSE_CLASSES
+    
+    Nota para junior: Durante el parseo, BeautifulSoup nos pasa el atributo
+    class como texto completo (ej: "product type-product instock"), así que
+    lo separamos por espacios.
+    """
+    return bool(class_value) and not PARTIAL_PARSE_CLASSES.isdisjoint(class_value.split())
+
+
+LISTING_STRAINER = SoupStrainer(['li', 'nav', 'a'], class_=_is_listing_class)
+
+
+# ============================================================================
+# SELECTORES XPATH PRECOMPILADOS (MOTOR LXML)
+# ============================================================================
+# Chain of Thought: BeautifulSoup es cómodo pero lento: construye su propio
+# árbol de objetos Python y cada find() lo recorre entero. lxml trabaja en C,
+# y si compilamos los selectores XPath una sola vez (al importar el módulo),
+# cada búsqueda es muy barata.
+#
+# Cada selector reproduce EXACTAMENTE un find() de _extract_product_info o de
+# _get_next_page_url, para que ambos motores den los mismos datos.
+#
+# Nota para junior: "descendant::h2[1]" significa "el primer <h2> dentro de
+# este elemento", igual que find('h2') en BeautifulSoup.
+
+def _xpath_has_class(class_name: str) -> str:
+    """Condición XPath equivalente a class_='...' de BeautifulSoup"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+_XP_PRODUCTS = etree.XPath(f"//li[{_xpath_has_class('product')}]")
+_XP_LINK = etree.XPath("descendant::a[@href][1]")
+_XP_TITLES = [
+    etree.XPath(f"descendant::h2[{_xpath_has_class('woocommerce-loop-product__title')}][1]"),
+    etree.XPath(f"descendant::h3[{_xpath_has_class('woocommerce-loop-product__title')}][1]"),
+    etree.XPath("descendant::h2[1]"),
+    etree.XPath("descendant::h3[1]"),
+]
+_XP_PRICE = etree.XPath(f"descendant::span[{_xpath_has_class('price')}][1]")
+_XP_INS = etree.XPath("descendant::ins[1]")
+_XP_DEL = etree.XPath("descendant::del[1]")
+_XP_AMOUNT = etree.XPath(f"descendant::span[{_xpath_has_class('woocommerce-Price-amount')}][1]")
+_XP_IMAGE = etree.XPath("descendant::img[1]")
+_XP_ADD_TO_CART = etree.XPath(f"descendant::a[{_xpath_has_class('add_to_cart_button')}][1]")
+_XP_STOCK = etree.XPath(f"descendant::span[{_xpath_has_class('stock')}][1]")
+# Chain of Thought: find(string=...) de BeautifulSoup mira todos los textos,
+# incluidos los comentarios HTML, así que aquí hacemos lo mismo
+_XP_ALL_STRINGS = etree.XPath("descendant::text() | descendant::comment()")
+# Chain of Thought: get_text() de BeautifulSoup ignora el contenido de
+# <script>, <style> y <template>, y también los comentarios
+_XP_VISIBLE_TEXT = etree.XPath(
+    "descendant::text()[not(ancestor::script or ancestor::style or ancestor::template)]"
+)
+
+_XP_NEXT_LINKS = [
+    etree.XPath(f"(//a[{_xpath_has_class('next')}])[1]"),
+    etree.XPath(f"(//a[{_xpath_has_class('next-page')}])[1]"),
+]
+_XP_ALL_LINKS = etree.XPath("//a")
+_XP_PAGINATION = etree.XPath(f"(//nav[{_xpath_has_class('woocommerce-pagination')}])[1]")
+_XP_CURRENT_PAGE = etree.XPath(f"descendant::span[{_xpath_has_class('current')}][1]")
+# Chain of Thought: find_next() busca en todo lo que viene después en el
+# documento, incluidos los hijos del propio elemento
+_XP_FOLLOWING_LINK = etree.XPath("(descendant::a[@href] | following::a[@href])[1]")
+
+
+def _lxml_first(xpath: etree.XPath, element) -> Optional[etree._Element]:
+    """Devuelve el primer resultado de un XPath, o None (como find())"""
+    result = xpath(element)
+    return result[0] if result else None
+
+
+def _lxml_text(element) -> str:
+    """Equivalente a get_text(strip=True) de BeautifulSoup"""
+    return ''.join(text.strip() for text in _XP_VISIBLE_TEXT(element))
+
+
+def _lxml_string(element) -> Optional[str]:
+    """
+    Equivalente a la propiedad .string de BeautifulSoup
+    
+    Nota para junior: .string solo tiene valor si el elemento contiene UN único
+    hijo; si ese hijo es otra etiqueta, se mira dentro de ella.
+    """
+    children = list(element)
+    if not children:
+        return element.text
+    if len(children) == 1 and not element.text and not children[0].tail:
+        child = children[0]
+        if not isinstance(child.tag, str):  # comentario o instrucción
+            return child.text
+        return _lxml_string(child)
+    return None
+
 
 # ============================================================================
 # CLASE PRINCIPAL DEL SCRAPER
@@ -115,36 +981,151 @@ class DoctorPetScraper:
         scraper.save_to_csv(productos)
     """
     
-    def __init__(self, base_url: str = BASE_URL):
+    def __init__(self, base_url: str = BASE_URL, rate_limiter: Optional[RateLimiter] = None,
+                 engine: str = 'bs4', partial_parse: bool = False,
+                 http_cache: Optional[HTTPCache] = None,
+                 page_cache: Optional[ParsedPageCache] = None,
+                 session: Optional[requests.Session] = None,
+                 parser_pool: Optional['ParserPool'] = None,
+                 archive: Optional[PageArchive] = None,
+                 replay: Optional[PageArchive] = None,
+                 metrics: Optional[Metrics] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 source: str = 'html',
+                 concurrency: Optional[ConcurrencyController] = None):
         """
         Inicializa el scraper
         
         Args:
             base_url: URL de la categoría a scrapear
+            rate_limiter: Limitador de velocidad (se crea uno por defecto si no
+                se provee). Pásale el mismo a varios scrapers para que compartan
+                el límite de peticiones.
+            engine: Motor de extracción: 'bs4' (BeautifulSoup) o 'lxml'
+                (más rápido, mismos resultados). Ver PARSER_ENGINES.
+            partial_parse: Solo con engine='bs4'. Si es True, BeautifulSoup solo
+                construye los productos y la paginación (ver LISTING_STRAINER).
+            http_cache: Caché HTTP en disco (ver cache.HTTPCache). Si se
+                provee, las páginas sin cambios no se vuelven a descargar.
+            page_cache: Caché de páginas parseadas (ver cache.ParsedPageCache).
+                Si se provee, un HTML idéntico a uno ya visto no se vuelve a parsear.
+            session: Sesión HTTP a usar. Pásale la misma a varios scrapers para
+                que compartan el pool de conexiones (ver BatchCrawler).
+            parser_pool: Procesos donde parsear las páginas (ver ParserPool).
+                Si se provee, los hilos que descargan no parsean: solo
+                entregan el HTML y esperan el resultado.
+            archive: Archivo donde guardar cada página descargada (ver
+                archive.PageArchive), para poder reprocesarla sin red.
+            replay: Archivo del que LEER las páginas en lugar de descargarlas
+                (modo sin red). Las URLs que no estén en él se dan por fallidas.
+            metrics: Registro de métricas (ver metrics.Metrics). Si se provee,
+                se mide cuánto tarda cada etapa (conexión, primer byte,
+                descarga, parseo, extracción, escritura) y se cuentan
+                peticiones, reintentos, bytes y aciertos de caché.
+            retry_policy: Pausas entre reintentos, circuit breaker y deadline
+                (se crea una por defecto). Pásale la misma a varios scrapers
+                para que compartan las pausas de cada servidor y el deadline.
+            source: De dónde leer los productos: 'html' o 'api' (Store API de
+                WooCommerce, con vuelta al HTML si no responde). Ver FETCH_SOURCES.
+                AsyncDoctorPetScraper lee siempre el HTML.
+            concurrency: Límite adaptativo de peticiones simultáneas (ver
+                ConcurrencyController). Si se provee, cada petición ocupa un
+                hueco y su latencia y resultado ajustan el límite. Pásale el
+                mismo a varios scrapers para que lo compartan. Sin
+                rate_limiter propio se usa el del controlador (su techo).
             
         Explicación para junior:
             __init__ es el constructor, se ejecuta cuando creamos un objeto.
             Aquí inicializamos variables que usaremos en toda la clase.
         """
+        if engine not in PARSER_ENGINES:
+            raise ValueError(f"Motor desconocido: {engine!r}. Opciones: {PARSER_ENGINES}")
+        if source not in FETCH_SOURCES:
+            raise ValueError(f"Origen desconocido: {source!r}. Opciones: {FETCH_SOURCES}")
+        
         self.base_url = base_url
         self.headers = HEADERS
+        self.engine = engine
+        self.partial_parse = partial_parse
+        self.source = source
+        self.http_cache = http_cache
+        self.page_cache = page_cache
+        self.parser_pool = parser_pool
+        self.archive = archive
+        self.replay = replay
+        self.metrics = metrics
+        # Chain of Thought: Todas las métricas llevan la categoría como
+        # etiqueta, así se ve en qué categoría se va el tiempo
+        self.metrics_labels = {'category': category_slug(base_url)}
         
         # Chain of Thought: Usamos Session en lugar de requests.get() directo porque:
         # - Reutiliza conexiones (más eficiente)
         # - Mantiene cookies automáticamente
         # - Permite configurar comportamiento común para todas las peticiones
-        self.session = requests.Session()
+        self.session = session or requests.Session()
         self.session.headers.update(self.headers)
+        if metrics is not None:
+            instrument_session(self.session)
+        
+        # Chain of Thought: Todas las peticiones pasan por el limitador, así la
+        # velocidad hacia el servidor nunca supera la configurada
+        self.rate_limiter = rate_limiter or (concurrency.rate_limiter if concurrency is not None
+                                             else RateLimiter())
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.concurrency = concurrency
         
         logger.info(f"Scraper inicializado para: {base_url}")
     
-    def _make_request(self, url: str, retries: int = MAX_RETRIES) -> Optional[requests.Response]:
+    def _stage(self, stage: str, seconds: float) -> None:
+        """Registra la duración de una etapa (si hay métricas)"""
+        if self.metrics is not None:
+            self.metrics.stage(stage, seconds, **self.metrics_labels)
+    
+    def _count(self, name: str, value: float = 1, **labels: str) -> None:
+        """Suma a un contador (si hay métricas)"""
+        if self.metrics is not None:
+            self.metrics.inc(name, value, **self.metrics_labels, **labels)
+    
+    def _acquire_slot(self) -> Optional[int]:
+        """Espera un hueco del ConcurrencyController (None si no hay controlador)"""
+        return self.concurrency.acquire() if self.concurrency is not None else None
+    
+    async def _acquire_slot_async(self) -> Optional[int]:
+        """Versión asíncrona de _acquire_slot()"""
+        if self.concurrency is None:
+            return None
+        return await self.concurrency.acquire_async()
+    
+    def _release_slot(self, ticket: Optional[int], started: float, error: bool = False,
+                      overload: bool = False) -> None:
+        """
+        Devuelve el hueco al ConcurrencyController con la latencia y el resultado
+        
+        Args:
+            ticket: El de _acquire_slot() (None = no hay controlador)
+            started: time.perf_counter() al empezar la petición
+            error: La petición falló
+            overload: El fallo es de saturación del servidor (429, 5xx, timeout...)
+        """
+        if ticket is None:
+            return
+        change = self.concurrency.release(ticket, time.perf_counter() - started, error, overload)
+        if change:
+            self._count('concurrency_changes_total', direction=change)
+            logger.info("↕ Peticiones simultáneas: %d (%s)", self.concurrency.limit,
+                        'sube' if change == 'increase' else 'baja')
+    
+    def _make_request(self, url: str, retries: Optional[int] = None,
+                      raise_http_errors: bool = False) -> Optional[requests.Response]:
         """
         Hace una petición HTTP con reintentos automáticos
         
         Args:
             url: URL a consultar
-            retries: Número de reintentos si falla
+            retries: Número de intentos si falla (None = los de retry_policy)
+            raise_http_errors: Si es True, los errores HTTP permanentes
+                (PERMANENT_HTTP_STATUSES) se lanzan como requests.HTTPError
+                en lugar de devolver None
             
         Returns:
             Response object si tiene éxito, None si falla
@@ -157,15 +1138,78 @@ class DoctorPetScraper:
         Nota para junior: El prefijo _ en el nombre indica que es un método privado,
         no debe usarse fuera de esta clase.
         """
+        # Chain of Thought: En modo replay no se toca la red (ni el limitador
+        # de velocidad): la página sale del archivo tal como se descargó
+        if self.replay is not None:
+            archived = self.replay.get(url)
+            if archived is None:
+                logger.error("✗ %s no está en el archivo %s", url, self.replay.path)
+                return None
+            logger.info("✓ Página leída del archivo (descargada el %s)", archived.fecha)
+            return archived.to_response()
+        
+        # Chain of Thought: Si tenemos la página en caché, enviamos sus
+        # validadores para que el servidor nos diga si ha cambiado
+        cached = self.http_cache.get(url) if self.http_cache else None
+        conditional_headers = cached.validators() if cached else {}
+        
+        host = urlparse(url).netloc
+        if retries is None:
+            retries = self.retry_policy.max_attempts
         for attempt in range(retries):
+            pause = self._host_pause(host)
+            if pause is None:
+                return None
+            if pause:
+                time.sleep(pause)
+            if attempt:
+                self._count('retries_total')
+            wait_start = time.perf_counter()
+            self.rate_limiter.acquire()
+            self._stage('rate_limit', time.perf_counter() - wait_start)
+            retry_after = None
+            # Chain of Thought: El hueco del controlador se pide DESPUÉS del
+            # RateLimiter, así solo cuenta el tiempo que la petición está de
+            # verdad en el servidor (y la latencia que mide es la suya)
+            ticket = self._acquire_slot()
+            slot_start = time.perf_counter()
+            error = overload = False
             try:
-                logger.info(f"Haciendo petición a: {url} (Intento {attempt + 1}/{retries})")
+                # Chain of Thought: %s en lugar de f-string: si el nivel INFO
+                # está desactivado, el mensaje ni siquiera se construye
+                logger.info("Haciendo petición a: %s (Intento %d/%d)", url, attempt + 1, retries)
                 
+                # Chain of Thought: Con stream=True, get() vuelve en cuanto
+                # llegan los headers, y el cuerpo se lee después. Así podemos
+                # separar el primer byte (ttfb) de la descarga del cuerpo.
+                take_connect_time()
+                request_start = time.perf_counter()
                 response = self.session.get(
                     url,
-                    timeout=REQUEST_TIMEOUT,
-                    allow_redirects=True  # Seguir redirecciones automáticamente
+                    headers=conditional_headers,
+                    timeout=self.retry_policy.timeout(),
+                    allow_redirects=True,  # Seguir redirecciones automáticamente
+                    stream=True
                 )
+                headers_time = time.perf_counter()
+                body = response.content
+                connect_time = take_connect_time()
+                if connect_time:
+                    self._stage('connect', connect_time)
+                self._stage('ttfb', headers_time - request_start - connect_time)
+                self._stage('download', time.perf_counter() - headers_time)
+                self._count('requests_total', status=str(response.status_code))
+                self._count('bytes_total', len(body))
+                
+                # Chain of Thought: 304 = "no ha cambiado desde tu copia"
+                if response.status_code == 304 and cached:
+                    logger.info("✓ Página sin cambios (304), usando la caché")
+                    self._count('cache_hits_total', cache='http')
+                    self.retry_policy.record_success(host)
+                    self.http_cache.touch(url)
+                    response = cached.to_response()
+                    self._archive_page(url, response.content, response.encoding, response.headers)
+                    return response
                 
                 # Chain of Thought: Verificamos el status code porque:
                 # - 200 = éxito
@@ -174,35 +1218,192 @@ class DoctorPetScraper:
                 # - etc.
                 response.raise_for_status()
                 
-                logger.info(f"✓ Petición exitosa: {response.status_code}")
+                logger.info("✓ Petición exitosa: %s", response.status_code)
+                self.retry_policy.record_success(host)
+                if self.http_cache:
+                    self.http_cache.store(url, body, response.encoding, response.headers)
+                self._archive_page(url, body, response.encoding, response.headers,
+                                   response.status_code)
                 return response
                 
             except requests.exceptions.Timeout:
-                logger.warning(f"⚠ Timeout en intento {attempt + 1}/{retries}")
+                overload = True
+                self._count('requests_total', status='timeout')
+                logger.warning("⚠ Timeout en intento %d/%d", attempt + 1, retries)
+                self._record_failure(host)
                 
             except requests.exceptions.ConnectionError:
-                logger.warning(f"⚠ Error de conexión en intento {attempt + 1}/{retries}")
+                overload = True
+                self._count('requests_total', status='connection_error')
+                logger.warning("⚠ Error de conexión en intento %d/%d", attempt + 1, retries)
+                self._record_failure(host)
                 
             except requests.exceptions.HTTPError as e:
-                logger.error(f"✗ Error HTTP: {e}")
-                # Si es un error 404 o similar, no tiene sentido reintentar
-                if response.status_code in [404, 403, 401]:
+                logger.error("✗ Error HTTP: %s", e)
+                # Chain of Thought: Usamos e.response (la respuesta que falló).
+                # Los 4xx, salvo 429, son errores de NUESTRA petición (404,
+                # 403...): reintentar no cambiaría nada
+                status = e.response.status_code if e.response is not None else None
+                if status is None or not self.retry_policy.is_retryable(status):
+                    if raise_http_errors and status in PERMANENT_HTTP_STATUSES:
+                        raise
                     return None
+                overload = True
+                retry_after = parse_retry_after(e.response.headers.get('Retry-After'))
+                self._record_failure(host, retry_after)
                     
             except Exception as e:
-                logger.error(f"✗ Error inesperado: {e}")
+                error = True
+                logger.error("✗ Error inesperado: %s", e)
+            
+            finally:
+                # Chain of Thought: En 'finally' para devolver el hueco también
+                # en los return de arriba, y ANTES de la pausa del backoff
+                self._release_slot(ticket, slot_start, error, overload)
             
             # Chain of Thought: Esperamos más tiempo entre reintentos
-            # (exponential backoff) para no saturar el servidor
+            # (backoff exponencial con jitter, ver RetryPolicy)
+            if attempt < retries - 1:
+                wait_time = self.retry_policy.backoff(attempt, retry_after)
+                if wait_time is None:
+                    logger.error("✗ Sin reintentos para %s: no da tiempo antes del deadline "
+                                 "o el servidor pide esperar demasiado", url)
+                    return None
+                logger.info("Esperando %.1fs antes de reintentar...", wait_time)
+                time.sleep(wait_time)
+        
+        logger.error("✗ Fallo después de %d intentos", retries)
+        return None
+    
+    def fetch_html(self, url: str) -> Optional[str]:
+        """
+        Descarga una página cualquiera y devuelve su HTML (None si falla)
+        
+        Chain of Thought: Pasa por _make_request, así estas descargas (ej: las
+        fichas de producto de details.py) respetan el mismo límite de
+        velocidad, reintentos, cachés y archivo que las páginas de listado.
+        Los enlaces relativos ('/producto/x/') se completan con base_url.
+        """
+        response = self._make_request(urljoin(self.base_url, url))
+        return response.text if response is not None else None
+    
+    def open_stream(self, url: str) -> Optional[BinaryIO]:
+        """
+        Abre una URL para leer su cuerpo por partes (None si falla)
+        
+        Returns:
+            Flujo binario (ya sin el Content-Encoding); hay que cerrarlo
+        
+        Chain of Thought: _make_request() lee el cuerpo entero en memoria
+        (lo necesita para la caché y el archivo). Para los sitemaps, que
+        pueden pesar decenas de MB, entregamos el socket tal cual y el
+        parser lo va leyendo según llega. El límite de velocidad, el circuit
+        breaker, el deadline y los reintentos son los mismos.
+        """
+        if self.replay is not None:
+            archived = self.replay.get(url)
+            if archived is None:
+                logger.error("✗ %s no está en el archivo %s", url, self.replay.path)
+                return None
+            return io.BytesIO(archived.body)
+        
+        host = urlparse(url).netloc
+        retries = self.retry_policy.max_attempts
+        for attempt in range(retries):
+            pause = self._host_pause(host)
+            if pause is None:
+                return None
+            if pause:
+                time.sleep(pause)
+            if attempt:
+                self._count('retries_total')
+            self.rate_limiter.acquire()
+            retry_after = None
+            try:
+                logger.info("Abriendo: %s (Intento %d/%d)", url, attempt + 1, retries)
+                response = self.session.get(url, timeout=self.retry_policy.timeout(), stream=True)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                self._count('requests_total', status='connection_error')
+                logger.warning("⚠ Error de conexión en intento %d/%d: %s", attempt + 1, retries, e)
+                self._record_failure(host)
+            except requests.exceptions.RequestException as e:
+                logger.error("✗ Error en la petición a %s: %s", url, e)
+                return None
+            else:
+                self._count('requests_total', status=str(response.status_code))
+                if response.ok:
+                    self.retry_policy.record_success(host)
+                    if self.archive is not None:
+                        # Chain of Thought: Para archivarlo necesitamos el cuerpo
+                        # entero, así que con --archive se lee de una vez (y
+                        # luego --replay encuentra el sitemap en el archivo)
+                        body = response.content
+                        self._archive_page(url, body, response.encoding, response.headers,
+                                           response.status_code)
+                        return io.BytesIO(body)
+                    # Nota para junior: decode_content=True hace que urllib3
+                    # descomprima el Content-Encoding (gzip) mientras se lee.
+                    # auto_close=False evita que se dé por cerrado al llegar
+                    # al final, antes de que el parser haya leído el búfer.
+                    response.raw.decode_content = True
+                    response.raw.auto_close = False
+                    return response.raw
+                response.close()
+                logger.error("✗ Error HTTP %d en %s", response.status_code, url)
+                if not self.retry_policy.is_retryable(response.status_code):
+                    return None
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                self._record_failure(host, retry_after)
+            
             if attempt < retries - 1:
-                wait_time = DELAY_BETWEEN_REQUESTS * (attempt + 1)
-                logger.info(f"Esperando {wait_time}s antes de reintentar...")
+                wait_time = self.retry_policy.backoff(attempt, retry_after)
+                if wait_time is None:
+                    return None
+                logger.info("Esperando %.1fs antes de reintentar...", wait_time)
                 time.sleep(wait_time)
         
-        logger.error(f"✗ Fallo después de {retries} intentos")
+        logger.error("✗ Fallo después de %d intentos", retries)
         return None
     
-    def _extract_product_info(self, product_element) -> Optional[Dict[str, str]]:
+    def _host_pause(self, host: str) -> Optional[float]:
+        """
+        Segundos a esperar antes de pedir algo a 'host' (None = no pedirlo)
+        
+        Chain of Thought: Aquí se aplican el deadline y el circuit breaker
+        antes de CADA intento; así un servidor pausado lo está para todos los
+        hilos y tareas que comparten la RetryPolicy.
+        """
+        if self.retry_policy.expired():
+            logger.error("✗ Se agotó el tiempo total del scraping (deadline)")
+            return None
+        wait_time = self.retry_policy.host_wait(host)
+        if wait_time and not self.retry_policy.fits(wait_time):
+            logger.error("✗ %s está pausado y no da tiempo a esperar antes del deadline", host)
+            return None
+        if wait_time:
+            logger.warning("⏸ %s está pausado, esperando %.1fs", host, wait_time)
+        return wait_time
+    
+    def _record_failure(self, host: str, retry_after: Optional[float] = None) -> None:
+        """Anota un fallo del servidor en el circuit breaker (y avisa si lo pausa)"""
+        if self.retry_policy.record_failure(host, retry_after):
+            logger.warning("⏸ Pausando las peticiones a %s durante %.0fs",
+                           host, self.retry_policy.host_wait(host))
+            self._count('host_pauses_total')
+    
+    def _archive_page(self, url: str, body: bytes, encoding: Optional[str], headers,
+                      status: int = 200) -> None:
+        """
+        Guarda una página descargada en el archivo (si hay uno configurado)
+        
+        Chain of Thought: Las páginas que llegan como 304 también se guardan
+        (con el contenido de la caché): así el archivo refleja lo que había
+        en la web en CADA scraping, no solo cuando algo cambió.
+        """
+        if self.archive is not None:
+            self.archive.store(url, body, encoding, headers, status)
+    
+    def _extract_product_info(self, product_element) -> Optional[Product]:
         """
         Extrae información de un elemento de producto
         
@@ -232,11 +1433,12 @@ class DoctorPetScraper:
             # Chain of Thought: Usamos valores por defecto para evitar errores
             # si algún campo no se encuentra
             product_data = {
-                'nombre': 'N/A',
-                'precio': 'N/A',
-                'disponibilidad': 'N/A',
-                'enlace': 'N/A',
-                'imagen': 'N/A'
+                'nombre': MISSING,
+                'precio': MISSING,
+                'precio_anterior': MISSING,
+                'disponibilidad': MISSING,
+                'enlace': MISSING,
+                'imagen': MISSING
             }
             
             # Extraer enlace del producto
@@ -275,6 +1477,14 @@ class DoctorPetScraper:
                 else:
                     # Fallback: tomar todo el texto del precio
                     product_data['precio'] = price_element.get_text(strip=True)
+                
+                # Chain of Thought: En las ofertas, WooCommerce muestra el precio
+                # original tachado dentro de <del>. Lo guardamos para poder
+                # calcular el descuento (ver prices.py)
+                del_price = price_element.find('del')
+                if del_price:
+                    original = del_price.find('span', class_='woocommerce-Price-amount') or del_price
+                    product_data['precio_anterior'] = original.get_text(strip=True)
             
             # Extraer imagen
             # Chain of Thought: Las imágenes de productos suelen ser el primer <img>
@@ -310,14 +1520,15 @@ class DoctorPetScraper:
                     product_data['disponibilidad'] = stock_badge.get_text(strip=True)
             
             # Chain of Thought: Solo retornamos el producto si al menos
-            # tenemos nombre y enlace (datos mínimos requeridos)
-            if product_data['nombre'] != 'N/A' or product_data['enlace'] != 'N/A':
-                return product_data
+            # tenemos nombre y enlace (datos mínimos requeridos).
+            # Lo devolvemos como Product (compacto), no como diccionario
+            if product_data['nombre'] != MISSING or product_data['enlace'] != MISSING:
+                return Product(**product_data)
             
             return None
             
         except Exception as e:
-            logger.error(f"Error extrayendo información del producto: {e}")
+            logger.error("Error extrayendo información del producto: %s", e)
             return None
     
     def _get_next_page_url(self, soup: BeautifulSoup, current_url: str) -> Optional[str]:
@@ -370,97 +1581,778 @@ class DoctorPetScraper:
         
         return None
     
-    def scrape_category(self, max_pages: Optional[int] = None) -> List[Dict[str, str]]:
+    def _extract_product_info_lxml(self, product_element) -> Optional[Product]:
         """
-        Scrapea todos los productos de la categoría
+        Versión rápida de _extract_product_info() para el motor 'lxml'
         
         Args:
-            max_pages: Número máximo de páginas a scrapear (None = todas)
+            product_element: Elemento lxml <li class="product">
             
         Returns:
-            Lista de diccionarios con información de productos
+            Diccionario con la información del producto o None si falla
+            
+        Chain of Thought: Sigue paso a paso la misma lógica que
+        _extract_product_info(), pero con los selectores XPath precompilados.
+        Si cambias una, ¡cambia también la otra!
+        """
+        try:
+            product_data = {
+                'nombre': MISSING,
+                'precio': MISSING,
+                'precio_anterior': MISSING,
+                'disponibilidad': MISSING,
+                'enlace': MISSING,
+                'imagen': MISSING
+            }
+            
+            link_element = _lxml_first(_XP_LINK, product_element)
+            if link_element is not None:
+                product_data['enlace'] = str(link_element.get('href'))
+            
+            for title_xpath in _XP_TITLES:
+                title_element = _lxml_first(title_xpath, product_element)
+                if title_element is not None:
+                    product_data['nombre'] = _lxml_text(title_element)
+                    break
+            
+            price_element = _lxml_first(_XP_PRICE, product_element)
+            if price_element is not None:
+                ins_price = _lxml_first(_XP_INS, price_element)
+                amount = _lxml_first(_XP_AMOUNT, ins_price if ins_price is not None else price_element)
+                if amount is not None:
+                    product_data['precio'] = _lxml_text(amount)
+                else:
+                    product_data['precio'] = _lxml_text(price_element)
+                
+                del_price = _lxml_first(_XP_DEL, price_element)
+                if del_price is not None:
+                    original = _lxml_first(_XP_AMOUNT, del_price)
+                    product_data['precio_anterior'] = _lxml_text(
+                        original if original is not None else del_price)
+            
+            img_element = _lxml_first(_XP_IMAGE, product_element)
+            if img_element is not None:
+                product_data['imagen'] = str(
+                    img_element.get('src') or
+                    img_element.get('data-src') or
+                    'N/A'
+                )
+            
+            out_of_stock = any(
+                text and ('agotado' in text.lower() or 'out of stock' in text.lower())
+                for text in (
+                    node if isinstance(node, str) else node.text
+                    for node in _XP_ALL_STRINGS(product_element)
+                )
+            )
+            
+            if out_of_stock:
+                product_data['disponibilidad'] = 'Agotado'
+            elif _lxml_first(_XP_ADD_TO_CART, product_element) is not None:
+                product_data['disponibilidad'] = 'Disponible'
+            else:
+                stock_badge = _lxml_first(_XP_STOCK, product_element)
+                if stock_badge is not None:
+                    product_data['disponibilidad'] = _lxml_text(stock_badge)
+            
+            if product_data['nombre'] != MISSING or product_data['enlace'] != MISSING:
+                return Product(**product_data)
+            
+            return None
+            
+        except Exception as e:
+            logger.error("Error extrayendo información del producto: %s", e)
+            return None
+    
+    def _get_next_page_url_lxml(self, root, current_url: str) -> Optional[str]:
+        """
+        Versión para el motor 'lxml' de _get_next_page_url()
+        
+        Args:
+            root: Raíz del documento lxml
+            current_url: URL de la página actual
             
-        Chain of Thought: Este es el método principal que orquesta todo:
+        Returns:
+            URL de la siguiente página o None si no hay más páginas
+        """
+        from urllib.parse import urljoin
+        
+        next_button = None
+        for next_xpath in _XP_NEXT_LINKS:
+            next_button = _lxml_first(next_xpath, root)
+            if next_button is not None:
+                break
+        if next_button is None:
+            # Equivalente a find('a', text=...): primero 'siguiente', luego 'next'
+            links = _XP_ALL_LINKS(root)
+            for keyword in ('siguiente', 'next'):
+                next_button = next(
+                    (link for link in links
+                     if keyword in (_lxml_string(link) or '').lower()),
+                    None
+                )
+                if next_button is not None:
+                    break
+        
+        if next_button is not None and next_button.get('href'):
+            next_url = str(next_button.get('href'))
+            if not next_url.startswith('http'):
+                next_url = urljoin(current_url, next_url)
+            return next_url
+        
+        pagination = _lxml_first(_XP_PAGINATION, root)
+        if pagination is not None:
+            current_page = _lxml_first(_XP_CURRENT_PAGE, pagination)
+            if current_page is not None:
+                next_page_link = _lxml_first(_XP_FOLLOWING_LINK, current_page)
+                if next_page_link is not None:
+                    next_url = str(next_page_link.get('href'))
+                    if not next_url.startswith('http'):
+                        next_url = urljoin(current_url, next_url)
+                    return next_url
+        
+        return None
+    
+    def _parse_listing_page_lxml(self, html: str, current_url: str) -> ListingPage:
+        """
+        Versión para el motor 'lxml' de _parse_listing_page()
+        
+        Chain of Thought: lxml no acepta texto (str) que declare su propia
+        codificación (<?xml encoding=...?>); en ese caso le pasamos bytes.
+        """
+        if not html.strip():
+            return ListingPage(current_url, [], None, 0)
+        parse_start = time.perf_counter()
+        try:
+            root = lxml.html.fromstring(html)
+        except ValueError:
+            root = lxml.html.fromstring(html.encode('utf-8'))
+        extract_start = time.perf_counter()
+        self._stage('parse', extract_start - parse_start)
+        
+        product_elements = _XP_PRODUCTS(root)
+        products = []
+        for product_element in product_elements:
+            product_data = self._extract_product_info_lxml(product_element)
+            if product_data:
+                products.append(product_data)
+        
+        next_url = self._get_next_page_url_lxml(root, current_url)
+        self._stage('extract', time.perf_counter() - extract_start)
+        return ListingPage(current_url, products, next_url, len(product_elements))
+    
+    def _parse_listing_page(self, html: str, current_url: str) -> ListingPage:
+        """
+        Parsea una página de listado y extrae sus productos y la siguiente URL
+        
+        Args:
+            html: Contenido HTML de la página
+            current_url: URL de la página (para resolver enlaces relativos)
+            
+        Returns:
+            ListingPage con los productos, la siguiente URL y el número de
+            elementos de producto encontrados
+            
+        Chain of Thought: Separamos el parseo de la descarga porque:
+        1. El parseo es trabajo local (CPU), la descarga es trabajo de red
+        2. Así podemos descargar de formas distintas (síncrona, asíncrona...)
+           y reutilizar la misma extracción
+        """
+        # Chain of Thought: Si ya parseamos exactamente este HTML, reutilizamos
+        # el resultado guardado y nos ahorramos todo el parseo
+        if self.page_cache is not None:
+            key = self.page_cache.make_key(html, current_url)
+            cached = self.page_cache.get(key)
+            if cached:
+                logger.info("✓ Página idéntica a una ya procesada, usando resultado guardado")
+                self._count('cache_hits_total', cache='pages')
+                products, next_url, element_count = cached
+                return ListingPage(current_url, [Product.from_dict(p) for p in products],
+                                   next_url, element_count)
+            page = self._parse_html(html, current_url)
+            self.page_cache.store(key, page.products, page.next_url, page.element_count)
+            return page
+        
+        return self._parse_html(html, current_url)
+    
+    def _parse_html(self, html: str, current_url: str) -> ListingPage:
+        """
+        Parsea el HTML con el motor configurado (sin pasar por la caché)
+        """
+        if self.parser_pool is not None:
+            return self._parse_in_pool(html, current_url)
+        if self.engine == 'lxml':
+            return self._parse_listing_page_lxml(html, current_url)
+        
+        # Chain of Thought: Usamos 'lxml' como parser porque es más rápido
+        # que el parser por defecto 'html.parser'.
+        # Con partial_parse, el strainer descarta todo lo que no sean productos
+        # o paginación. Los enlaces "Siguiente" identificados solo por su texto
+        # (sin clase next) deben estar dentro de la paginación para encontrarse.
+        parse_start = time.perf_counter()
+        soup = BeautifulSoup(html, 'lxml',
+                             parse_only=LISTING_STRAINER if self.partial_parse else None)
+        extract_start = time.perf_counter()
+        self._stage('parse', extract_start - parse_start)
+        
+        # Chain of Thought: WooCommerce usa <li class="product"> para productos
+        product_elements = soup.find_all('li', class_='product')
+        
+        products = []
+        for product_element in product_elements:
+            product_data = self._extract_product_info(product_element)
+            if product_data:
+                products.append(product_data)
+        
+        next_url = self._get_next_page_url(soup, current_url)
+        self._stage('extract', time.perf_counter() - extract_start)
+        return ListingPage(current_url, products, next_url, len(product_elements))
+    
+    def _parse_in_pool(self, content: Union[str, bytes], current_url: str,
+                       encoding: Optional[str] = None) -> ListingPage:
+        """
+        Parsea en el ParserPool y mide el tiempo como etapa 'parse'
+        
+        Chain of Thought: El proceso que parsea no tiene acceso a nuestras
+        métricas, así que medimos desde aquí el tiempo total (parseo +
+        extracción + envío entre procesos) y lo contamos todo como 'parse'.
+        """
+        start = time.perf_counter()
+        page = self.parser_pool.parse(content, current_url, encoding,
+                                      engine=self.engine, partial_parse=self.partial_parse)
+        self._stage('parse', time.perf_counter() - start)
+        return page
+    
+    def _parse_response(self, response: requests.Response, current_url: str) -> ListingPage:
+        """
+        Parsea una página descargada con _make_request()
+        
+        Chain of Thought: Con parser_pool enviamos los BYTES tal como llegaron
+        y el proceso que parsea los decodifica: así el hilo que descarga
+        tampoco gasta tiempo en eso. La caché de páginas necesita el texto
+        para calcular la huella, así que con ella decodificamos aquí.
+        """
+        if self.parser_pool is not None and self.page_cache is None:
+            return self._parse_in_pool(response.content, current_url, response.encoding)
+        return self._parse_listing_page(response.text, current_url)
+    
+    def _predict_page_urls(self, html: str, next_url: Optional[str]) -> List[str]:
+        """
+        Predice las URLs de las páginas 2..N a partir de la primera página
+        
+        Args:
+            html: HTML de la primera página
+            next_url: URL de la página 2 según _get_next_page_url()
+            
+        Returns:
+            Lista de URLs de las páginas 2..N, o lista vacía si no se puede
+            predecir (en ese caso se siguen los enlaces como siempre)
+            
+        Chain of Thought: WooCommerce numera sus páginas como /page/2/, /page/3/...
+        y la paginación muestra el número de la última página. Con eso podemos
+        conocer TODAS las URLs sin esperar a parsear cada página. Para no
+        equivocarnos, comprobamos que el patrón encaja con el enlace real a la
+        página 2; si no encaja, no predecimos nada.
+        """
+        if not next_url:
+            return []
+        match = PAGE_NUMBER_PATTERN.search(next_url)
+        if not match or match.group(1) != '2':
+            return []
+        
+        try:
+            root = lxml.html.fromstring(html)
+        except ValueError:
+            root = lxml.html.fromstring(html.encode('utf-8'))
+        pagination = _lxml_first(_XP_PAGINATION, root)
+        if pagination is None:
+            return []
+        
+        # Chain of Thought: El número de la última página puede aparecer como
+        # texto del enlace ("40") o solo dentro del href (".../page/40/")
+        numbers = [int(text.strip()) for text in pagination.itertext() if text.strip().isdigit()]
+        for href in pagination.xpath('.//a/@href'):
+            href_match = PAGE_NUMBER_PATTERN.search(href)
+            if href_match:
+                numbers.append(int(href_match.group(1)))
+        last_page = max(numbers, default=1)
+        
+        prefix, suffix = next_url[:match.start(1)], next_url[match.end(1):]
+        return [f"{prefix}{number}{suffix}" for number in range(2, last_page + 1)]
+    
+    def _check_products_found(self, page: ListingPage, html: str) -> bool:
+        """
+        Avisa si una página no tiene productos
+        
+        Returns:
+            True si la página tiene productos
+        """
+        if page.element_count:
+            return True
+        logger.warning("⚠ No se encontraron productos. Posibles causas:")
+        logger.warning("  - Estructura HTML diferente a la esperada")
+        logger.warning("  - Página sin productos")
+        logger.warning("  - Sitio bloqueando el scraper")
+        # Guardamos muestra del HTML para debugging
+        logger.debug(f"HTML preview: {html[:500]}")
+        return False
+    
+    def _fetch_listing_page(self, url: str) -> Optional[ListingPage]:
+        """
+        Descarga y parsea una página (la usan los hilos del modo 'predict')
+        
+        Returns:
+            ListingPage, o None si la descarga falla o no hay productos
+        """
+        response = self._make_request(url)
+        if not response:
+            logger.error("No se pudo obtener la página %s", url)
+            return None
+        page = self._parse_response(response, url)
+        # Chain of Thought: response.text solo se decodifica si hay que mostrarlo
+        return page if page.element_count or self._check_products_found(page, response.text) else None
+    
+    def fetch_page(self, url: str, predict: bool = False) -> Tuple[Optional[ListingPage], List[str]]:
+        """
+        Descarga y parsea UNA página de listado (la usan los workers de jobqueue.py)
+        
+        Args:
+            url: URL de la página
+            predict: Añadir además las páginas 2..N predichas desde esta
+                (usar con la primera página de la categoría)
+            
+        Returns:
+            (página, o None si la descarga falla o no hay productos;
+             URLs de las páginas que faltan por visitar que se conocen desde ella)
+        
+        Raises:
+            requests.HTTPError: Si el servidor responde que la página no
+                existe (PERMANENT_HTTP_STATUSES: 404, 410)
+        
+        Chain of Thought: A diferencia de iter_pages(), no recorre nada: quien
+        la llama decide qué hacer con las URLs nuevas (ej: meterlas en una
+        cola compartida para que las descarguen otros procesos).
+        """
+        response = self._make_request(url, raise_http_errors=True)
+        if not response:
+            logger.error("No se pudo obtener la página %s", url)
+            return None, []
+        page = self._parse_response(response, url)
+        if not page.element_count and not self._check_products_found(page, response.text):
+            return None, []
+        self._count_page(page)
+        urls = self._predict_page_urls(response.text, page.next_url) if predict else []
+        if page.next_url and page.next_url != url and page.next_url not in urls:
+            urls.append(page.next_url)
+        return page, urls
+    
+    def _count_page(self, page: ListingPage) -> None:
+        """Cuenta una página entregada y sus productos (si hay métricas)"""
+        self._count('pages_total')
+        self._count('products_total', len(page.products))
+    
+    def iter_pages(self, max_pages: Optional[int] = None, discovery: str = 'links',
+                   workers: int = PAGE_WORKERS,
+                   checkpoint: Optional['CrawlCheckpoint'] = None) -> Iterator[ListingPage]:
+        """
+        Recorre las páginas de la categoría y las entrega una a una
+        
+        Args:
+            max_pages: Número máximo de páginas a scrapear (None = todas)
+            discovery: Cómo se encuentran las páginas (ver DISCOVERY_MODES):
+                'links' sigue el enlace "Siguiente"; 'predict' descarga las
+                páginas 2..N en paralelo a partir de la paginación
+            workers: Hilos de descarga en el modo 'predict' (con un
+                ConcurrencyController, al menos su techo: el controlador
+                decide cuántos descargan a la vez)
+            checkpoint: Punto de control (ver CrawlCheckpoint). Se guarda
+                después de cada página; si ya tiene estado, se continúa desde él.
+            
+        Yields:
+            ListingPage con los productos de cada página, en orden
+            
+        Chain of Thought: Este es el método que orquesta todo:
         1. Hace petición a la primera página
         2. Extrae productos
         3. Busca siguiente página
         4. Repite hasta que no haya más páginas
         
-        Nota para junior: Esta es la función que llamarías desde el main()
+        Nota para junior: Es un "generador" (usa yield en lugar de return).
+        No descarga todo de golpe: cada vez que pides el siguiente elemento,
+        descarga y procesa UNA página más. Así la memoria no crece con el
+        tamaño del catálogo y puedes empezar a usar la página 1 enseguida.
         """
-        all_products = []
+        if discovery not in DISCOVERY_MODES:
+            raise ValueError(f"Modo desconocido: {discovery!r}. Opciones: {DISCOVERY_MODES}")
+        if self.concurrency is not None:
+            workers = max(workers, self.concurrency.max_limit)
+        
         current_url = self.base_url
         page_number = 1
+        total_products = 0
+        # Chain of Thought: pending son URLs ya conocidas pero aún no procesadas
+        # (las páginas predichas en el modo 'predict')
+        pending: List[str] = []
+        # Última página predicha: solo desde ella se siguen enlaces al terminar
+        # las predichas (las demás ya enlazan a páginas conocidas)
+        pending_tail: Optional[str] = None
+        
+        # Chain of Thought: Si el checkpoint tiene estado, continuamos desde ahí
+        # (el estado puede traer otras claves, como 'output', sin haber avanzado aún)
+        state = checkpoint.state if checkpoint else {}
+        if 'page_number' in state:
+            if state.get('finished'):
+                logger.info(f"✓ {self.base_url} ya se completó en una ejecución anterior")
+                return
+            current_url = state.get('next_url')
+            page_number = state.get('page_number', 1)
+            pending = list(state.get('pending', []))
+            pending_tail = state.get('pending_tail')
+            total_products = state.get('products_emitted', 0)
+            logger.info(f"↻ Reanudando desde la página {page_number} "
+                        f"({total_products} productos ya extraídos)")
+        
+        def save_checkpoint(next_url: Optional[str], next_page_number: int,
+                            still_pending: List[str]) -> None:
+            if checkpoint:
+                checkpoint.save(base_url=self.base_url, next_url=next_url,
+                                page_number=next_page_number, pending=still_pending,
+                                pending_tail=pending_tail,
+                                products_emitted=total_products,
+                                finished=not next_url and not still_pending)
         
         logger.info("=" * 70)
         logger.info("INICIANDO SCRAPING DE CATEGORÍA")
         logger.info("=" * 70)
+        # Chain of Thought: El deadline cuenta desde que empieza el scraping
+        # (no desde que se creó el scraper)
+        self.retry_policy.start()
         
-        while current_url:
+        # Chain of Thought: Un scraping que se empezó por HTML se reanuda por
+        # HTML aunque ahora se pida la API (sus checkpoints no son compatibles)
+        if self.source == 'api' and ('page_number' not in state or state.get('source') == 'api'):
+            if (yield from self._iter_api_pages(max_pages, checkpoint)):
+                return
+            logger.warning("⚠ La Store API no está disponible, se leen las páginas HTML")
+        
+        while current_url or pending:
+            if pending:
+                # Chain of Thought: Los Futures se recogen en el orden de
+                # pending (aunque las descargas terminen desordenadas) y solo
+                # hay window_size encargados a la vez (ver PREDICTED_PAGES_PER_WORKER)
+                failed: List[str] = []
+                tail_page = None
+                window_size = workers * PREDICTED_PAGES_PER_WORKER
+                window: deque = deque()
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    try:
+                        for index, url in enumerate(pending):
+                            while len(window) < window_size and index + len(window) < len(pending):
+                                window.append(executor.submit(self._fetch_listing_page,
+                                                              pending[index + len(window)]))
+                            predicted_page = window.popleft().result()
+                            page_number += 1
+                            if predicted_page is None:
+                                # Chain of Thought: Guardamos las páginas fallidas en
+                                # el checkpoint para reintentarlas al reanudar
+                                failed.append(url)
+                                continue
+                            page = predicted_page
+                            if url == pending_tail:
+                                tail_page = page
+                            total_products += len(page.products)
+                            self._count_page(page)
+                            logger.info("✓ Página %d: %d productos (total: %d)",
+                                        page_number, len(page.products), total_products)
+                            yield page
+                            save_checkpoint(current_url, page_number, failed + pending[index + 1:])
+                    finally:
+                        # Si se para a medias, las que aún no empezaron no se descargan
+                        for future in window:
+                            future.cancel()
+                
+                # Chain of Thought: Si la última página predicha todavía enlaza
+                # a otra, seguimos los enlaces desde ahí (la predicción se quedó corta)
+                # (si la última falló, se decide al reintentarla)
+                if tail_page is not None and tail_page.next_url and tail_page.next_url not in pending:
+                    current_url = tail_page.next_url
+                    page_number += 1
+                pending = []
+                save_checkpoint(current_url, page_number, failed)
+                if failed:
+                    logger.error(f"✗ {len(failed)} páginas no se pudieron obtener")
+                    break
+                if not current_url:
+                    logger.info("✓ No hay más páginas, scraping completado")
+                continue
+            
             # Chain of Thought: Verificamos max_pages para permitir testing
             # sin scrapear todo el sitio
             if max_pages and page_number > max_pages:
                 logger.info(f"Alcanzado límite de {max_pages} páginas")
                 break
             
-            logger.info(f"\n--- Página {page_number} ---")
-            logger.info(f"URL: {current_url}")
+            logger.info("\n--- Página %d ---", page_number)
+            logger.info("URL: %s", current_url)
             
             # Hacer petición a la página
             response = self._make_request(current_url)
             if not response:
-                logger.error(f"No se pudo obtener la página {page_number}")
+                logger.error("No se pudo obtener la página %d", page_number)
                 break
             
-            # Parsear HTML
-            # Chain of Thought: Usamos 'lxml' como parser porque es más rápido
-            # que el parser por defecto 'html.parser'
-            soup = BeautifulSoup(response.text, 'lxml')
-            
-            # Buscar productos en la página
-            # Chain of Thought: WooCommerce usa <li class="product"> para productos
-            products = soup.find_all('li', class_='product')
-            logger.info(f"Encontrados {len(products)} productos en esta página")
+            # Parsear HTML y extraer productos
+            # Chain of Thought: Toda la lógica de parseo vive en _parse_listing_page
+            # para que el modo síncrono y el asíncrono produzcan exactamente
+            # los mismos datos
+            page = self._parse_response(response, current_url)
+            logger.info("Encontrados %d productos en esta página", page.element_count)
             
             # Si no hay productos, algo puede estar mal
-            if not products:
-                logger.warning("⚠ No se encontraron productos. Posibles causas:")
-                logger.warning("  - Estructura HTML diferente a la esperada")
-                logger.warning("  - Página sin productos")
-                logger.warning("  - Sitio bloqueando el scraper")
-                # Guardamos muestra del HTML para debugging
-                logger.debug(f"HTML preview: {soup.prettify()[:500]}")
+            if not page.element_count and not self._check_products_found(page, response.text):
                 break
             
-            # Extraer información de cada producto
-            page_products = 0
-            for product in products:
-                product_data = self._extract_product_info(product)
-                if product_data:
-                    all_products.append(product_data)
-                    page_products += 1
-                    logger.debug(f"  ✓ Producto: {product_data['nombre']}")
-                
-                # Chain of Thought: Pequeña pausa entre productos para ser amigables
-                time.sleep(DELAY_BETWEEN_PRODUCTS)
+            total_products += len(page.products)
+            self._count_page(page)
+            logger.info("✓ Extraídos %d productos de esta página", len(page.products))
+            logger.info("Total acumulado: %d productos", total_products)
             
-            logger.info(f"✓ Extraídos {page_products} productos de esta página")
-            logger.info(f"Total acumulado: {len(all_products)} productos")
+            yield page
+            
+            # Chain of Thought: En modo 'predict', tras la página 1 ya conocemos
+            # las demás URLs y las descargamos en paralelo
+            if discovery == 'predict' and page_number == 1:
+                pending = self._predict_page_urls(response.text, page.next_url)
+                if max_pages:
+                    pending = pending[:max_pages - 1]
+                if pending:
+                    logger.info(f"→ {len(pending)} páginas más predichas, "
+                                f"descargando con {workers} hilos")
+                    current_url = None
+                    pending_tail = pending[-1]
+                    save_checkpoint(current_url, page_number, pending)
+                    continue
+                logger.info("→ No se pudo predecir la paginación, siguiendo enlaces")
             
             # Buscar siguiente página
-            next_url = self._get_next_page_url(soup, current_url)
+            next_url = page.next_url
             
             if next_url and next_url != current_url:
-                logger.info(f"→ Siguiente página encontrada")
+                logger.info("→ Siguiente página encontrada")
+                # Chain of Thought: No hace falta una pausa fija aquí: el
+                # rate_limiter de _make_request ya espera lo necesario
                 current_url = next_url
                 page_number += 1
-                
-                # Chain of Thought: CRÍTICO - Pausa entre páginas para no saturar el servidor
-                logger.info(f"Esperando {DELAY_BETWEEN_REQUESTS}s antes de la siguiente página...")
-                time.sleep(DELAY_BETWEEN_REQUESTS)
             else:
                 logger.info("✓ No hay más páginas, scraping completado")
                 current_url = None
+            
+            # Chain of Thought: Guardamos el checkpoint DESPUÉS del yield, es decir,
+            # cuando quien consume las páginas ya ha procesado esta
+            save_checkpoint(current_url, page_number, [])
+    
+    def _iter_api_pages(self, max_pages: Optional[int] = None,
+                        checkpoint: Optional['CrawlCheckpoint'] = None
+                        ) -> Generator[ListingPage, None, bool]:
+        """
+        Recorre la categoría por la Store API (ver store_api.py)
+        
+        Yields:
+            ListingPage con hasta STORE_API_PER_PAGE productos cada una
+            
+        Returns:
+            False si la API no está disponible (la primera página falla o
+            viene vacía), para que iter_pages() siga por HTML; True si no
+            
+        Chain of Thought: Una categoría que la API devuelve vacía puede ser
+        un 'slug' que la API no reconoce, así que también se prueba el HTML.
+        """
+        state = checkpoint.state if checkpoint else {}
+        resuming = state.get('source') == 'api'
+        page_number = state.get('page_number', 1) if resuming else 1
+        total_products = state.get('products_emitted', 0) if resuming else 0
+        paths = [state['api_path']] if resuming and state.get('api_path') else list(STORE_API_PATHS)
+        path = paths.pop(0)
+        
+        while True:
+            if max_pages and page_number > max_pages:
+                logger.info("Alcanzado límite de %d páginas", max_pages)
+                return True
+            url = store_api_url(self.base_url, page_number, path=path)
+            logger.info("\n--- Página %d (Store API) ---", page_number)
+            response = self._make_request(url)
+            products = None
+            if response is not None:
+                parse_start = time.perf_counter()
+                try:
+                    products = [Product.from_dict(p) for p in parse_api_page(response.text)]
+                except StoreAPIError as e:
+                    logger.warning("⚠ %s: %s", url, e)
+                self._stage('parse', time.perf_counter() - parse_start)
+            
+            if not products and page_number == 1 and not resuming:
+                # Chain of Thought: Probamos la siguiente ruta de la API (la
+                # de versiones antiguas) antes de rendirnos
+                if paths:
+                    path = paths.pop(0)
+                    continue
+                return False
+            if products is None:
+                logger.error("No se pudo obtener la página %d de la Store API", page_number)
+                return True
+            
+            # Chain of Thought: WordPress indica el total de páginas en el
+            # header X-WP-TotalPages; si no viene, una página incompleta es la última
+            total_pages = response.headers.get('X-WP-TotalPages')
+            if total_pages and total_pages.isdigit():
+                has_next = page_number < int(total_pages)
+            else:
+                has_next = len(products) >= STORE_API_PER_PAGE
+            next_url = store_api_url(self.base_url, page_number + 1, path=path) if has_next else None
+            
+            page = ListingPage(url, products, next_url, len(products))
+            total_products += len(products)
+            self._count_page(page)
+            logger.info("✓ %d productos de la API (total: %d)", len(products), total_products)
+            yield page
+            
+            if checkpoint:
+                checkpoint.save(base_url=self.base_url, source='api', api_path=path,
+                                next_url=next_url, page_number=page_number + 1, pending=[],
+                                products_emitted=total_products, finished=not next_url)
+            if not next_url:
+                logger.info("✓ No hay más páginas, scraping completado")
+                return True
+            page_number += 1
+    
+    def iter_products(self, max_pages: Optional[int] = None, discovery: str = 'links',
+                      checkpoint: Optional['CrawlCheckpoint'] = None,
+                      normalize_prices: bool = False,
+                      details: Optional['DetailEnricher'] = None) -> Iterator[Dict[str, str]]:
+        """
+        Entrega los productos de la categoría uno a uno, según se van extrayendo
+        
+        Args:
+            max_pages: Número máximo de páginas a scrapear (None = todas)
+            discovery: Cómo se encuentran las páginas ('links' o 'predict')
+            checkpoint: Punto de control para poder reanudar (ver iter_pages)
+            normalize_prices: Añadir los precios numéricos de prices.py
+                (columnas NORMALIZED_FIELDNAMES; requiere numpy)
+            details: Si se provee (details.DetailEnricher), se visita la ficha
+                de cada producto y se añaden sus columnas DETAIL_FIELDNAMES
+            
+        Yields:
+            Diccionarios con información de cada producto
+            
+        Uso básico:
+            for producto in scraper.iter_products():
+                print(producto['nombre'])
+        """
+        if normalize_prices:
+            from prices import add_normalized_prices
+        
+        for page in self.iter_pages(max_pages, discovery, checkpoint=checkpoint):
+            products = page.products
+            if normalize_prices:
+                # Chain of Thought: Normalizamos página a página (no en lotes
+                # más grandes) para que el checkpoint, que se guarda por página,
+                # nunca cuente productos que aún no se han entregado
+                products = add_normalized_prices(products)
+            if details is not None:
+                # Chain of Thought: Igual que con los precios, página a página:
+                # las fichas de la página se descargan a la vez, y el
+                # checkpoint no avanza hasta entregar todos sus productos
+                products = details.enrich_page(products, self.fetch_html)
+            for product_data in products:
+                logger.debug("  ✓ Producto: %s", product_data['nombre'])
+                yield product_data
+    
+    def iter_sitemap_products(self, sitemap_url: Optional[str] = None,
+                              index: Optional['SitemapIndex'] = None,
+                              url_filter: Optional[str] = None,
+                              normalize_prices: bool = False,
+                              workers: Optional[int] = None) -> Iterator[Product]:
+        """
+        Entrega los productos descubiertos por el sitemap (ver sitemaps.py)
+        
+        En lugar de recorrer los listados, lee las URLs del sitemap de
+        productos y visita la ficha de cada una, de la que salen todos los
+        campos (los del CSV y los de DETAIL_FIELDNAMES).
+        
+        Args:
+            sitemap_url: URL del sitemap (None = buscarlo en SITEMAP_PATHS)
+            index: Si se provee (sitemaps.SitemapIndex), solo se visitan las
+                fichas cuyo <lastmod> cambió desde la última ejecución
+            url_filter: Solo las URLs que contengan este texto
+            normalize_prices: Añadir los precios numéricos de prices.py
+            workers: Fichas que se descargan a la vez (None = ver detail_worker_count)
+            
+        Yields:
+            Un Product por ficha (las que fallan no se entregan y se
+            reintentan en la próxima ejecución)
+        
+        Chain of Thought: Cada URL se marca en el índice DESPUÉS de entregar
+        su producto (cuando ya se escribió), igual que el checkpoint de
+        iter_pages(): si el scraping se corta, no se pierde ningún cambio.
+        """
+        from details import DetailEnricher, extract_product_page
+        from sitemaps import default_sitemap_urls, iter_sitemap
+        if normalize_prices:
+            from prices import add_normalized_prices
+        
+        self.retry_policy.start()
+        entries = iter_sitemap(sitemap_url or default_sitemap_urls(self.base_url),
+                               self.open_stream, url_filter=url_filter)
+        if index is not None:
+            entries = index.changed(entries)
+        
+        # Chain of Thought: enrich() entrega los productos en el mismo orden
+        # en que los pide; 'fed' guarda las entradas pedidas y aún no
+        # entregadas para saber a qué entrada corresponde cada producto
+        fed: deque = deque()
+        
+        def requested() -> Iterator[Dict[str, str]]:
+            for entry in entries:
+                fed.append(entry)
+                yield {'enlace': entry.loc}
+        
+        found = 0
+        workers = detail_worker_count(workers, self.concurrency)
+        with DetailEnricher(workers, extract=extract_product_page) as enricher:
+            for product_data in enricher.enrich(requested(), self.fetch_html):
+                entry = fed.popleft()
+                if product_data['nombre'] == MISSING:
+                    logger.warning("⚠ %s no es una ficha de producto válida", entry.loc)
+                    continue
+                if normalize_prices:
+                    product_data = add_normalized_prices([product_data])[0]
+                product = Product.from_dict(product_data)
+                self._count('products_total')
+                found += 1
+                yield product
+                if index is not None:
+                    index.mark(entry)
+        if index is not None:
+            index.flush()
+            logger.info("🗺 Sitemap: %d fichas cambiadas, %d sin cambios", found, index.skipped)
+    
+    def scrape_category(self, max_pages: Optional[int] = None,
+                        discovery: str = 'links') -> List[Dict[str, str]]:
+        """
+        Scrapea todos los productos de la categoría
+        
+        Args:
+            max_pages: Número máximo de páginas a scrapear (None = todas)
+            discovery: Cómo se encuentran las páginas ('links' o 'predict')
+            
+        Returns:
+            Lista de diccionarios con información de productos
+            
+        Nota para junior: Esta es la forma más sencilla de usar el scraper.
+        Para catálogos muy grandes usa iter_products(), que no guarda todos
+        los productos en memoria.
+        """
+        all_products = list(self.iter_products(max_pages, discovery))
         
         logger.info("=" * 70)
         logger.info(f"SCRAPING FINALIZADO: {len(all_products)} productos totales")
@@ -468,13 +2360,20 @@ class DoctorPetScraper:
         
         return all_products
     
-    def save_to_csv(self, products: List[Dict[str, str]], filename: Optional[str] = None) -> str:
+    def save_to_csv(self, products: Iterable[Dict[str, str]], filename: Optional[str] = None,
+                    flush_every: int = CSV_FLUSH_EVERY, append: bool = False,
+                    checkpoint: Optional['CrawlCheckpoint'] = None) -> str:
         """
         Guarda los productos en un archivo CSV
         
         Args:
-            products: Lista de diccionarios con información de productos
+            products: Lista (o cualquier iterable, como iter_products()) de
+                diccionarios con información de productos
             filename: Nombre del archivo (se genera automáticamente si no se provee)
+            flush_every: Cada cuántos productos se vuelca el archivo a disco
+            append: Si es True, añade los productos a un archivo existente
+            checkpoint: Si se provee, el CSV se vuelca a disco antes de cada
+                guardado del checkpoint (así nunca apunta a filas no escritas)
             
         Returns:
             Nombre del archivo generado
@@ -484,50 +2383,1185 @@ class DoctorPetScraper:
         2. Es legible por humanos (texto plano)
         3. Es fácil de procesar con Python o cualquier otro lenguaje
         
+        Si le pasas un generador (iter_products()), cada producto se escribe
+        en cuanto se extrae. Si el scraping se interrumpe, el archivo conserva
+        todo lo escrito hasta ese momento.
+        
         Nota para junior: CSV = Comma Separated Values (Valores Separados por Comas)
         """
-        if not products:
+        return self.save_products(products, filename, 'csv', flush_every, append, checkpoint)
+    
+    def _write_timed(self, sink, products: Iterator[Dict[str, str]]) -> None:
+        """
+        Escribe los productos midiendo solo la escritura (etapa 'write')
+        
+        Chain of Thought: Cada next() del iterador puede descargar y parsear
+        una página entera; por eso el cronómetro se pone en marcha DESPUÉS de
+        recibir el producto, para no contar ese tiempo como escritura.
+        """
+        elapsed = 0.0
+        try:
+            for product in products:
+                start = time.perf_counter()
+                sink.write(product)
+                elapsed += time.perf_counter() - start
+        finally:
+            self._stage('write', elapsed)
+    
+    def save_products(self, products: Iterable[Dict[str, str]], filename: Optional[str] = None,
+                      output_format: str = 'csv', flush_every: Optional[int] = None,
+                      append: bool = False, checkpoint: Optional['CrawlCheckpoint'] = None,
+                      fieldnames: List[str] = CSV_FIELDNAMES) -> str:
+        """
+        Guarda los productos en el formato indicado (ver OUTPUT_FORMATS)
+        
+        Args:
+            products: Lista o iterable de productos (acepta iter_products())
+            filename: Nombre del archivo (se genera automáticamente si no se provee)
+            output_format: 'csv', 'sqlite', 'jsonl' o 'parquet'
+            flush_every: Cada cuántos productos se escribe a disco
+                (None = el valor por defecto de cada formato)
+            append: Si es True, añade los productos a un archivo existente
+            checkpoint: Si se provee, el archivo se vuelca a disco antes de
+                cada guardado del checkpoint
+            fieldnames: Campos que se guardan (ej: CSV_FIELDNAMES + NORMALIZED_FIELDNAMES)
+            
+        Returns:
+            Nombre del archivo generado ("" si no había productos)
+        """
+        # Chain of Thought: Miramos el primer producto antes de crear el archivo,
+        # así no dejamos un CSV vacío si no hay nada que guardar
+        products = iter(products)
+        first_product = next(products, None)
+        if first_product is None:
             logger.warning("⚠ No hay productos para guardar")
             return ""
         
         # Generar nombre de archivo con timestamp si no se provee uno
         # Chain of Thought: Incluir timestamp evita sobrescribir archivos previos
         if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"doctorpet_alimentos_{timestamp}.csv"
+            filename = default_output_filename(output_format=output_format)
         
         logger.info(f"\n--- Guardando resultados ---")
         logger.info(f"Archivo: {filename}")
-        logger.info(f"Productos: {len(products)}")
         
         try:
-            # Chain of Thought: Usamos 'utf-8-sig' para que Excel abra
-            # correctamente los caracteres especiales (acentos, ñ, etc.)
-            with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                # Las columnas del CSV serán las keys del diccionario
-                fieldnames = ['nombre', 'precio', 'disponibilidad', 'enlace', 'imagen']
-                
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                # Escribir encabezados
-                writer.writeheader()
-                
-                # Escribir cada producto
-                for product in products:
-                    writer.writerow(product)
+            with open_product_sink(output_format, filename, fieldnames=fieldnames,
+                                   flush_every=flush_every, append=append) as sink:
+                # Chain of Thought: En Parquet, volcar en cada checkpoint crearía
+                # bloques diminutos, y además no se puede reanudar sobre él
+                if checkpoint and sink.supports_append:
+                    checkpoint.before_save = sink.flush
+                sink.write(first_product)
+                if self.metrics is None:
+                    for product in products:
+                        sink.write(product)
+                else:
+                    self._write_timed(sink, products)
             
+            logger.info(f"Productos: {sink.count}")
             logger.info(f"✓ Archivo guardado exitosamente: {filename}")
             return filename
             
         except Exception as e:
-            logger.error(f"✗ Error guardando CSV: {e}")
+            logger.error(f"✗ Error guardando {output_format}: {e}")
+            raise
+
+
+# ============================================================================
+# PARSEO EN VARIOS PROCESOS
+# ============================================================================
+# Chain of Thought: Descargar es esperar a la red; parsear es trabajo de CPU.
+# Si el mismo hilo hace las dos cosas, con varios hilos el GIL deja que solo
+# uno parsee a la vez y el resto de núcleos no hace nada. Separamos las dos
+# etapas: los hilos descargan y entregan el HTML a procesos que parsean.
+#
+# Nota para junior: Cada proceso tiene su propio intérprete de Python (y su
+# propio GIL), así que los procesos sí trabajan de verdad en paralelo. El
+# precio es que los datos viajan entre procesos copiados (con pickle).
+
+# Un scraper por (motor, parseo parcial) en cada proceso, creado la primera vez
+_WORKER_SCRAPERS: Dict[Tuple[str, bool], 'DoctorPetScraper'] = {}
+
+
+def _decode_html(content: bytes, encoding: Optional[str]) -> str:
+    """
+    Decodifica el HTML igual que requests (response.text)
+    
+    Chain of Thought: Si el servidor no dice la codificación, requests la
+    adivina mirando los bytes (response.apparent_encoding). Hacemos lo mismo,
+    pero aquí, en el proceso que parsea: adivinarla recorre todo el HTML y
+    no queremos gastar ese tiempo en el hilo que descarga.
+    """
+    if encoding is None:
+        encoding = requests.compat.chardet.detect(content)['encoding'] or 'utf-8'
+    try:
+        return str(content, encoding, errors='replace')
+    except LookupError:
+        # Codificación desconocida: probamos con UTF-8
+        return str(content, 'utf-8', errors='replace')
+
+
+def _init_parse_worker() -> None:
+    """
+    Prepara cada proceso de ParserPool al arrancar
+    
+    Chain of Thought: Los procesos solo parsean; sus mensajes INFO (como
+    "Scraper inicializado") repetirían o confundirían los del proceso
+    principal. Los avisos y errores sí se siguen mostrando.
+    """
+    logger.setLevel(logging.WARNING)
+
+
+def _parse_in_worker(content: Union[str, bytes], current_url: str, encoding: Optional[str],
+                     engine: str, partial_parse: bool) -> ListingPage:
+    """
+    Parsea una página dentro de un proceso de ParserPool
+    
+    Nota para junior: Tiene que ser una función del módulo (no un método ni
+    una lambda) para que el otro proceso pueda encontrarla por su nombre.
+    """
+    scraper = _WORKER_SCRAPERS.get((engine, partial_parse))
+    if scraper is None:
+        scraper = DoctorPetScraper(engine=engine, partial_parse=partial_parse)
+        _WORKER_SCRAPERS[(engine, partial_parse)] = scraper
+    if isinstance(content, bytes):
+        content = _decode_html(content, encoding)
+    return scraper._parse_html(content, current_url)
+
+
+class ParserPool:
+    """
+    Procesos que parsean páginas de listado mientras otros hilos descargan
+    
+    Uso básico:
+        with ParserPool(workers=4) as pool:
+            scraper = DoctorPetScraper(parser_pool=pool)
+            scraper.save_to_csv(scraper.iter_products(discovery='predict'))
+        
+        # Volver a procesar páginas ya descargadas, usando todos los núcleos
+        with ParserPool() as pool:
+            for page in pool.imap((url, html, 'utf-8') for url, html in paginas):
+                print(page.next_url, len(page.products))
+    
+    Nota para junior: Con discovery='links' una sola categoría no va más
+    rápido (la página N+1 no se conoce hasta parsear la N). La ganancia
+    aparece con discovery='predict', con BatchCrawler (varias categorías a
+    la vez) o al reprocesar muchas páginas con imap().
+    """
+    
+    def __init__(self, workers: int = PARSE_WORKERS, max_pending: Optional[int] = None):
+        """
+        Args:
+            workers: Procesos que parsean
+            max_pending: Páginas que pueden estar esperando o parseándose a la
+                vez. Al llegar al límite, submit() espera (por defecto
+                workers * PARSE_QUEUE_PER_WORKER).
+        """
+        self.workers = workers
+        self.max_pending = max_pending or workers * PARSE_QUEUE_PER_WORKER
+        # Chain of Thought: 'spawn' arranca procesos limpios. Con 'fork' (el
+        # de Linux) el hijo copia el estado de TODOS los hilos del padre, y
+        # un lock que otro hilo tuviera cogido (logging, requests...) se
+        # quedaría bloqueado para siempre en el hijo.
+        self._executor = ProcessPoolExecutor(max_workers=workers,
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_parse_worker)
+        # Chain of Thought: El semáforo es la cola acotada: cada página ocupa
+        # un hueco desde que se entrega hasta que termina de parsearse
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+    
+    def submit(self, content: Union[str, bytes], current_url: str,
+               encoding: Optional[str] = None, engine: str = 'bs4',
+               partial_parse: bool = False) -> Future:
+        """
+        Entrega una página para parsear; espera si la cola está llena
+        
+        Args:
+            content: HTML como texto, o bytes tal como llegaron del servidor
+            current_url: URL de la página (para resolver enlaces relativos)
+            encoding: Codificación de los bytes (la de response.encoding)
+            engine: Motor de extracción (ver PARSER_ENGINES)
+            partial_parse: Parseo parcial con BeautifulSoup
+            
+        Returns:
+            Future cuyo resultado es el ListingPage de la página
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(_parse_in_worker, content, current_url,
+                                           encoding, engine, partial_parse)
+        except BaseException:
+            self._slots.release()
             raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+    
+    def parse(self, content: Union[str, bytes], current_url: str,
+              encoding: Optional[str] = None, engine: str = 'bs4',
+              partial_parse: bool = False) -> ListingPage:
+        """Parsea una página en otro proceso y espera el resultado"""
+        return self.submit(content, current_url, encoding, engine, partial_parse).result()
+    
+    def imap(self, pages: Iterable[Tuple[str, Union[str, bytes], Optional[str]]],
+             engine: str = 'bs4', partial_parse: bool = False) -> Iterator[ListingPage]:
+        """
+        Parsea muchas páginas ya descargadas y las entrega EN ORDEN
+        
+        Args:
+            pages: Tuplas (url, html, codificación)
+            
+        Yields:
+            ListingPage de cada página, en el mismo orden
+            
+        Chain of Thought: Solo se leen de 'pages' las páginas que caben en
+        la cola; así un archivo enorme no se carga entero en memoria.
+        """
+        in_flight: deque = deque()
+        for current_url, content, encoding in pages:
+            if len(in_flight) >= self.max_pending:
+                yield in_flight.popleft().result()
+            in_flight.append(self.submit(content, current_url, encoding, engine, partial_parse))
+        while in_flight:
+            yield in_flight.popleft().result()
+    
+    def close(self) -> None:
+        """Espera a que terminen las páginas pendientes y cierra los procesos"""
+        self._executor.shutdown()
+    
+    def __enter__(self) -> 'ParserPool':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+# ============================================================================
+# ESCRITURA INCREMENTAL DE CSV
+# ============================================================================
+# Chain of Thought: En lugar de esperar a tener todos los productos para
+# escribir el archivo, lo vamos escribiendo fila a fila. Ventajas:
+# 1. La memoria no crece con el número de productos
+# 2. Si el programa se interrumpe (Ctrl+C), lo escrito ya está en disco
+
+def category_slug(url: str) -> str:
+    """
+    Obtiene el nombre corto de una categoría a partir de su URL
+    
+    Ejemplo: "https://doctorpet.co/producto-category/alimentos/" -> "alimentos"
+    """
+    return urlparse(url).path.rstrip('/').rsplit('/', 1)[-1] or 'categoria'
+
+
+def default_csv_filename(category: str = 'alimentos') -> str:
+    """Genera un nombre de archivo con timestamp, ej: doctorpet_alimentos_20240930_143025.csv"""
+    return default_output_filename(category, 'csv')
+
+
+def default_output_filename(category: str = 'alimentos', output_format: str = 'csv') -> str:
+    """Igual que default_csv_filename pero con la extensión del formato, ej: .jsonl.gz"""
+    from sinks import FILE_EXTENSIONS
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"doctorpet_{category}_{timestamp}.{FILE_EXTENSIONS[output_format]}"
+
+
+def output_fieldnames(normalize_prices: bool = False, changes_only: bool = False,
+                      details: bool = False) -> List[str]:
+    """
+    Campos de salida: los del CSV, más los precios numéricos si se normalizan,
+    los de la ficha si se visitan y las columnas del tipo de cambio si solo
+    se guardan los cambios
+    """
+    fieldnames = list(CSV_FIELDNAMES)
+    if normalize_prices:
+        from prices import NORMALIZED_FIELDNAMES
+        fieldnames += NORMALIZED_FIELDNAMES
+    if details:
+        from details import DETAIL_FIELDNAMES
+        fieldnames += DETAIL_FIELDNAMES
+    if changes_only:
+        from changes import CHANGE_FIELDNAMES
+        fieldnames += CHANGE_FIELDNAMES
+    return fieldnames
+
+
+def detail_worker_count(requested: Optional[int] = None,
+                        concurrency: Optional[ConcurrencyController] = None) -> int:
+    """
+    Hilos para descargar fichas: los pedidos, o los que permita el controlador
+    
+    Chain of Thought: Con un ConcurrencyController es él quien limita las
+    peticiones a la vez; si solo hubiera DETAIL_WORKERS hilos, nunca podría
+    subir por encima de ese número.
+    """
+    if requested:
+        return requested
+    from details import DETAIL_WORKERS
+    return max(DETAIL_WORKERS, concurrency.max_limit) if concurrency else DETAIL_WORKERS
+
+
+def iter_product_changes(products: Iterable[Dict[str, str]], state_store, origin: str,
+                         detect_removed: bool = True, resume: bool = False) -> Iterator[Dict[str, str]]:
+    """
+    Filtra un flujo de productos y deja solo los que cambiaron (ver changes.py)
+    
+    Args:
+        products: Productos del scraping (ej: iter_products())
+        state_store: changes.ProductStateStore con el estado anterior
+        origin: Identificador del scraping (la URL de la categoría)
+        detect_removed: Añadir al final los productos eliminados
+        resume: Continuar el último scraping sin terminar de este origen
+        
+    Yields:
+        Productos nuevos, modificados o eliminados, con las columnas 'cambio'
+        y 'campos_cambiados'
+    """
+    from changes import change_to_row
+    for change in state_store.diff(products, origin, detect_removed=detect_removed, resume=resume):
+        yield change_to_row(change)
+
+
+def open_product_sink(output_format: str, filename: str, fieldnames: List[str] = CSV_FIELDNAMES,
+                      flush_every: Optional[int] = None, append: bool = False):
+    """
+    Crea el sink (escritor incremental) de un formato de salida
+    
+    Todos los sinks tienen la misma interfaz: write(producto), flush(),
+    close(), el atributo count y uso con "with".
+    
+    Chain of Thought: Importamos sinks.py solo aquí, cuando se pide un formato
+    distinto de CSV, para que el scraper básico no cargue sqlite3 ni pyarrow.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Formato desconocido: {output_format!r}. Opciones: {OUTPUT_FORMATS}")
+    if output_format == 'csv':
+        return CSVProductSink(filename, fieldnames=fieldnames,
+                              flush_every=CSV_FLUSH_EVERY if flush_every is None else flush_every,
+                              append=append)
+    from sinks import open_sink
+    return open_sink(output_format, filename, fieldnames, flush_every=flush_every, append=append)
+
+
+def _check_csv_header(filename: str, fieldnames: List[str]) -> None:
+    """
+    Comprueba que un CSV existente tiene exactamente las columnas 'fieldnames'
+    
+    Raises:
+        ValueError: Si las columnas no coinciden
+    
+    Chain of Thought: Añadir filas con otras columnas (ej: un CSV de una
+    versión anterior, o sin --normalize-prices) las descolocaría sin dar
+    ningún error. Es mejor negarse y que el usuario empiece otro archivo.
+    """
+    with open(filename, newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f), [])
+    if header != list(fieldnames):
+        raise ValueError(f"{filename} tiene otras columnas ({', '.join(header)}); no se pueden "
+                         f"añadir filas con {', '.join(fieldnames)}. Empieza un archivo nuevo "
+                         f"(sin --resume)")
+
+
+class CSVProductSink:
+    """
+    Escribe productos en un CSV de forma incremental
+    
+    Uso básico:
+        with CSVProductSink("productos.csv") as sink:
+            for producto in scraper.iter_products():
+                sink.write(producto)
+    
+    Nota para junior: Usarlo con "with" garantiza que el archivo se cierre
+    (y se vuelque a disco) aunque ocurra un error o un Ctrl+C.
+    """
+    
+    # Se puede añadir a un CSV existente (para reanudar con --resume)
+    supports_append = True
+    
+    def __init__(self, filename: str, fieldnames: List[str] = CSV_FIELDNAMES,
+                 flush_every: int = CSV_FLUSH_EVERY, append: bool = False):
+        """
+        Args:
+            filename: Ruta del archivo CSV
+            fieldnames: Columnas del CSV
+            flush_every: Cada cuántos productos se vuelca el archivo a disco
+            append: Si es True, añade filas a un archivo existente
+        """
+        self.filename = filename
+        self.flush_every = flush_every
+        self.count = 0
+        
+        # Chain of Thought: Solo escribimos encabezados si el archivo es nuevo
+        write_header = not (append and os.path.exists(filename) and os.path.getsize(filename) > 0)
+        if not write_header:
+            _check_csv_header(filename, fieldnames)
+        
+        # Chain of Thought: Usamos 'utf-8-sig' para que Excel abra
+        # correctamente los caracteres especiales (acentos, ñ, etc.).
+        # Al añadir a un archivo existente usamos 'utf-8' para no repetir la marca BOM.
+        encoding = 'utf-8-sig' if write_header else 'utf-8'
+        self._file = open(filename, 'a' if append else 'w', newline='', encoding=encoding)
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        if write_header:
+            self._writer.writeheader()
+    
+    def write(self, product: Dict[str, str]) -> None:
+        """Escribe un producto y vuelca a disco cada 'flush_every' productos"""
+        self._writer.writerow(product)
+        self.count += 1
+        if self.flush_every and self.count % self.flush_every == 0:
+            self.flush()
+    
+    def flush(self) -> None:
+        """Vuelca al sistema operativo lo que esté pendiente en el buffer"""
+        if not self._file.closed:
+            self._file.flush()
+    
+    def close(self) -> None:
+        """Cierra el archivo (volcando lo pendiente)"""
+        if not self._file.closed:
+            self._file.close()
+    
+    def __enter__(self) -> 'CSVProductSink':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+# ============================================================================
+# PUNTOS DE CONTROL (CHECKPOINTS) PARA REANUDAR
+# ============================================================================
+# Chain of Thought: Si un scraping largo se corta en la página 30 (red caída,
+# Ctrl+C, demasiados reintentos...), no queremos repetir las 29 anteriores.
+# Después de cada página guardamos en un archivo JSON por dónde íbamos; con
+# --resume el scraper continúa desde ahí y añade al CSV existente.
+
+def checkpoint_path(output_dir: str, category_url: str) -> str:
+    """Ruta del checkpoint de una categoría, ej: resultados/doctorpet_alimentos.checkpoint.json"""
+    return os.path.join(output_dir, f"doctorpet_{category_slug(category_url)}.checkpoint.json")
+
+
+class CrawlCheckpoint:
+    """
+    Estado de un scraping guardado en disco de forma atómica
+    
+    El estado contiene: base_url, next_url (siguiente página a descargar),
+    page_number, pending (páginas conocidas sin procesar), products_emitted,
+    finished y cualquier dato extra del llamador (ej: 'output', el CSV).
+    
+    Uso básico:
+        checkpoint = CrawlCheckpoint("scraping.checkpoint.json", resume=True)
+        for producto in scraper.iter_products(checkpoint=checkpoint):
+            ...
+    """
+    
+    def __init__(self, path: str, resume: bool = False):
+        """
+        Args:
+            path: Archivo JSON del checkpoint
+            resume: Si es True y el archivo existe, se carga su estado para
+                continuar; si es False se empieza de cero (y se sobrescribe)
+        """
+        self.path = path
+        self.state: Dict = {}
+        # Función a llamar antes de cada guardado (ej: volcar el CSV a disco)
+        self.before_save = None
+        if resume and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.state = json.load(f)
+    
+    def save(self, **state) -> None:
+        """
+        Actualiza el estado y lo guarda en disco
+        
+        Chain of Thought: Escribimos primero en un archivo temporal y luego lo
+        renombramos con os.replace(). El renombrado es atómico: si el programa
+        muere a mitad, queda el checkpoint anterior completo, nunca uno a medias.
+        """
+        if self.before_save:
+            self.before_save()
+        self.state.update(state)
+        self.state['updated_at'] = datetime.now().isoformat(timespec='seconds')
+        
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+# ============================================================================
+# SCRAPING DE VARIAS CATEGORÍAS (POR LOTES)
+# ============================================================================
+# Chain of Thought: Para scrapear todas las categorías podríamos lanzar un
+# proceso por categoría, pero cada uno abriría sus propias conexiones (y
+# haría su propio "saludo" TCP/TLS con el servidor) y tendría su propio límite
+# de velocidad, así que en total iríamos más rápido de lo permitido.
+# BatchCrawler reparte las categorías entre varios hilos que comparten:
+# - UNA sesión HTTP (un solo pool de conexiones reutilizables)
+# - UN RateLimiter (el límite de velocidad es global, no por categoría)
+
+def load_category_urls(path: str) -> List[str]:
+    """
+    Lee las URLs de categorías de un archivo de texto (una por línea)
+    
+    Las líneas vacías y las que empiezan por # se ignoran.
+    """
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+
+class BatchCrawler:
+    """
+    Scrapea varias categorías con un pool de hilos, una sesión y un límite compartidos
+    
+    Uso básico:
+        crawler = BatchCrawler([url_alimentos, url_juguetes], workers=4)
+        archivos = crawler.run(output_dir="resultados")  # un CSV por categoría
+        archivos = crawler.run(combined=True)             # un único CSV
+    """
+    
+    def __init__(self, category_urls: Iterable[str], workers: int = BATCH_WORKERS,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None, **scraper_options):
+        """
+        Args:
+            category_urls: URLs de las categorías a scrapear
+            workers: Categorías que se procesan a la vez
+            rate_limiter: Límite de velocidad global (se crea uno si no se provee)
+            retry_policy: Reintentos, circuit breaker y deadline comunes a todas
+                las categorías (se crea una si no se provee)
+            **scraper_options: Opciones para cada DoctorPetScraper (engine,
+                partial_parse, http_cache, page_cache, parser_pool, archive, replay...)
+        """
+        # Chain of Thought: dict.fromkeys quita duplicados manteniendo el orden
+        self.category_urls = list(dict.fromkeys(category_urls))
+        self.workers = workers
+        concurrency = scraper_options.get('concurrency')
+        self.rate_limiter = rate_limiter or (concurrency.rate_limiter if concurrency is not None
+                                             else RateLimiter())
+        # Chain of Thought: Todas las categorías van al mismo servidor: si
+        # falla para una, falla para todas, así que la pausa es común
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.scraper_options = scraper_options
+        
+        # Chain of Thought: El pool de conexiones debe tener sitio para todos
+        # los hilos que pueden hacer peticiones a la vez (categorías x hilos
+        # por categoría en el modo 'predict'); si no, urllib3 abre y cierra
+        # conexiones extra en lugar de reutilizarlas
+        self.session = requests.Session()
+        page_workers = max(PAGE_WORKERS, concurrency.max_limit) if concurrency else PAGE_WORKERS
+        adapter = HTTPAdapter(pool_maxsize=workers * page_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+    
+    def _make_scraper(self, url: str) -> DoctorPetScraper:
+        """Crea un scraper para una categoría que usa la sesión y el límite compartidos"""
+        return DoctorPetScraper(url, rate_limiter=self.rate_limiter, session=self.session,
+                                retry_policy=self.retry_policy,
+                                **self.scraper_options)
+    
+    def run(self, output_dir: str = '.', combined: bool = False, max_pages: Optional[int] = None,
+            discovery: str = 'links', resume: bool = False,
+            output_format: str = 'csv', normalize_prices: bool = False,
+            changes_only: bool = False, history_path: Optional[str] = None,
+            details: bool = False, detail_workers: Optional[int] = None) -> Dict[str, str]:
+        """
+        Scrapea todas las categorías y guarda los resultados
+        
+        Args:
+            output_dir: Carpeta donde se guardan los archivos
+            combined: Si es True, todo va a un único archivo con una columna
+                'categoria'; si es False, se genera un archivo por categoría
+            max_pages: Número máximo de páginas por categoría (None = todas)
+            discovery: Cómo se encuentran las páginas ('links' o 'predict')
+            resume: Continuar desde los checkpoints de una ejecución anterior
+                (las categorías ya completadas no se repiten)
+            output_format: Formato de salida (ver OUTPUT_FORMATS)
+            normalize_prices: Añadir los precios numéricos (ver prices.py)
+            changes_only: Guardar solo los productos nuevos, modificados o
+                eliminados desde el scraping anterior (ver changes.py). El
+                estado se guarda en output_dir/doctorpet_estado.sqlite
+            history_path: Si se indica, todos los productos se añaden además
+                al histórico de precios de ese archivo (ver history.py)
+            details: Visitar la ficha de cada producto y añadir sus datos
+                (ver details.py). Un producto que está en varias categorías
+                se descarga una sola vez.
+            detail_workers: Fichas que se descargan a la vez (None = ver detail_worker_count)
+            
+        Returns:
+            Diccionario {url_categoría: archivo generado} ("" si falló o no hubo productos)
+        """
+        if resume and output_format not in APPENDABLE_FORMATS:
+            raise ValueError(f"El formato {output_format!r} no se puede reanudar; "
+                             f"usa uno de {APPENDABLE_FORMATS}")
+        os.makedirs(output_dir, exist_ok=True)
+        fieldnames = output_fieldnames(normalize_prices, changes_only, details)
+        enricher = None
+        if details:
+            from details import DetailEnricher
+            enricher = DetailEnricher(detail_worker_count(
+                detail_workers, self.scraper_options.get('concurrency')))
+        state_store = None
+        if changes_only:
+            from changes import ProductStateStore, STATE_DB_PATH
+            state_store = ProductStateStore(os.path.join(output_dir, STATE_DB_PATH))
+        history = None
+        if history_path:
+            from history import PriceHistory
+            history = PriceHistory(history_path)
+        checkpoints = {
+            url: CrawlCheckpoint(checkpoint_path(output_dir, url), resume=resume)
+            for url in self.category_urls
+        }
+        
+        combined_sink = None
+        sink_lock = threading.Lock()
+        if combined:
+            # Chain of Thought: Al reanudar, seguimos escribiendo en el mismo
+            # CSV combinado que la ejecución anterior
+            previous = [cp.state['output'] for cp in checkpoints.values() if cp.state.get('output')]
+            filename = previous[0] if previous else os.path.join(
+                output_dir, default_output_filename('categorias', output_format))
+            combined_sink = open_product_sink(output_format, filename,
+                                              fieldnames=fieldnames + ['categoria'],
+                                              append=bool(previous))
+        
+        def flush_combined() -> None:
+            with sink_lock:
+                combined_sink.flush()
+        
+        def crawl_category(url: str) -> str:
+            checkpoint = checkpoints[url]
+            if checkpoint.state.get('finished'):
+                logger.info(f"✓ {url} ya se completó en una ejecución anterior")
+                return checkpoint.state.get('output', "")
+            
+            # Chain of Thought: Si una categoría falla, las demás continúan
+            try:
+                scraper = self._make_scraper(url)
+                products = scraper.iter_products(max_pages, discovery, checkpoint, normalize_prices,
+                                                 enricher)
+                if history is not None:
+                    products = history.iter_record(products)
+                if state_store is not None:
+                    # Chain of Thought: Con max_pages el scraping es parcial: los
+                    # productos de las páginas no visitadas NO se han eliminado
+                    products = iter_product_changes(products, state_store, url,
+                                                    detect_removed=not max_pages, resume=resume)
+                if combined_sink is None:
+                    resuming = bool(checkpoint.state.get('output'))
+                    filename = checkpoint.state.get('output') or os.path.join(
+                        output_dir, default_output_filename(category_slug(url), output_format))
+                    checkpoint.state['output'] = filename
+                    return scraper.save_products(products, filename, output_format,
+                                                 append=resuming, checkpoint=checkpoint,
+                                                 fieldnames=fieldnames)
+                
+                checkpoint.state['output'] = combined_sink.filename
+                if combined_sink.supports_append:
+                    checkpoint.before_save = flush_combined
+                slug = category_slug(url)
+                written = 0
+                elapsed = 0.0
+                try:
+                    for product in products:
+                        # Chain of Thought: La espera del lock cuenta como
+                        # escritura: es tiempo que el hilo pasa sin scrapear
+                        start = time.perf_counter()
+                        with sink_lock:
+                            combined_sink.write({**product, 'categoria': slug})
+                        elapsed += time.perf_counter() - start
+                        written += 1
+                finally:
+                    scraper._stage('write', elapsed)
+                return combined_sink.filename if written else ""
+            except Exception as e:
+                logger.error(f"✗ Error scrapeando la categoría {url}: {e}", exc_info=True)
+                return ""
+        
+        logger.info(f"Scrapeando {len(self.category_urls)} categorías con {self.workers} hilos")
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = dict(zip(self.category_urls,
+                                   executor.map(crawl_category, self.category_urls)))
+        finally:
+            if combined_sink is not None:
+                combined_sink.close()
+            if state_store is not None:
+                state_store.close()
+            if history is not None:
+                history.close()
+            if enricher is not None:
+                enricher.close()
+        
+        logger.info(f"✓ Lote completado: {sum(1 for f in results.values() if f)}"
+                    f"/{len(results)} categorías con resultados")
+        return results
+
+
+# ============================================================================
+# SCRAPER ASÍNCRONO
+# ============================================================================
+# Chain of Thought: En el scraper normal, mientras esperamos la respuesta del
+# servidor el programa no hace nada. Con asyncio podemos "solapar" esas esperas:
+# mientras una petición viaja por la red, otra puede estar en curso.
+# Esto es útil sobre todo cuando scrapeamos varias categorías a la vez.
+#
+# Nota para junior: async/await NO usa varios hilos. Es un solo hilo que cambia
+# de tarea cada vez que una tarea tiene que esperar (por ejemplo, a la red).
+
+class AsyncDoctorPetScraper(DoctorPetScraper):
+    """
+    Versión asíncrona del scraper basada en aiohttp
+    
+    Reutiliza la misma extracción que DoctorPetScraper (hereda
+    _parse_listing_page), así que produce exactamente los mismos diccionarios.
+    Lo que cambia es cómo se descargan las páginas:
+    - Un pool de conexiones compartido (aiohttp.ClientSession)
+    - Un límite de peticiones simultáneas (max_concurrency)
+    - El mismo RateLimiter que el scraper normal, para no superar la
+      velocidad configurada aunque haya muchas peticiones en vuelo
+    
+    Uso básico:
+        scraper = AsyncDoctorPetScraper()
+        productos = asyncio.run(scraper.scrape_category_async())
+        
+        # Varias categorías en paralelo
+        resultados = asyncio.run(scraper.scrape_categories_async([url1, url2]))
+    """
+    
+    def __init__(self, base_url: str = BASE_URL,
+                 max_concurrency: int = ASYNC_MAX_CONCURRENCY, **kwargs):
+        """
+        Inicializa el scraper asíncrono
+        
+        Args:
+            base_url: URL de la categoría a scrapear
+            max_concurrency: Máximo de peticiones simultáneas
+            **kwargs: Resto de opciones de DoctorPetScraper (rate_limiter,
+                engine, partial_parse, http_cache, page_cache...)
+        """
+        if aiohttp is None:
+            raise ImportError(
+                "El modo asíncrono necesita aiohttp. Instálalo con: pip install aiohttp"
+            )
+        super().__init__(base_url, **kwargs)
+        self.max_concurrency = max_concurrency
+    
+    def _create_session(self) -> 'aiohttp.ClientSession':
+        """
+        Crea la sesión HTTP asíncrona con su pool de conexiones
+        
+        Chain of Thought: Quitamos 'Accept-Encoding' de los headers y dejamos
+        que aiohttp lo ponga, porque así solo anuncia compresiones que sabe
+        descomprimir (por ejemplo, 'br' necesita una librería extra).
+        """
+        headers = {k: v for k, v in self.headers.items() if k != 'Accept-Encoding'}
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        trace_configs = []
+        if self.metrics is not None:
+            trace_configs.append(aiohttp_trace_config(self.metrics, **self.metrics_labels))
+        return aiohttp.ClientSession(headers=headers, connector=connector, timeout=timeout,
+                                     trace_configs=trace_configs)
+    
+    async def _fetch(self, session: 'aiohttp.ClientSession', url: str,
+                     retries: Optional[int] = None) -> Optional[str]:
+        """
+        Descarga una página con reintentos (versión asíncrona de _make_request)
+        
+        Args:
+            session: Sesión aiohttp compartida
+            url: URL a consultar
+            retries: Número de intentos si falla (None = los de retry_policy)
+            
+        Returns:
+            El HTML de la página si tiene éxito, None si falla
+        """
+        if self.replay is not None:
+            response = self._make_request(url)
+            return response.text if response is not None else None
+        
+        cached = self.http_cache.get(url) if self.http_cache else None
+        conditional_headers = cached.validators() if cached else {}
+        
+        host = urlparse(url).netloc
+        if retries is None:
+            retries = self.retry_policy.max_attempts
+        for attempt in range(retries):
+            pause = self._host_pause(host)
+            if pause is None:
+                return None
+            if pause:
+                await asyncio.sleep(pause)
+            if attempt:
+                self._count('retries_total')
+            wait_start = time.perf_counter()
+            await self.rate_limiter.acquire_async()
+            self._stage('rate_limit', time.perf_counter() - wait_start)
+            retry_after = None
+            ticket = await self._acquire_slot_async()
+            slot_start = time.perf_counter()
+            overload = False
+            try:
+                async with self._semaphore:
+                    logger.info("Haciendo petición a: %s (Intento %d/%d)", url, attempt + 1, retries)
+                    timeout = aiohttp.ClientTimeout(total=self.retry_policy.timeout())
+                    async with session.get(url, headers=conditional_headers, timeout=timeout,
+                                           allow_redirects=True) as response:
+                        self._count('requests_total', status=str(response.status))
+                        if response.status == 304 and cached:
+                            logger.info("✓ Página sin cambios (304), usando la caché")
+                            self._count('cache_hits_total', cache='http')
+                            self.retry_policy.record_success(host)
+                            self.http_cache.touch(url)
+                            self._archive_page(url, cached.body, cached.encoding, cached.headers)
+                            return cached.to_response().text
+                        if response.status >= 400:
+                            logger.error("✗ Error HTTP: %s para %s", response.status, url)
+                            if not self.retry_policy.is_retryable(response.status):
+                                return None
+                            overload = True
+                            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                            self._record_failure(host, retry_after)
+                        else:
+                            # Chain of Thought: dns, connect y ttfb los mide el
+                            # TraceConfig de la sesión; aquí solo falta el cuerpo
+                            download_start = time.perf_counter()
+                            body = await response.read()
+                            self._stage('download', time.perf_counter() - download_start)
+                            self._count('bytes_total', len(body))
+                            encoding = response.get_encoding()
+                            logger.info("✓ Petición exitosa: %s", response.status)
+                            self.retry_policy.record_success(host)
+                            if self.http_cache:
+                                self.http_cache.store(url, body, encoding, response.headers)
+                            self._archive_page(url, body, encoding, response.headers, response.status)
+                            return body.decode(encoding, errors='replace')
+                    
+            except asyncio.TimeoutError:
+                overload = True
+                self._count('requests_total', status='timeout')
+                logger.warning("⚠ Timeout en intento %d/%d", attempt + 1, retries)
+                self._record_failure(host)
+                
+            except aiohttp.ClientError as e:
+                overload = True
+                self._count('requests_total', status='connection_error')
+                logger.warning("⚠ Error de conexión en intento %d/%d: %s", attempt + 1, retries, e)
+                self._record_failure(host)
+            
+            finally:
+                self._release_slot(ticket, slot_start, overload=overload)
+            
+            if attempt < retries - 1:
+                wait_time = self.retry_policy.backoff(attempt, retry_after)
+                if wait_time is None:
+                    logger.error("✗ Sin reintentos para %s: no da tiempo antes del deadline "
+                                 "o el servidor pide esperar demasiado", url)
+                    return None
+                logger.info("Esperando %.1fs antes de reintentar...", wait_time)
+                await asyncio.sleep(wait_time)
+        
+        logger.error("✗ Fallo después de %d intentos", retries)
+        return None
+    
+    async def _parse_async(self, html: str, current_url: str) -> ListingPage:
+        """
+        Parsea una página sin bloquear el event loop
+        
+        Chain of Thought: Con parser_pool, el parseo se queda esperando al
+        otro proceso (y a que haya sitio en su cola). Esa espera la hace un
+        hilo, para que mientras tanto sigan avanzando las descargas.
+        """
+        if self.parser_pool is None:
+            return self._parse_listing_page(html, current_url)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._parse_listing_page, html, current_url)
+    
+    async def _crawl(self, session: 'aiohttp.ClientSession', start_url: str,
+                     max_pages: Optional[int], discovery: str = 'links') -> List[Dict[str, str]]:
+        """
+        Recorre todas las páginas de una categoría siguiendo la paginación
+        
+        Chain of Thought: Con discovery='links', la URL de la página N+1 solo
+        se conoce al parsear la página N, así que el recorrido es en orden y la
+        ganancia aparece al recorrer varias categorías al mismo tiempo.
+        Con discovery='predict', tras la página 1 se lanzan todas las demás a la vez.
+        """
+        all_products: List[Dict[str, str]] = []
+        current_url = start_url
+        page_number = 1
+        
+        while current_url:
+            if max_pages and page_number > max_pages:
+                logger.info(f"Alcanzado límite de {max_pages} páginas")
+                break
+            
+            html = await self._fetch(session, current_url)
+            if html is None:
+                logger.error(f"No se pudo obtener la página {page_number} de {start_url}")
+                break
+            
+            page = await self._parse_async(html, current_url)
+            if not page.element_count:
+                logger.warning(f"⚠ No se encontraron productos en {current_url}")
+                break
+            
+            all_products.extend(page.products)
+            self._count_page(page)
+            logger.info("✓ Extraídos %d productos de %s", len(page.products), current_url)
+            
+            predicted_urls = []
+            if discovery == 'predict' and page_number == 1:
+                predicted_urls = self._predict_page_urls(html, page.next_url)
+                if max_pages:
+                    predicted_urls = predicted_urls[:max_pages - 1]
+            
+            if predicted_urls:
+                # Chain of Thought: gather devuelve los resultados en el mismo
+                # orden que las URLs; el semáforo y el RateLimiter siguen
+                # limitando cuántas peticiones salen de verdad a la vez
+                htmls = await asyncio.gather(
+                    *(self._fetch(session, url) for url in predicted_urls)
+                )
+                fetched = []
+                for url, predicted_html in zip(predicted_urls, htmls):
+                    if predicted_html is None:
+                        logger.error(f"No se pudo obtener la página {url}")
+                        continue
+                    fetched.append((url, predicted_html))
+                pages = await asyncio.gather(
+                    *(self._parse_async(predicted_html, url) for url, predicted_html in fetched)
+                )
+                for page in pages:
+                    all_products.extend(page.products)
+                    self._count_page(page)
+                page_number += len(predicted_urls)
+                if page.next_url and page.next_url not in predicted_urls:
+                    current_url = page.next_url
+                    page_number += 1
+                else:
+                    current_url = None
+                continue
+            
+            if page.next_url and page.next_url != current_url:
+                current_url = page.next_url
+                page_number += 1
+            else:
+                current_url = None
+        
+        return all_products
+    
+    async def scrape_categories_async(self, urls: Iterable[str],
+                                      max_pages: Optional[int] = None,
+                                      discovery: str = 'links'
+                                      ) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Scrapea varias categorías a la vez compartiendo el pool de conexiones
+        
+        Args:
+            urls: URLs de las categorías a scrapear
+            max_pages: Número máximo de páginas por categoría (None = todas)
+            discovery: Cómo se encuentran las páginas ('links' o 'predict')
+            
+        Returns:
+            Diccionario {url_categoría: lista de productos}
+        """
+        if discovery not in DISCOVERY_MODES:
+            raise ValueError(f"Modo desconocido: {discovery!r}. Opciones: {DISCOVERY_MODES}")
+        urls = list(urls)
+        # Chain of Thought: Creamos el semáforo aquí (dentro del event loop)
+        # porque los objetos de asyncio pertenecen al loop en el que se usan
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.retry_policy.start()
+        
+        async with self._create_session() as session:
+            results = await asyncio.gather(
+                *(self._crawl(session, url, max_pages, discovery) for url in urls)
+            )
+        
+        return dict(zip(urls, results))
+    
+    async def scrape_category_async(self, max_pages: Optional[int] = None,
+                                    discovery: str = 'links') -> List[Dict[str, str]]:
+        """
+        Versión asíncrona de scrape_category()
+        
+        Args:
+            max_pages: Número máximo de páginas a scrapear (None = todas)
+            discovery: Cómo se encuentran las páginas ('links' o 'predict')
+            
+        Returns:
+            Lista de diccionarios con información de productos
+        """
+        results = await self.scrape_categories_async([self.base_url], max_pages, discovery)
+        products = results[self.base_url]
+        logger.info(f"SCRAPING FINALIZADO: {len(products)} productos totales")
+        return products
 
 
 # ============================================================================
 # FUNCIÓN PRINCIPAL
 # ============================================================================
-def main():
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Lee las opciones de la línea de comandos
+    
+    Nota para junior: argparse genera automáticamente la ayuda.
+    Prueba: python scraper.py --help
+    """
+    parser = argparse.ArgumentParser(description="Web scraper de productos de DoctorPet.co")
+    parser.add_argument('--categories', nargs='+', metavar='URL',
+                        help="URLs de categorías a scrapear (por defecto: alimentos)")
+    parser.add_argument('--categories-file', metavar='ARCHIVO',
+                        help="Archivo con URLs de categorías, una por línea")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS,
+                        help="Categorías que se scrapean a la vez")
+    parser.add_argument('--combined', action='store_true',
+                        help="Guardar todas las categorías en un único archivo")
+    parser.add_argument('--output-dir', default='.',
+                        help="Carpeta donde guardar los resultados")
+    parser.add_argument('--format', dest='output_format', choices=OUTPUT_FORMATS, default='csv',
+                        help="Formato de salida (parquet requiere pyarrow)")
+    parser.add_argument('--max-pages', type=int,
+                        help="Número máximo de páginas por categoría")
+    parser.add_argument('--discovery', choices=DISCOVERY_MODES, default='links',
+                        help="Cómo encontrar las páginas de cada categoría")
+    parser.add_argument('--sitemap', nargs='?', const='', metavar='URL',
+                        help="Descubrir los productos por el sitemap (sin URL: se busca en la "
+                             "web) y visitar solo las fichas cuyo <lastmod> cambió desde la "
+                             "última ejecución (ver sitemaps.py)")
+    parser.add_argument('--sitemap-filter', metavar='TEXTO',
+                        help="Con --sitemap, solo las URLs de producto que contengan este texto")
+    parser.add_argument('--source', choices=FETCH_SOURCES, default='html',
+                        help="Leer los productos de las páginas HTML o de la Store API de "
+                             "WooCommerce (si no responde, se usa el HTML)")
+    parser.add_argument('--engine', choices=PARSER_ENGINES, default='bs4',
+                        help="Motor de extracción de productos")
+    parser.add_argument('--parse-workers', type=int, default=0, metavar='N',
+                        help="Procesos que parsean el HTML en paralelo (0 = parsear en los "
+                             "mismos hilos que descargan)")
+    parser.add_argument('--normalize-prices', action='store_true',
+                        help="Añadir columnas con los precios numéricos y el descuento (requiere numpy)")
+    parser.add_argument('--details', action='store_true',
+                        help="Visitar la ficha de cada producto y añadir SKU, marca, peso, "
+                             "tamaño, descripción y stock (ver details.py)")
+    parser.add_argument('--detail-workers', type=int, metavar='N',
+                        help="Fichas de producto que se descargan a la vez")
+    parser.add_argument('--changes-only', action='store_true',
+                        help="Guardar solo los productos nuevos, modificados o eliminados "
+                             "desde el scraping anterior")
+    parser.add_argument('--history', nargs='?', const='', metavar='ARCHIVO',
+                        help="Añadir los productos al histórico de precios (sin ARCHIVO: "
+                             "el de history.HISTORY_DB_PATH; ver history.py)")
+    parser.add_argument('--http-cache', nargs='?', const=HTTP_CACHE_PATH, metavar='ARCHIVO',
+                        help="Guardar las páginas con su ETag/Last-Modified y, en la siguiente "
+                             "ejecución, no volver a descargar las que no cambiaron (sin ARCHIVO: "
+                             f"{HTTP_CACHE_PATH}; ver cache.py)")
+    parser.add_argument('--page-cache', nargs='?', const=PAGE_CACHE_PATH, metavar='ARCHIVO',
+                        help="No volver a parsear las páginas que llegan idénticas a una ya "
+                             f"procesada (sin ARCHIVO: {PAGE_CACHE_PATH}; ver cache.py). Con "
+                             "--parse-workers, cada página se decodifica en el hilo que descarga "
+                             "para calcular su huella y solo las nuevas se parsean en los procesos")
+    parser.add_argument('--archive', nargs='?', const='doctorpet_archivo.warc.gz', metavar='ARCHIVO',
+                        help="Guardar cada página descargada en un archivo comprimido (ver archive.py)")
+    parser.add_argument('--replay', metavar='ARCHIVO',
+                        help="Leer las páginas de un archivo en lugar de descargarlas (sin red)")
+    parser.add_argument('--replay-date', metavar='FECHA',
+                        help="Con --replay, usar las páginas tal como estaban ese día (ej: 2024-09-30)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continuar un scraping interrumpido desde su último checkpoint")
+    parser.add_argument('--adaptive', nargs='?', type=int, const=ADAPTIVE_MAX_CONCURRENCY,
+                        metavar='TECHO',
+                        help="Ajustar las peticiones simultáneas según la latencia y los "
+                             f"errores, hasta TECHO (por defecto {ADAPTIVE_MAX_CONCURRENCY}); la "
+                             f"velocidad fija se sustituye por un techo de {ADAPTIVE_MAX_RATE:g} "
+                             "peticiones/s")
+    parser.add_argument('--deadline', type=float, metavar='SEGUNDOS',
+                        help="Tiempo máximo total del scraping; al agotarse no se hacen más "
+                             "peticiones (continúa después con --resume)")
+    parser.add_argument('--metrics', metavar='ARCHIVO',
+                        help="Medir los tiempos de cada etapa y guardarlos al terminar "
+                             "(.json = JSON; otra extensión = formato de Prometheus)")
+    args = parser.parse_args(argv)
+    if args.history == '':
+        # Chain of Thought: history.py se importa solo si se pide el histórico
+        # (necesita numpy), igual que en el resto del scraper
+        from history import HISTORY_DB_PATH
+        args.history = HISTORY_DB_PATH
+    if args.resume and args.output_format not in APPENDABLE_FORMATS:
+        parser.error(f"--resume no funciona con --format {args.output_format}: el archivo "
+                     f"no se puede ampliar (usa {', '.join(APPENDABLE_FORMATS)})")
+    if args.sitemap is not None and (args.categories or args.categories_file):
+        parser.error("--sitemap recorre toda la web: no se combina con --categories "
+                     "(usa --sitemap-filter para quedarte con una parte)")
+    # Chain of Thought: Con --sitemap no hay páginas de listado, así que estas
+    # opciones no tendrían efecto; mejor avisar que ignorarlas en silencio
+    if args.sitemap is not None:
+        ignored = [option for option, used in (('--source', args.source != 'html'),
+                                               ('--max-pages', args.max_pages is not None),
+                                               ('--discovery', args.discovery != 'links'))
+                   if used]
+        if ignored:
+            parser.error(f"--sitemap visita las fichas de producto, no las páginas de listado: "
+                         f"no se combina con {', '.join(ignored)}")
+    return args
+
+
+def scraper_options_from_args(args: argparse.Namespace) -> Dict:
+    """
+    Crea las opciones de DoctorPetScraper que indica la línea de comandos
+    
+    Chain of Thought: Se crean UNA vez para todo el scraping (un solo pool de
+    procesos, un solo archivo de páginas) y se comparten entre categorías
+    """
+    options: Dict = {'engine': args.engine, 'source': args.source}
+    if args.parse_workers > 0:
+        options['parser_pool'] = ParserPool(args.parse_workers)
+    if args.http_cache:
+        options['http_cache'] = HTTPCache(args.http_cache)
+    if args.page_cache:
+        options['page_cache'] = ParsedPageCache(args.page_cache)
+        if args.parse_workers > 0:
+            # Ver _parse_response: la huella necesita el texto, no los bytes
+            logger.info("ℹ Con --page-cache las páginas se decodifican en los hilos de descarga; "
+                        "los procesos de --parse-workers solo parsean las que no están en la caché")
+    if args.archive:
+        options['archive'] = PageArchive(args.archive)
+    if args.replay:
+        options['replay'] = PageArchive(args.replay, as_of=args.replay_date)
+    if args.metrics:
+        options['metrics'] = Metrics()
+    if args.deadline:
+        options['retry_policy'] = RetryPolicy(deadline=args.deadline)
+    if args.adaptive:
+        options['concurrency'] = ConcurrencyController(max_limit=args.adaptive)
+    return options
+
+
+def close_scraper_options(options: Dict, metrics_path: Optional[str] = None) -> None:
+    """
+    Cierra lo que abrió scraper_options_from_args() y guarda las métricas
+    
+    Chain of Thought: Se llama en el 'finally' de main(), así las métricas
+    se guardan también si el scraping se interrumpe (Ctrl+C). Se cierra todo
+    lo que tenga close(): pool de procesos, archivo de páginas, caché HTTP...
+    """
+    metrics = options.get('metrics')
+    if metrics is not None and metrics_path:
+        metrics.dump(metrics_path)
+        for line in metrics.summary_lines():
+            logger.info("⏱ %s", line)
+        logger.info("📊 Métricas guardadas en: %s", metrics_path)
+    for value in options.values():
+        if hasattr(value, 'close'):
+            value.close()
+
+
+def main(argv: Optional[List[str]] = None):
     """
     Función principal que ejecuta el scraper
     
@@ -538,7 +3572,10 @@ def main():
     
     Nota para junior: Esta función se ejecuta cuando corres el script directamente:
     python scraper.py
+    python scraper.py --categories URL1 URL2 --workers 2
     """
+    args = parse_args(argv)
+    
     logger.info("""
 ╔══════════════════════════════════════════════════════════════════════════╗
 ║                   DOCTORPET.CO WEB SCRAPER                              ║
@@ -546,18 +3583,115 @@ def main():
 ╚══════════════════════════════════════════════════════════════════════════╝
     """)
     
+    category_urls = list(args.categories or [])
+    if args.categories_file:
+        category_urls += load_category_urls(args.categories_file)
+    
+    if category_urls:
+        # Modo por lotes: varias categorías con sesión y límite compartidos
+        options = scraper_options_from_args(args)
+        try:
+            crawler = BatchCrawler(category_urls, workers=args.workers, **options)
+            results = crawler.run(output_dir=args.output_dir, combined=args.combined,
+                                  max_pages=args.max_pages, discovery=args.discovery,
+                                  resume=args.resume, output_format=args.output_format,
+                                  normalize_prices=args.normalize_prices,
+                                  changes_only=args.changes_only, history_path=args.history,
+                                  details=args.details, detail_workers=args.detail_workers)
+            for url, filename in results.items():
+                logger.info(f"📁 {url} -> {filename or 'sin resultados'}")
+            if crawler.retry_policy.expired():
+                logger.warning("⚠ Se agotó el tiempo máximo (--deadline): puede haber "
+                               "categorías a medias")
+                if args.output_format in APPENDABLE_FORMATS:
+                    logger.info("↻ Para continuar: repite el mismo comando con --resume")
+        except KeyboardInterrupt:
+            logger.info("\n\n⚠ Scraping interrumpido por el usuario (Ctrl+C)")
+            logger.info(f"📁 Los productos extraídos hasta ahora están en: {args.output_dir}")
+        finally:
+            close_scraper_options(options, args.metrics)
+        return
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    # Chain of Thought: Guardamos checkpoint siempre que el formato se pueda
+    # ampliar, así cualquier ejecución se puede reanudar después con --resume
+    checkpoint = None
+    if args.output_format in APPENDABLE_FORMATS:
+        checkpoint = CrawlCheckpoint(checkpoint_path(args.output_dir, BASE_URL),
+                                     resume=args.resume)
+        if checkpoint.state.get('finished'):
+            logger.info(f"✓ El scraping ya se completó: {checkpoint.state.get('output')}")
+            return
+    resuming = bool(checkpoint and checkpoint.state.get('output'))
+    filename = checkpoint.state['output'] if resuming else os.path.join(
+        args.output_dir, default_output_filename(output_format=args.output_format))
+    if checkpoint is not None:
+        checkpoint.state['output'] = filename
+    options = scraper_options_from_args(args)
+    enricher = None
+    if args.details and args.sitemap is None:
+        from details import DetailEnricher
+        enricher = DetailEnricher(detail_worker_count(args.detail_workers,
+                                                      options.get('concurrency')))
+    sitemap_index = None
+    history = None
+    state_store = None
+    products = None
+    
     try:
         # Crear instancia del scraper
-        scraper = DoctorPetScraper()
+        scraper = DoctorPetScraper(**options)
         
-        # Ejecutar scraping
-        # Chain of Thought: Puedes limitar páginas para testing:
-        # productos = scraper.scrape_category(max_pages=2)
-        productos = scraper.scrape_category()
+        # Ejecutar scraping y guardar resultados
+        # Chain of Thought: Pasamos el generador iter_products() directamente a
+        # save_products, así cada producto se escribe en cuanto se extrae.
+        # Puedes limitar páginas para testing: python scraper.py --max-pages 2
+        if args.sitemap is not None:
+            # Chain of Thought: En modo sitemap el propio índice de <lastmod>
+            # hace de checkpoint: lo que no se llegó a guardar sale otra vez
+            # como cambiado en la próxima ejecución
+            from sitemaps import SitemapIndex, SITEMAP_DB_PATH
+            sitemap_index = SitemapIndex(os.path.join(args.output_dir, SITEMAP_DB_PATH))
+            checkpoint = None
+            products = scraper.iter_sitemap_products(args.sitemap or None, sitemap_index,
+                                                     args.sitemap_filter, args.normalize_prices,
+                                                     args.detail_workers)
+        else:
+            products = scraper.iter_products(args.max_pages, args.discovery, checkpoint,
+                                             args.normalize_prices, enricher)
+        if args.history:
+            from history import PriceHistory
+            history = PriceHistory(args.history)
+            products = history.iter_record(products)
+        if args.changes_only:
+            from changes import ProductStateStore, STATE_DB_PATH
+            state_store = ProductStateStore(os.path.join(args.output_dir, STATE_DB_PATH))
+            # Chain of Thought: Con --sitemap solo llegan los productos que
+            # cambiaron, así que los que faltan NO están eliminados
+            products = iter_product_changes(
+                products, state_store, BASE_URL,
+                detect_removed=not args.max_pages and args.sitemap is None, resume=resuming)
+        filename = scraper.save_products(
+            products, filename, args.output_format, append=resuming, checkpoint=checkpoint,
+            fieldnames=output_fieldnames(args.normalize_prices, args.changes_only,
+                                         args.details or args.sitemap is not None))
         
-        # Guardar resultados
-        if productos:
-            filename = scraper.save_to_csv(productos)
+        # Chain of Thought: Con --deadline el scraping puede acabar "bien" pero
+        # incompleto; el checkpoint sabe si de verdad se recorrió todo
+        cut_short = scraper.retry_policy.expired() and not (
+            checkpoint is not None and checkpoint.state.get('finished'))
+        if cut_short:
+            logger.warning("\n⚠ Se agotó el tiempo máximo (--deadline): el scraping quedó a medias")
+            if filename:
+                logger.info(f"📁 Los productos extraídos hasta ahora están en: {filename}")
+            if checkpoint is not None:
+                logger.info("↻ Para continuar: python scraper.py --resume")
+            elif args.sitemap is not None:
+                logger.info("↻ La próxima ejecución con --sitemap visitará las fichas que faltan")
+        elif not filename and (args.changes_only or args.sitemap is not None):
+            logger.info("\n✓ Sin cambios desde el scraping anterior")
+        elif filename:
             logger.info(f"\n🎉 ¡Scraping completado exitosamente!")
             logger.info(f"📁 Revisa el archivo: {filename}")
         else:
@@ -570,11 +3704,29 @@ def main():
     
     except KeyboardInterrupt:
         logger.info("\n\n⚠ Scraping interrumpido por el usuario (Ctrl+C)")
-        logger.info("Los productos extraídos hasta ahora no se guardaron")
+        if os.path.exists(filename):
+            logger.info(f"📁 Los productos extraídos hasta ahora están en: {filename}")
+            if checkpoint is not None:
+                logger.info("↻ Para continuar: python scraper.py --resume")
     
     except Exception as e:
         logger.error(f"\n\n✗ Error inesperado: {e}")
         logger.error("Stack trace completo:", exc_info=True)
+    
+    finally:
+        if enricher is not None:
+            enricher.close()
+        # Chain of Thought: Primero se cierra la cadena de generadores, así sus
+        # 'finally' guardan lo pendiente ANTES de cerrar las bases de datos
+        if products is not None:
+            products.close()
+        if sitemap_index is not None:
+            sitemap_index.close()
+        if history is not None:
+            history.close()
+        if state_store is not None:
+            state_store.close()
+        close_scraper_options(options, args.metrics)
 
 
 # ============================================================================
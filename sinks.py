@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Formatos de salida (sinks) para los productos del scraper de DoctorPet.co
+
+Este módulo contiene, además del CSV que ya escribe scraper.py:
+- SQLiteProductSink: Una tabla SQLite con índice por enlace del producto
+- JSONLProductSink: Un producto JSON por línea, comprimido con gzip
+- ParquetProductSink: Formato columnar con columnas tipadas (requiere pyarrow)
+
+Todos tienen la misma interfaz que CSVProductSink (write, flush, close y uso
+con "with"), así que aceptan los productos según van llegando de
+iter_products() sin tener que guardarlos todos en memoria.
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+# Explicación para desarrolladores junior:
+# - sqlite3: Base de datos en un solo archivo, incluida en Python
+# - gzip: Para comprimir el archivo JSONL mientras se escribe
+# - pyarrow: Librería para formatos columnares (Parquet). Es OPCIONAL: si no
+#   está instalada, solo el formato 'parquet' deja de estar disponible.
+
+import gzip
+import json
+import logging
+import os
+import sqlite3
+from typing import Dict, List, Optional, Union
+
+# Chain of Thought: pyarrow es una dependencia pesada y solo la necesita el
+# formato Parquet, así que no obligamos a instalarla
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende del entorno
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONSTANTES DE CONFIGURACIÓN
+# ============================================================================
+
+# Extensión de archivo de cada formato (el CSV lo escribe scraper.py)
+FILE_EXTENSIONS = {
+    'csv': 'csv',
+    'sqlite': 'sqlite',
+    'jsonl': 'jsonl.gz',
+    'parquet': 'parquet',
+}
+
+# Tabla donde SQLiteProductSink guarda los productos
+SQLITE_TABLE = "productos"
+
+# Productos por cada INSERT en bloque (executemany)
+# Chain of Thought: Insertar fila a fila con un commit cada vez es lentísimo
+# (cada commit espera a que el disco confirme). Agrupando cientos de filas
+# en un solo executemany + commit, el coste por fila es mínimo.
+SQLITE_BATCH_SIZE = 500
+
+# Productos por cada "row group" (bloque de filas) del archivo Parquet
+# Nota para junior: Parquet guarda los datos por columnas dentro de bloques
+# de filas. Bloques grandes = mejor compresión y lecturas más rápidas.
+PARQUET_ROW_GROUP_SIZE = 10000
+
+# Tipo de cada columna en los formatos tipados (SQLite y Parquet)
+# Chain of Thought: Las columnas que no aparecen aquí se guardan como texto.
+# Los precios numéricos los añade prices.py (--normalize-prices)
+FIELD_TYPES: Dict[str, str] = {
+    'precio_num': 'float',
+    'precio_anterior_num': 'float',
+    'descuento_pct': 'float',
+}
+
+_SQLITE_TYPES = {'str': 'TEXT', 'float': 'REAL', 'int': 'INTEGER'}
+
+
+def _arrow_type(field: str):
+    """Tipo de pyarrow de una columna según FIELD_TYPES"""
+    return {'float': pa.float64(), 'int': pa.int64()}.get(FIELD_TYPES.get(field), pa.string())
+
+
+# ============================================================================
+# SQLITE
+# ============================================================================
+
+class SQLiteProductSink:
+    """
+    Guarda productos en una tabla SQLite, insertándolos en bloques
+
+    Uso básico:
+        with SQLiteProductSink("productos.sqlite", CSV_FIELDNAMES) as sink:
+            for producto in scraper.iter_products():
+                sink.write(producto)
+
+    Para consultarlos después:
+        sqlite3 productos.sqlite "SELECT nombre, precio FROM productos"
+    """
+
+    # Chain of Thought: SQLite admite añadir filas a una tabla existente,
+    # así que este formato sirve para reanudar scrapings (--resume)
+    supports_append = True
+
+    def __init__(self, filename: str, fieldnames: List[str],
+                 flush_every: int = SQLITE_BATCH_SIZE, append: bool = False,
+                 table: str = SQLITE_TABLE):
+        """
+        Args:
+            filename: Ruta del archivo de la base de datos
+            fieldnames: Columnas de la tabla
+            flush_every: Cada cuántos productos se insertan en la base de datos
+            append: Si es True, añade filas a la tabla existente; si es False,
+                la tabla se vacía antes de empezar
+            table: Nombre de la tabla
+        """
+        self.filename = filename
+        self.fieldnames = list(fieldnames)
+        self.flush_every = flush_every
+        self.table = table
+        self.count = 0
+        self._pending: List[tuple] = []
+
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        if not append:
+            self._conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+        columns = ', '.join(
+            f'"{field}" {_SQLITE_TYPES[FIELD_TYPES.get(field, "str")]}' for field in self.fieldnames
+        )
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{table}" (id INTEGER PRIMARY KEY, {columns})'
+        )
+        # Chain of Thought: El índice por enlace hace rápidas las búsquedas de
+        # un producto concreto (y los cruces entre varios scrapings)
+        if 'enlace' in self.fieldnames:
+            self._conn.execute(
+                f'CREATE INDEX IF NOT EXISTS "idx_{table}_enlace" ON "{table}" (enlace)'
+            )
+        self._conn.commit()
+
+        placeholders = ', '.join('?' for _ in self.fieldnames)
+        names = ', '.join(f'"{field}"' for field in self.fieldnames)
+        self._insert_sql = f'INSERT INTO "{table}" ({names}) VALUES ({placeholders})'
+
+    def write(self, product: Dict) -> None:
+        """Añade un producto al bloque pendiente e inserta cada 'flush_every' productos"""
+        self._pending.append(tuple(product.get(field) for field in self.fieldnames))
+        self.count += 1
+        if self.flush_every and len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        """Inserta el bloque pendiente con un solo executemany y confirma (commit)"""
+        if self._pending and self._conn is not None:
+            self._conn.executemany(self._insert_sql, self._pending)
+            self._conn.commit()
+            self._pending = []
+
+    def close(self) -> None:
+        """Inserta lo pendiente y cierra la conexión"""
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> 'SQLiteProductSink':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+# ============================================================================
+# JSON LINES COMPRIMIDO
+# ============================================================================
+
+class JSONLProductSink:
+    """
+    Guarda productos como JSON Lines comprimido con gzip (un producto por línea)
+
+    Uso básico:
+        with JSONLProductSink("productos.jsonl.gz", CSV_FIELDNAMES) as sink:
+            sink.write(producto)
+
+    Nota para junior: Para leerlo, cada línea es un JSON independiente:
+        with gzip.open("productos.jsonl.gz", "rt", encoding="utf-8") as f:
+            productos = [json.loads(linea) for linea in f]
+    """
+
+    # Chain of Thought: Varios bloques gzip seguidos forman un archivo gzip
+    # válido, así que podemos añadir al final al reanudar
+    supports_append = True
+
+    def __init__(self, filename: str, fieldnames: List[str],
+                 flush_every: int = 50, append: bool = False):
+        """
+        Args:
+            filename: Ruta del archivo (.jsonl.gz)
+            fieldnames: Campos de cada producto que se guardan
+            flush_every: Cada cuántos productos se vuelca el archivo a disco
+            append: Si es True, añade productos a un archivo existente
+        """
+        self.filename = filename
+        self.fieldnames = list(fieldnames)
+        self.flush_every = flush_every
+        self.count = 0
+        self._file = gzip.open(filename, 'at' if append else 'wt', encoding='utf-8')
+
+    def write(self, product: Dict) -> None:
+        """Escribe un producto y vuelca a disco cada 'flush_every' productos"""
+        record = {field: product.get(field) for field in self.fieldnames}
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+        if self.flush_every and self.count % self.flush_every == 0:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Vuelca lo comprimido hasta ahora
+
+        Chain of Thought: gzip guarda datos en su compresor interno; flush()
+        los saca al archivo para que lo escrito se pueda leer aunque el
+        programa se corte después.
+        """
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self) -> None:
+        """Cierra el archivo (volcando lo pendiente)"""
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> 'JSONLProductSink':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+# ============================================================================
+# PARQUET (COLUMNAR)
+# ============================================================================
+# Chain of Thought: En un CSV, leer solo la columna "precio" obliga a leer y
+# parsear todas las filas completas. Parquet guarda cada columna por separado,
+# comprimida y con su tipo, así que los análisis leen solo lo que necesitan
+# y no tienen que volver a convertir texto en números.
+
+class ParquetProductSink:
+    """
+    Guarda productos en un archivo Parquet, por bloques de filas
+
+    Uso básico:
+        with ParquetProductSink("productos.parquet", CSV_FIELDNAMES) as sink:
+            for producto in scraper.iter_products():
+                sink.write(producto)
+
+    Nota para junior: Un archivo Parquet solo es legible cuando se cierra
+    (al final se escribe su "índice"). Por eso no se puede añadir a uno
+    existente ni reanudar un scraping sobre él.
+    """
+
+    supports_append = False
+
+    def __init__(self, filename: str, fieldnames: List[str],
+                 flush_every: int = PARQUET_ROW_GROUP_SIZE, append: bool = False):
+        """
+        Args:
+            filename: Ruta del archivo (.parquet)
+            fieldnames: Columnas del archivo
+            flush_every: Productos por bloque de filas (row group)
+            append: No soportado (ver la nota de la clase)
+        """
+        if pa is None:
+            raise ImportError("El formato 'parquet' requiere pyarrow: pip install pyarrow")
+        if append:
+            raise ValueError("Un archivo Parquet no se puede ampliar; usa 'sqlite' o 'jsonl'")
+
+        self.filename = filename
+        self.fieldnames = list(fieldnames)
+        self.flush_every = flush_every
+        self.count = 0
+        self.schema = pa.schema([(field, _arrow_type(field)) for field in self.fieldnames])
+        # Chain of Thought: Guardamos las filas pendientes por columnas, que es
+        # justo como las necesita pyarrow para construir el bloque
+        self._columns: Dict[str, list] = {field: [] for field in self.fieldnames}
+        self._writer = pq.ParquetWriter(filename, self.schema, compression='zstd')
+
+    def write(self, product: Dict) -> None:
+        """Añade un producto y escribe un bloque cada 'flush_every' productos"""
+        for field, values in self._columns.items():
+            values.append(product.get(field))
+        self.count += 1
+        if self.flush_every and self.count % self.flush_every == 0:
+            self.flush()
+
+    def flush(self) -> None:
+        """Escribe las filas pendientes como un bloque (row group)"""
+        if self._writer is None or not self._columns[self.fieldnames[0]]:
+            return
+        batch = pa.record_batch(
+            [pa.array(self._columns[field], type=self.schema.field(field).type)
+             for field in self.fieldnames],
+            schema=self.schema,
+        )
+        self._writer.write_batch(batch)
+        self._columns = {field: [] for field in self.fieldnames}
+
+    def close(self) -> None:
+        """Escribe lo pendiente y cierra el archivo"""
+        if self._writer is not None:
+            self.flush()
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> 'ParquetProductSink':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+def read_parquet(paths: Union[str, List[str]]):
+    """
+    Lee uno o varios archivos Parquet (o una carpeta) en una sola tabla
+
+    Args:
+        paths: Archivo, lista de archivos o carpeta con archivos .parquet
+
+    Returns:
+        pyarrow.Table con todos los productos (usa .to_pandas() o
+        .to_pylist() para convertirla)
+
+    Chain of Thought: Cargar todos los scrapings de un día es UNA lectura
+    columnar, en lugar de abrir y parsear decenas de CSV uno a uno.
+    """
+    if pa is None:
+        raise ImportError("Leer Parquet requiere pyarrow: pip install pyarrow")
+    if isinstance(paths, str) and os.path.isdir(paths):
+        paths = sorted(os.path.join(paths, name) for name in os.listdir(paths)
+                       if name.endswith('.parquet'))
+    return pq.ParquetDataset(paths).read()
+
+
+# Clase de cada formato (el CSV se resuelve en scraper.py)
+SINKS = {
+    'sqlite': SQLiteProductSink,
+    'jsonl': JSONLProductSink,
+    'parquet': ParquetProductSink,
+}
+
+
+def open_sink(output_format: str, filename: str, fieldnames: List[str],
+              flush_every: Optional[int] = None, append: bool = False):
+    """
+    Crea el sink de un formato
+
+    Args:
+        output_format: 'sqlite', 'jsonl' o 'parquet'
+        filename: Ruta del archivo de salida
+        fieldnames: Campos que se guardan
+        flush_every: Cada cuántos productos se escribe (None = el valor por
+            defecto de cada formato)
+        append: Añadir a un archivo existente
+    """
+    if output_format not in SINKS:
+        raise ValueError(f"Formato desconocido: {output_format!r}. Opciones: {tuple(SINKS)}")
+    options = {} if flush_every is None else {'flush_every': flush_every}
+    return SINKS[output_format](filename, fieldnames, append=append, **options)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Descubrimiento de productos por el sitemap de DoctorPet.co
+
+WordPress y WooCommerce publican sitemaps XML con TODAS las URLs de
+producto y, para cada una, la fecha de su última modificación (<lastmod>).
+Leyendo el sitemap en lugar de recorrer las páginas de listado:
+- Se conocen todos los productos con unas pocas peticiones
+- Comparando <lastmod> con la ejecución anterior (SitemapIndex) solo se
+  visitan las fichas que cambiaron: un seguimiento frecuente pasa de
+  re-scrapear todo el catálogo a descargar unas pocas fichas
+
+Los sitemaps se leen por partes según llegan de la red (también los
+comprimidos .xml.gz), así la memoria no crece con su tamaño. La descarga
+la hace DoctorPetScraper.open_stream() y la visita de las fichas
+DoctorPetScraper.iter_sitemap_products().
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+# Explicación para desarrolladores junior:
+# - gzip: Los sitemaps grandes suelen publicarse comprimidos (.xml.gz)
+# - lxml.etree.iterparse: Lee el XML por trozos y avisa de cada elemento
+#   cerrado, sin construir el documento entero en memoria
+
+import gzip
+import io
+import logging
+import re
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+from typing import BinaryIO, Callable, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple, Union
+from urllib.parse import urlparse
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONSTANTES DE CONFIGURACIÓN
+# ============================================================================
+
+# Dónde buscar el sitemap si no se indica (en este orden)
+# Chain of Thought: /wp-sitemap.xml es el sitemap propio de WordPress (5.5+);
+# /sitemap_index.xml es el de Yoast SEO, que lo sustituye si está instalado
+SITEMAP_PATHS = ('/wp-sitemap.xml', '/sitemap_index.xml')
+
+# Sitemaps hijos que contienen productos
+# Ejemplos: wp-sitemap-posts-product-1.xml (WordPress), product-sitemap.xml y
+# product-sitemap2.xml (Yoast). NO: product_cat-sitemap.xml (categorías)
+PRODUCT_SITEMAP_PATTERN = re.compile(r'[/-]product(?:-sitemap\d*|-\d+)?\.xml(?:\.gz)?$')
+
+# Niveles de sitemaps índice que se siguen (protege de índices en bucle)
+SITEMAP_MAX_DEPTH = 3
+
+# Ruta por defecto de la base de datos con el <lastmod> de cada URL
+SITEMAP_DB_PATH = "doctorpet_sitemap.sqlite"
+
+# Cada cuántas URLs se confirma (commit) el índice en disco
+SITEMAP_COMMIT_EVERY = 500
+
+# Los dos primeros bytes de cualquier archivo gzip
+GZIP_MAGIC = b'\x1f\x8b'
+
+_ENTRY_TAGS = ('url', 'sitemap')
+
+
+class SitemapEntry(NamedTuple):
+    """
+    Una URL del sitemap
+
+    Attributes:
+        loc: La URL
+        lastmod: Fecha de su última modificación, tal como la da el sitemap
+            (None si no la indica)
+    """
+    loc: str
+    lastmod: Optional[str]
+
+
+# ============================================================================
+# LECTURA DEL SITEMAP
+# ============================================================================
+
+def default_sitemap_urls(site_url: str) -> Tuple[str, ...]:
+    """
+    URLs donde suele estar el sitemap de la web de 'site_url'
+
+    Ejemplo:
+        default_sitemap_urls("https://doctorpet.co/producto-category/alimentos/")
+        -> ("https://doctorpet.co/wp-sitemap.xml", "https://doctorpet.co/sitemap_index.xml")
+    """
+    parsed = urlparse(site_url)
+    return tuple(f"{parsed.scheme}://{parsed.netloc}{path}" for path in SITEMAP_PATHS)
+
+
+def _open_xml(stream: BinaryIO) -> BinaryIO:
+    """
+    Devuelve el flujo listo para el parser, descomprimiéndolo si es gzip
+
+    Chain of Thought: Miramos los primeros bytes y no la extensión .gz: hay
+    servidores que sirven el .xml.gz ya descomprimido (Content-Encoding) y
+    otros que comprimen un .xml sin avisar. peek() mira sin consumirlos.
+    """
+    if not hasattr(stream, 'peek'):
+        stream = io.BufferedReader(stream)
+    if stream.peek(len(GZIP_MAGIC))[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def parse_sitemap(stream: BinaryIO) -> Iterator[Tuple[str, SitemapEntry]]:
+    """
+    Lee un sitemap (o un índice de sitemaps) por partes
+
+    Yields:
+        ('url', entrada) por cada página y ('sitemap', entrada) por cada
+        sitemap hijo de un índice
+
+    Raises:
+        etree.XMLSyntaxError, OSError, EOFError: Si el XML o el gzip están rotos
+
+    Chain of Thought: Borramos cada elemento en cuanto lo hemos leído (y los
+    hermanos anteriores que lxml aún enlaza), así en memoria solo hay una
+    entrada a la vez aunque el sitemap tenga 50.000.
+
+    Nota para junior: resolve_entities=False evita que un XML malicioso nos
+    haga leer archivos locales o expandir entidades sin fin.
+    """
+    tags = [f'{{*}}{tag}' for tag in _ENTRY_TAGS]
+    for _, element in etree.iterparse(_open_xml(stream), events=('end',), tag=tags,
+                                      resolve_entities=False, no_network=True):
+        loc = lastmod = None
+        for child in element:
+            if not isinstance(child.tag, str):
+                continue
+            name = etree.QName(child).localname
+            if name == 'loc':
+                loc = (child.text or '').strip()
+            elif name == 'lastmod':
+                lastmod = (child.text or '').strip() or None
+        if loc:
+            yield etree.QName(element).localname, SitemapEntry(loc, lastmod)
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+def iter_sitemap(url: Union[str, Sequence[str]],
+                 open_stream: Callable[[str], Optional[BinaryIO]],
+                 url_filter: Optional[str] = None,
+                 sitemap_pattern=PRODUCT_SITEMAP_PATTERN) -> Iterator[SitemapEntry]:
+    """
+    Entrega las URLs de producto de un sitemap, siguiendo los índices
+
+    Args:
+        url: URL del sitemap, o varias alternativas (se usa la primera que responda)
+        open_stream: Función que abre una URL para leerla por partes (None si falla)
+        url_filter: Si se indica, solo las URLs que contengan este texto
+            (ej: '/alimentos/' cuando los enlaces llevan la categoría)
+        sitemap_pattern: Qué sitemaps hijos de un índice se leen (por
+            defecto, solo los de productos)
+
+    Uso básico:
+        for entrada in iter_sitemap(default_sitemap_urls(url), scraper.open_stream):
+            print(entrada.loc, entrada.lastmod)
+
+    Chain of Thought: Los hijos de un índice se leen DESPUÉS de terminar el
+    índice: así nunca hay dos descargas abiertas a la vez, y un índice roto
+    a medias sigue aprovechando los hijos que sí se leyeron.
+    """
+    candidates = [url] if isinstance(url, str) else list(url)
+    stream = None
+    while candidates and stream is None:
+        url = candidates.pop(0)
+        stream = open_stream(url)
+    if stream is None:
+        logger.error("✗ No se encontró ningún sitemap")
+        return
+
+    pending = deque([(url, stream, 0)])
+    seen = {url}
+    while pending:
+        sitemap_url, stream, depth = pending.popleft()
+        if stream is None:
+            stream = open_stream(sitemap_url)
+            if stream is None:
+                logger.warning("⚠ No se pudo leer el sitemap %s", sitemap_url)
+                continue
+        logger.info("🗺 Leyendo sitemap: %s", sitemap_url)
+        children = []
+        try:
+            for kind, entry in parse_sitemap(stream):
+                if kind == 'sitemap':
+                    if (depth < SITEMAP_MAX_DEPTH and entry.loc not in seen
+                            and sitemap_pattern.search(urlparse(entry.loc).path)):
+                        seen.add(entry.loc)
+                        children.append(entry.loc)
+                elif url_filter is None or url_filter in entry.loc:
+                    yield entry
+        except (etree.XMLSyntaxError, OSError, EOFError) as e:
+            logger.error("✗ Sitemap ilegible %s: %s", sitemap_url, e)
+        finally:
+            stream.close()
+        pending.extend((child, None, depth + 1) for child in children)
+
+
+# ============================================================================
+# ÍNDICE DE <lastmod>
+# ============================================================================
+# Chain of Thought: Igual que changes.ProductStateStore, SQLite con la URL
+# como clave primaria: comprobar si una URL cambió es una búsqueda en el
+# índice, sin cargar el sitemap anterior en memoria.
+
+class SitemapIndex:
+    """
+    Último <lastmod> visto de cada URL del sitemap
+
+    Uso básico:
+        index = SitemapIndex("sitemap.sqlite")
+        for entrada in index.changed(iter_sitemap(url, scraper.open_stream)):
+            ...  # visitar la ficha
+            index.mark(entrada)
+        index.close()
+
+    Nota para junior: mark() se llama DESPUÉS de procesar la URL: si el
+    scraping se corta o la ficha falla, la URL vuelve a salir como cambiada
+    en la próxima ejecución.
+    """
+
+    def __init__(self, path: str = SITEMAP_DB_PATH):
+        """
+        Args:
+            path: Archivo SQLite donde se guarda el índice
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                loc TEXT PRIMARY KEY,
+                lastmod TEXT,
+                visto_en TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._pending = 0
+        self.skipped = 0
+
+    def is_changed(self, entry: SitemapEntry) -> bool:
+        """
+        True si la URL es nueva o su <lastmod> se movió desde la última vez
+
+        Chain of Thought: Sin <lastmod> no hay forma de saber si cambió, así
+        que se visita siempre (mejor de más que perder un cambio de precio).
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT lastmod FROM urls WHERE loc = ?",
+                                     (entry.loc,)).fetchone()
+        return row is None or entry.lastmod is None or row[0] != entry.lastmod
+
+    def changed(self, entries: Iterable[SitemapEntry]) -> Iterator[SitemapEntry]:
+        """Deja pasar solo las entradas nuevas o modificadas (cuenta las demás en 'skipped')"""
+        for entry in entries:
+            if self.is_changed(entry):
+                yield entry
+            else:
+                self.skipped += 1
+
+    def mark(self, entry: SitemapEntry) -> None:
+        """Guarda el <lastmod> de una URL ya procesada"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO urls (loc, lastmod, visto_en) VALUES (?, ?, ?)",
+                (entry.loc, entry.lastmod, datetime.now().isoformat(timespec='seconds')))
+            self._pending += 1
+            if self._pending >= SITEMAP_COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+
+    def flush(self) -> None:
+        """Confirma en disco las URLs marcadas"""
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self) -> 'SitemapIndex':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
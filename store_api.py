@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lectura de productos por la Store API de WooCommerce
+
+DoctorPet.co usa WooCommerce, que además de las páginas HTML publica los
+productos en JSON en /wp-json/wc/store/v1/products. Cada petición trae
+hasta 100 productos ya separados en campos, así que:
+- Se hacen muchas menos peticiones (100 productos por página en lugar de ~16)
+- No hay que parsear HTML: leer el JSON es mucho más barato
+
+Este módulo construye las URLs de la API y convierte sus productos al
+mismo formato que extrae el scraper del HTML. La descarga la hace
+DoctorPetScraper (source='api'), que vuelve al HTML si la API no responde.
+
+PATRONES APLICADOS:
+- Chain of Thought Pattern: Comentarios explicando el porqué de cada decisión.
+- Persona Pattern: Documentación orientada a desarrolladores junior.
+"""
+
+# ============================================================================
+# IMPORTACIONES
+# ============================================================================
+
+import html
+import json
+from typing import Dict, List, Optional
+from urllib.parse import urlencode, urlparse
+
+
+# ============================================================================
+# CONSTANTES DE CONFIGURACIÓN
+# ============================================================================
+
+# Rutas de la API de productos, en orden de preferencia
+# Chain of Thought: Las versiones actuales de WooCommerce usan /v1/; las
+# antiguas solo tienen la ruta sin versión
+STORE_API_PATHS = ('/wp-json/wc/store/v1/products', '/wp-json/wc/store/products')
+
+# Productos por página (100 es el máximo que acepta la Store API)
+STORE_API_PER_PAGE = 100
+
+# Textos de disponibilidad (los mismos que pone el scraper HTML)
+IN_STOCK = 'Disponible'
+OUT_OF_STOCK = 'Agotado'
+
+MISSING = 'N/A'
+
+
+class StoreAPIError(Exception):
+    """La respuesta de la API no es una lista de productos en JSON"""
+
+
+# ============================================================================
+# URLS Y CONVERSIÓN DE PRODUCTOS
+# ============================================================================
+
+def store_api_url(category_url: str, page: int = 1, per_page: int = STORE_API_PER_PAGE,
+                  path: str = STORE_API_PATHS[0]) -> str:
+    """
+    URL de una página de productos de la API para una categoría
+
+    Ejemplo:
+        store_api_url("https://doctorpet.co/producto-category/alimentos/", page=2)
+        -> "https://doctorpet.co/wp-json/wc/store/v1/products?category=alimentos&per_page=100&page=2"
+
+    Chain of Thought: La API acepta el 'slug' de la categoría (la última
+    parte de su URL), así no hace falta buscar antes su id numérico.
+    """
+    parsed = urlparse(category_url)
+    slug = parsed.path.rstrip('/').rsplit('/', 1)[-1]
+    query = {'per_page': per_page, 'page': page}
+    if slug:
+        query = {'category': slug, **query}
+    return f"{parsed.scheme}://{parsed.netloc}{path}?{urlencode(query)}"
+
+
+def format_api_price(raw: Optional[str], prices: Dict) -> str:
+    """
+    Convierte un precio de la API al texto que se ve en la web
+
+    Args:
+        raw: Precio en la unidad mínima de la moneda (ej: "4500000" con 2 decimales)
+        prices: Objeto 'prices' del producto (decimales, separadores, símbolo)
+
+    Ejemplo: "4500000" con minor_unit=2, separador '.' y sufijo ' $' -> "45.000 $"
+
+    Nota para junior: La API manda los precios como enteros en la unidad
+    mínima (como los céntimos) para evitar errores de redondeo de los
+    decimales; aquí los volvemos a poner en el formato de la tienda.
+    """
+    if raw in (None, ''):
+        return MISSING
+    minor_unit = int(prices.get('currency_minor_unit') or 0)
+    value = int(raw)
+    units, cents = divmod(abs(value), 10 ** minor_unit) if minor_unit else (abs(value), 0)
+    number = f"{units:,}".replace(',', prices.get('currency_thousand_separator', '.'))
+    if cents:
+        number += prices.get('currency_decimal_separator', ',') + f"{cents:0{minor_unit}d}"
+    if value < 0:
+        number = '-' + number
+    prefix = prices.get('currency_prefix') or ''
+    suffix = prices.get('currency_suffix') or ''
+    if not prefix and not suffix:
+        suffix = ' ' + (prices.get('currency_symbol') or '$')
+    return f"{prefix}{number}{suffix}".strip()
+
+
+def api_item_to_product(item: Dict) -> Dict[str, str]:
+    """
+    Convierte un producto de la API a los campos de CSV_FIELDNAMES
+
+    Chain of Thought: Tiene que dar los MISMOS campos que la extracción del
+    HTML, así el resto del programa (CSV, cambios, histórico...) no nota de
+    dónde vienen los productos.
+    """
+    prices = item.get('prices') or {}
+    on_sale = item.get('on_sale') and prices.get('regular_price') != prices.get('price')
+    images = item.get('images') or []
+    return {
+        # Chain of Thought: Los nombres vienen con entidades HTML (&amp;, &#8211;...)
+        'nombre': html.unescape(item.get('name') or '') or MISSING,
+        'precio': format_api_price(prices.get('price'), prices),
+        'precio_anterior': format_api_price(prices.get('regular_price'), prices) if on_sale else MISSING,
+        'disponibilidad': IN_STOCK if item.get('is_in_stock', True) else OUT_OF_STOCK,
+        'enlace': item.get('permalink') or MISSING,
+        'imagen': (images[0].get('src') if images else None) or MISSING,
+    }
+
+
+def parse_api_page(body: str) -> List[Dict[str, str]]:
+    """
+    Lee una página de la API y devuelve sus productos convertidos
+
+    Raises:
+        StoreAPIError: Si la respuesta no es una lista JSON (ej: la web
+            devolvió una página HTML porque la API está desactivada)
+    """
+    try:
+        items = json.loads(body)
+    except ValueError as e:
+        raise StoreAPIError(f"La respuesta no es JSON: {e}") from e
+    if not isinstance(items, list):
+        raise StoreAPIError("La respuesta no es una lista de productos")
+    return [api_item_to_product(item) for item in items if isinstance(item, dict)]
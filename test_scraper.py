@@ -13,7 +13,40 @@ Orientado a: Desarrollador Junior
 """
 
 from bs4 import BeautifulSoup
-from scraper import DoctorPetScraper
+from scraper import DoctorPetScraper, AsyncDoctorPetScraper, RateLimiter, RetryPolicy, ConcurrencyController, CSV_FIELDNAMES, parse_retry_after, CSVProductSink, BatchCrawler, CrawlCheckpoint, Product, MISSING, ParserPool, PARSER_ENGINES, DISCOVERY_MODES, parse_args, _decode_html, PAGE_WORKERS, PREDICTED_PAGES_PER_WORKER, scraper_options_from_args, close_scraper_options
+from benchmark import (benchmark_product_memory, make_category_pages, FixtureServer, run_scenario,
+                       compare_with_baseline, PAGINATION_STYLES)
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from cache import HTTPCache, ParsedPageCache, HTTP_CACHE_PATH, PAGE_CACHE_PATH
+from sinks import read_parquet
+from changes import ProductStateStore, ADDED, CHANGED, REMOVED
+from history import PriceHistory, HISTORY_DB_PATH
+from archive import PageArchive
+from metrics import Metrics, STAGES
+from details import DetailEnricher, DETAIL_FIELDNAMES, extract_product_details
+from store_api import api_item_to_product, format_api_price, store_api_url
+from sitemaps import SitemapIndex, iter_sitemap
+import jobqueue
+from jobqueue import JobQueue, LeaseKeeper, SharedRateLimiter, run_worker, DEAD, PENDING, main as jobqueue_main
+from datetime import datetime
+from concurrent.futures import Future
+from urllib.parse import urlparse
+from prices import parse_price_array, add_normalized_prices, iter_normalized
+import math
+import re
+import requests
+import pickle
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import os
 
 # HTML de ejemplo simulando la estructura de DoctorPet/WooCommerce
@@ -61,6 +94,107 @@ SAMPLE_HTML = """
 </html>
 """
 
+# Páginas de ejemplo con paginación, para probar el recorrido completo
+# Chain of Thought: La página 1 enlaza a la 2 con <a class="next">, igual que WooCommerce
+PAGINATED_HTML = {
+    '/categoria/': SAMPLE_HTML.replace(
+        '</ul>',
+        '</ul><nav class="woocommerce-pagination"><span class="current">1</span>'
+        '<a class="next" href="/categoria/page/2/">Siguiente</a></nav>'
+    ),
+    '/categoria/page/2/': SAMPLE_HTML,
+}
+
+
+def make_paginated_pages(page_count, shown_pages=None, url_pattern='/tienda/page/{}/'):
+    """
+    Genera páginas de categoría con la paginación numérica de WooCommerce
+    
+    Args:
+        page_count: Número de páginas
+        shown_pages: Última página que aparece en la paginación (por defecto todas)
+        url_pattern: Patrón de las URLs de las páginas 2..N
+        
+    Returns:
+        Diccionario {ruta: html}
+    """
+    shown_pages = shown_pages or page_count
+    paths = ['/tienda/'] + [url_pattern.format(n) for n in range(2, page_count + 1)]
+    pages = {}
+    for number, path in enumerate(paths, start=1):
+        links = ''.join(
+            f'<span class="page-numbers current">{n}</span>' if n == number
+            else f'<a class="page-numbers" href="{paths[n - 1]}">{n}</a>'
+            for n in range(1, min(shown_pages, page_count) + 1)
+        )
+        if number < page_count:
+            links += f'<a class="next page-numbers" href="{paths[number]}">→</a>'
+        products = ''.join(
+            f'<li class="product"><a href="/producto/{number}-{i}/"><h2>Producto {number}-{i}</h2></a></li>'
+            for i in range(3)
+        )
+        pages[path] = (f'<html><body><ul class="products">{products}</ul>'
+                       f'<nav class="woocommerce-pagination">{links}</nav></body></html>')
+    return pages
+
+
+def start_test_server(pages):
+    """
+    Levanta un servidor HTTP local que sirve las páginas indicadas
+    
+    Args:
+        pages: Diccionario {ruta: html o bytes}. Si el valor es una lista, cada
+            petición consume su primer elemento: un html o un error
+            (código, headers), para simular fallos temporales.
+        
+    Returns:
+        (servidor, url_base). Llama a servidor.shutdown() al terminar.
+        En servidor.request_log quedan las peticiones recibidas.
+        
+    Nota para junior: Así probamos el scraper "de verdad" (con peticiones HTTP)
+    sin depender de que doctorpet.co esté accesible.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            server.request_log.append((self.path, dict(self.headers)))
+            html = pages.get(self.path)
+            if isinstance(html, list):
+                html = html.pop(0) if len(html) > 1 else html[0]
+            if isinstance(html, tuple):
+                status, headers = html
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if html is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = html if isinstance(html, bytes) else html.encode('utf-8')
+            # Chain of Thought: Enviamos un ETag para poder probar la caché HTTP
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=UTF-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass  # Silenciar el log del servidor
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.request_log = []  # (ruta, headers) de cada petición recibida
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
 def test_product_extraction():
     """
     Prueba la extracción de información de productos
@@ -142,6 +276,1401 @@ def test_csv_generation(products):
         return False
 
 
+def test_lxml_engine():
+    """
+    Prueba que el motor 'lxml' produce exactamente los mismos datos que 'bs4'
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Motor de Extracción lxml")
+    print("=" * 70)
+    
+    bs4_scraper = DoctorPetScraper(engine='bs4')
+    lxml_scraper = DoctorPetScraper(engine='lxml')
+    
+    # HTML con casos raros: comentarios, scripts, clases múltiples, href vacío...
+    tricky_html = """
+    <ul>
+        <li class="product featured">
+            <a href="/producto/relativo/"><img src="" data-src="lazy.jpg"/>
+            <h3> Snack <b>Premium</b> </h3>
+            <span class="price">Desde <del>10</del> <ins>8 $</ins></span></a>
+            <!-- Agotado --><script>var agotado = false;</script>
+        </li>
+        <li class="product"><span class="stock"> Últimas <b>unidades</b></span></li>
+        <li class="product"><div>Sin datos</div></li>
+        <li class="product"><a href="">x</a><p>OUT OF STOCK</p></li>
+    </ul>
+    <nav class="woocommerce-pagination">
+        <span class="current">1</span><a href="/page/2/">2</a>
+    </nav>
+    """
+    
+    for html in [SAMPLE_HTML, tricky_html, *PAGINATED_HTML.values()]:
+        expected = bs4_scraper._parse_listing_page(html, 'https://doctorpet.co/categoria/')
+        result = lxml_scraper._parse_listing_page(html, 'https://doctorpet.co/categoria/')
+        assert result == expected
+        assert all(type(value) is str for product in result.products for value in product.values())
+    
+    print("✓ Mismos productos y misma paginación con ambos motores")
+
+
+def test_product_record():
+    """
+    Prueba que Product se usa igual que un diccionario pero ocupa menos memoria
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Registro Compacto de Producto")
+    print("=" * 70)
+    
+    data = {'nombre': 'Snack', 'precio': '8.000 $', 'disponibilidad': 'Disponible',
+            'enlace': 'https://doctorpet.co/producto/snack/', 'imagen': 'snack.jpg'}
+    product = Product(**data)
+    
+    # Se lee como un diccionario
+    assert product['nombre'] == 'Snack' and product.get('marca') is None
+    assert product['precio_anterior'] is MISSING
+    assert product == {**data, 'precio_anterior': 'N/A'} and dict(product) == {**product}
+    assert list(product) == list(Product.FIELDS)
+    
+    # No se puede modificar: los cambios crean un registro nuevo
+    try:
+        product.precio = '1 $'
+        assert False, "Product debería ser inmutable"
+    except AttributeError:
+        pass
+    cheaper = product.replace(precio='7.000 $')
+    assert cheaper['precio'] == '7.000 $' and product['precio'] == '8.000 $'
+    
+    # Los campos adicionales van al final, y sobreviven a pickle (procesos, caché)
+    extended = Product(marca='Chunky', **data)
+    assert list(extended)[-1] == 'marca' and extended['marca'] == 'Chunky'
+    assert pickle.loads(pickle.dumps(extended)) == extended
+    assert Product.from_dict(dict(extended), intern_all=True) == extended
+    
+    # Los extractores devuelven Product
+    scraper = DoctorPetScraper()
+    page = scraper._parse_listing_page(SAMPLE_HTML, 'https://doctorpet.co/categoria/')
+    assert page.products and all(type(p) is Product for p in page.products)
+    
+    memory = benchmark_product_memory(products=200, days=3)
+    assert memory['Product'] < memory['dict']
+    assert memory['Product (intern_all)'] < memory['Product']
+    
+    print(f"✓ Compatible con dict, inmutable y {1 - memory['Product'] / memory['dict']:.0%} más ligero")
+
+
+def test_partial_parse():
+    """
+    Prueba que el parseo parcial (SoupStrainer) da los mismos resultados
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Parseo Parcial con SoupStrainer")
+    print("=" * 70)
+    
+    full_scraper = DoctorPetScraper()
+    partial_scraper = DoctorPetScraper(partial_parse=True)
+    
+    # Añadimos un menú y un footer que el parseo parcial debe ignorar
+    menu = '<nav class="menu"><ul><li class="menu-item"><a href="/x">Menú</a></li></ul></nav>'
+    for html in PAGINATED_HTML.values():
+        html = html.replace('<body>', '<body>' + menu).replace('</body>', '<footer>Pie</footer></body>')
+        expected = full_scraper._parse_listing_page(html, 'https://doctorpet.co/categoria/')
+        result = partial_scraper._parse_listing_page(html, 'https://doctorpet.co/categoria/')
+        assert result == expected
+    
+    print("✓ Mismos productos y misma paginación con parseo parcial")
+
+
+def test_retry_policy():
+    """
+    Prueba la política de reintentos: backoff, Retry-After, circuit breaker y deadline
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Política de Reintentos")
+    print("=" * 70)
+    
+    # Backoff exponencial con jitter (siempre entre 0 y base * 2^intento)
+    policy = RetryPolicy(base_delay=1, max_delay=3, max_retry_after=10, seed=1)
+    for attempt in range(5):
+        waits = [policy.backoff(attempt) for _ in range(50)]
+        assert all(0 <= w <= min(3, 2 ** attempt) for w in waits) and len(set(waits)) > 1
+    assert policy.backoff(0, retry_after=5) >= 5
+    assert policy.backoff(0, retry_after=60) is None
+    assert parse_retry_after("120") == 120
+    assert 50 < parse_retry_after("Wed, 21 Oct 2099 07:28:00 GMT") and parse_retry_after("pronto") is None
+    print("✓ Backoff con jitter y Retry-After")
+    
+    # Circuit breaker: se pausa el servidor tras 2 fallos seguidos
+    policy = RetryPolicy(failure_threshold=2, cooldown=10)
+    assert not policy.record_failure('a.com') and policy.host_wait('a.com') == 0
+    assert policy.record_failure('a.com') and 9 < policy.host_wait('a.com') <= 10
+    assert policy.host_wait('b.com') == 0
+    policy.record_success('a.com')
+    assert policy.host_wait('a.com') == 0
+    assert policy.record_failure('b.com', retry_after=5) and 4 < policy.host_wait('b.com') <= 5
+    print("✓ Circuit breaker por servidor")
+    
+    # Contra un servidor: 429 con Retry-After, luego éxito; 404 sin reintentos
+    pages = {'/tienda/': [(429, {'Retry-After': '1'}), SAMPLE_HTML], '/roto/': [(500, {})]}
+    server, base = start_test_server(pages)
+    try:
+        scraper = DoctorPetScraper(base + '/tienda/', rate_limiter=RateLimiter(rate=100, burst=5),
+                                   retry_policy=RetryPolicy(base_delay=0.01))
+        start = time.perf_counter()
+        assert len(scraper.scrape_category()) == 3
+        assert time.perf_counter() - start >= 1 and len(server.request_log) == 2
+        
+        server.request_log.clear()
+        assert scraper._make_request(base + '/no-existe/') is None
+        assert len(server.request_log) == 1
+        
+        # retries=0 es cero intentos, no "los de la política"
+        assert scraper._make_request(base + '/tienda/', retries=0) is None
+        assert len(server.request_log) == 1
+        
+        # Modo asíncrono: misma política
+        pages['/tienda/'] = [(503, {'Retry-After': '0'}), SAMPLE_HTML]
+        async_scraper = AsyncDoctorPetScraper(base + '/tienda/', retry_policy=RetryPolicy(base_delay=0.01),
+                                              rate_limiter=RateLimiter(rate=100, burst=5))
+        assert len(asyncio.run(async_scraper.scrape_category_async())) == 3
+        
+        # Fallos seguidos: el servidor queda pausado para el siguiente intento
+        scraper.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.01,
+                                           failure_threshold=2, cooldown=0.2)
+        server.request_log.clear()
+        assert scraper._make_request(base + '/roto/') is None
+        assert len(server.request_log) == 2 and scraper.retry_policy.host_wait(urlparse(base).netloc) > 0
+        
+        # Deadline agotado: no se hace ninguna petición más
+        scraper.retry_policy = RetryPolicy(deadline=0.01)
+        scraper.retry_policy.start()
+        time.sleep(0.02)
+        server.request_log.clear()
+        assert scraper.retry_policy.expired() and scraper.scrape_category() == []
+        assert server.request_log == []
+    finally:
+        server.shutdown()
+    print("✓ Retry-After, errores sin reintento, pausa del servidor y deadline")
+
+
+def test_concurrency_controller():
+    """
+    Prueba el control adaptativo (AIMD): subida, bajadas, techo y uso desde el scraper
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Control Adaptativo de Concurrencia")
+    print("=" * 70)
+    
+    def run_window(controller, latency, errors=0):
+        """Lanza 'window' peticiones llenando el límite, con la latencia indicada"""
+        changes = []
+        for done in range(0, controller.window, controller.limit):
+            tickets = [controller.acquire() for _ in range(min(controller.limit, controller.window - done))]
+            changes += [controller.release(ticket, latency, error=index < errors)
+                        for index, ticket in enumerate(tickets)]
+        return [change for change in changes if change]
+    
+    # Sube de uno en uno mientras va rápido, sin pasar del techo
+    assert ConcurrencyController().limit == PAGE_WORKERS  # empieza como sin controlador
+    controller = ConcurrencyController(max_limit=3, initial_limit=1, window=4, latency_target=0.5)
+    assert controller.limit == 1
+    assert run_window(controller, 0.1) == ['increase'] and controller.limit == 2
+    assert run_window(controller, 0.1) == ['increase'] and controller.limit == 3
+    assert run_window(controller, 0.1) == [] and controller.limit == 3
+    print("✓ Subida aditiva hasta el techo")
+    
+    # Sin usar el límite entero no se sube (no sabemos si aguantaría más)
+    for _ in range(4):
+        controller.release(controller.acquire(), 0.1)
+    assert controller.limit == 3
+    
+    # Saturación (429/5xx/timeout): se divide entre dos UNA vez por episodio
+    tickets = [controller.acquire() for _ in range(3)]
+    changes = [controller.release(ticket, 0.1, overload=True) for ticket in tickets]
+    assert changes == ['decrease', None, None] and controller.limit == 1
+    
+    # Latencia o errores por encima del umbral también bajan el límite
+    controller = ConcurrencyController(max_limit=8, initial_limit=8, window=4, latency_target=0.5)
+    assert run_window(controller, 2.0) == ['decrease'] and controller.limit == 4
+    assert run_window(controller, 0.1, errors=2) == ['decrease'] and controller.limit == 2
+    
+    # Las muestras lentas de peticiones anteriores a una bajada no provocan otra
+    controller = ConcurrencyController(max_limit=8, initial_limit=8, window=4, latency_target=0.5)
+    tickets = [controller.acquire() for _ in range(8)]
+    assert controller.release(tickets[0], 0.1, overload=True) == 'decrease'
+    assert [controller.release(ticket, 2.0) for ticket in tickets[1:5]] == [None] * 4
+    for ticket in tickets[5:]:
+        controller.release(ticket, 0.1)
+    assert controller.release(controller.acquire(), 0.1) is None and controller.limit == 4
+    print("✓ Bajada multiplicativa por saturación, latencia y errores")
+    
+    # Sin hueco, acquire() espera a que otro termine
+    controller = ConcurrencyController(max_limit=1)
+    assert controller.limit == 1
+    ticket = controller.acquire()
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (controller.acquire(), acquired.set()))
+    waiter.start()
+    assert not acquired.wait(0.1)
+    controller.release(ticket, 0.1)
+    assert acquired.wait(1) and controller.in_flight == 1
+    waiter.join()
+    
+    # Desde el scraper: el modo 'predict' va subiendo el límite; los 503 lo bajan
+    pages = make_category_pages(pages=12, products_per_page=2)
+    pages['/roto/'] = [(503, {})]
+    server, base = start_test_server(pages)
+    try:
+        controller = ConcurrencyController(max_limit=4, initial_limit=1, window=2)
+        scraper = DoctorPetScraper(base + '/tienda/', concurrency=controller,
+                                   rate_limiter=RateLimiter(rate=1000, burst=10),
+                                   retry_policy=RetryPolicy(max_attempts=2, base_delay=0.01))
+        assert len(scraper.scrape_category(discovery='predict')) == 24
+        reached = controller.limit
+        assert reached > 1 and controller.in_flight == 0
+        assert scraper._make_request(base + '/roto/') is None
+        assert controller.limit < reached and controller.in_flight == 0
+        
+        # Modo asíncrono: mismo controlador
+        async_scraper = AsyncDoctorPetScraper(base + '/tienda/', concurrency=controller,
+                                              rate_limiter=RateLimiter(rate=1000, burst=10))
+        assert len(asyncio.run(async_scraper.scrape_category_async(discovery='predict'))) == 24
+        assert controller.in_flight == 0
+        
+        # Sin rate_limiter propio, el techo del controlador sustituye al límite fijo:
+        # subir las peticiones simultáneas sí acelera el scraping
+        slow_pages = {path: html for path, html in pages.items() if path != '/roto/'}
+        with FixtureServer(slow_pages, latency=0.05) as slow:
+            timings = {}
+            for name, options in (('fijo', {'rate_limiter': RateLimiter(rate=20, burst=1)}),
+                                  ('adaptativo', {'concurrency': ConcurrencyController(
+                                      max_limit=8, window=4, max_rate=1000)})):
+                fast = DoctorPetScraper(slow.url + '/tienda/', **options)
+                start = time.perf_counter()
+                assert len(fast.scrape_category(discovery='predict')) == 24
+                timings[name] = time.perf_counter() - start
+            assert fast.rate_limiter is fast.concurrency.rate_limiter
+            assert timings['adaptativo'] < timings['fijo']
+    finally:
+        server.shutdown()
+    print(f"✓ Scraper: límite {reached} con la web sana, {controller.limit} tras los 503")
+    print(f"✓ 12 páginas: {timings['fijo']:.2f}s con límite fijo, "
+          f"{timings['adaptativo']:.2f}s adaptativo")
+
+
+def make_detail_page(slug, index):
+    """
+    Genera la ficha de un producto: con JSON-LD (índices pares) o solo con HTML (impares)
+    """
+    if index % 2 == 0:
+        json_ld = json.dumps({"@context": "https://schema.org/", "@graph": [
+            {"@type": "BreadcrumbList", "itemListElement": []},
+            {"@type": "Product", "name": slug, "sku": f"DP-{index}",
+             "brand": {"@type": "Brand", "name": "Chunky"},
+             "weight": {"@type": "QuantitativeValue", "value": 2, "unitText": "kg"},
+             "description": f"<p>Ficha de <b>{slug}</b></p>",
+             "offers": [{"@type": "Offer", "price": "1000",
+                         "inventoryLevel": {"@type": "QuantitativeValue", "value": 7 + index}}]},
+        ]})
+        return (f'<html><head><script type="application/ld+json">{json_ld}</script></head>'
+                f'<body><h1>{slug}</h1></body></html>')
+    return (f'<html><body><h1>{slug}</h1>'
+            f'<div class="woocommerce-product-details__short-description"><p>Ficha de\n {slug}</p></div>'
+            f'<p class="stock in-stock">{7 + index} disponibles</p>'
+            f'<div class="product_meta"><span class="sku_wrapper">SKU: <span class="sku">DP-{index}</span></span></div>'
+            f'<table><tr class="woocommerce-product-attributes-item woocommerce-product-attributes-item--attribute_pa_marca">'
+            f'<th>Marca</th><td><p>Chunky</p></td></tr>'
+            f'<tr class="woocommerce-product-attributes-item woocommerce-product-attributes-item--weight">'
+            f'<th>Peso</th><td>2 kg</td></tr></table></body></html>')
+
+
+def test_product_details():
+    """
+    Prueba la visita a las fichas: JSON-LD, HTML, URLs repetidas y CSV con detalles
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Datos de la Ficha de Producto")
+    print("=" * 70)
+    
+    pages = make_category_pages(pages=2, products_per_page=3, sale_ratio=0.5,
+                                out_of_stock_ratio=0.3, pagination='pretty')
+    paths = sorted({path for html in pages.values()
+                    for path in re.findall(r'href="(/producto/[^"]+)"', html)})
+    pages.update({path: make_detail_page(path.strip('/').split('/')[-1], index)
+                  for index, path in enumerate(paths)})
+    
+    # Extracción: el mismo resultado con JSON-LD que con el HTML visible
+    for index in (0, 1):
+        details = extract_product_details(make_detail_page('snack', index))
+        assert details == {'sku': f'DP-{index}', 'marca': 'Chunky', 'peso': '2 kg', 'tamano': 'N/A',
+                           'descripcion': 'Ficha de snack', 'stock': str(7 + index)}
+    assert set(extract_product_details('')) == set(DETAIL_FIELDNAMES)
+    print("✓ Detalles extraídos del JSON-LD y del HTML")
+    
+    server, base = start_test_server(pages)
+    try:
+        with DetailEnricher(workers=3) as enricher, tempfile.TemporaryDirectory() as tmp:
+            scraper = DoctorPetScraper(base + '/tienda/', engine='lxml',
+                                       rate_limiter=RateLimiter(rate=1000, burst=10))
+            filename = scraper.save_products(
+                scraper.iter_products(details=enricher), os.path.join(tmp, 'productos.csv'),
+                fieldnames=CSV_FIELDNAMES + DETAIL_FIELDNAMES)
+            with open(filename, encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+            assert len(rows) == 6 and all(row['sku'].startswith('DP-') for row in rows)
+            assert all(row['marca'] == 'Chunky' and row['stock'] != 'N/A' for row in rows)
+            
+            # URLs repetidas: cada ficha se descarga una sola vez
+            products = scraper.scrape_category()
+            server.request_log.clear()
+            enriched = list(enricher.enrich(products + products[:2], scraper.fetch_html))
+            assert [p['nombre'] for p in enriched] == [p['nombre'] for p in products + products[:2]]
+            assert server.request_log == [] and len(enricher) == 6
+            fresh = DetailEnricher(workers=2)
+            list(fresh.enrich(products + products, scraper.fetch_html))
+            fresh.close()
+            assert len(server.request_log) == 6
+            
+            # La caché de fichas no crece con el catálogo: recuerda solo las últimas
+            with DetailEnricher(workers=1, cache_size=2) as small:
+                list(small.enrich(products, scraper.fetch_html))
+                assert len(small) < len(products)
+                list(small.enrich(products[-1:], scraper.fetch_html))
+            assert len(server.request_log) == 12
+        
+        # Con la caché llena, olvidar una ficha no recorre toda la caché
+        checks = []
+        done = Future.done
+        Future.done = lambda future: checks.append(1) or done(future)
+        try:
+            with DetailEnricher(workers=1, cache_size=100) as bounded:
+                for index in range(1000):
+                    bounded.details(f'{base}/ficha/{index}', lambda url: '').result()
+                assert len(bounded) == 100
+        finally:
+            Future.done = done
+        assert len(checks) < 2 * 1000
+    finally:
+        server.shutdown()
+    print("✓ Fichas descargadas en paralelo, una vez por URL, y guardadas en el CSV")
+
+
+def make_store_api_pages(category_url, count, per_page=100):
+    """
+    Genera las respuestas JSON de la Store API para 'count' productos
+
+    Returns:
+        {ruta_con_query: json} listo para start_test_server
+    """
+    prices = {'currency_minor_unit': 2, 'currency_symbol': '$', 'currency_prefix': '',
+              'currency_suffix': ' $', 'currency_thousand_separator': '.',
+              'currency_decimal_separator': ','}
+    items = [{
+        'id': i, 'name': f'Producto API {i} &amp; más', 'permalink': f'https://doctorpet.co/producto/api-{i}/',
+        'on_sale': i % 3 == 0, 'is_in_stock': i % 4 != 0,
+        'prices': {**prices, 'price': str(1_000_000 + i * 100), 'regular_price': str(
+            1_000_000 + i * 100 + (500_000 if i % 3 == 0 else 0))},
+        'images': [{'src': f'https://doctorpet.co/img/{i}.jpg'}] if i % 5 else [],
+    } for i in range(count)]
+    pages = {}
+    for page in range(1, max(1, -(-count // per_page)) + 1):
+        url = urlparse(store_api_url(category_url, page))
+        pages[f"{url.path}?{url.query}"] = json.dumps(items[(page - 1) * per_page:page * per_page])
+    return pages
+
+
+def test_store_api():
+    """
+    Prueba la lectura por la Store API: conversión, paginación, reanudación y vuelta al HTML
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Store API de WooCommerce")
+    print("=" * 70)
+    
+    prices = {'currency_minor_unit': 2, 'currency_thousand_separator': '.',
+              'currency_decimal_separator': ',', 'currency_prefix': '', 'currency_suffix': ' $'}
+    assert format_api_price('4500000', prices) == '45.000 $'
+    assert format_api_price('1250050', prices) == '12.500,50 $'
+    assert format_api_price('9900', {'currency_minor_unit': 0, 'currency_prefix': '$ '}) == '$ 9.900'
+    assert api_item_to_product({'name': 'X', 'prices': {}, 'is_in_stock': False}) == {
+        'nombre': 'X', 'precio': 'N/A', 'precio_anterior': 'N/A', 'disponibilidad': 'Agotado',
+        'enlace': 'N/A', 'imagen': 'N/A'}
+    print("✓ Conversión de productos y precios de la API")
+    
+    api_pages = make_store_api_pages('http://x/tienda/', 150)
+    server, base = start_test_server({**api_pages, **PAGINATED_HTML})
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            scraper = DoctorPetScraper(base + '/tienda/', source='api',
+                                       rate_limiter=RateLimiter(rate=1000, burst=10))
+            products = scraper.scrape_category()
+            assert len(products) == 150 and len(server.request_log) == 2
+            assert products[0]['nombre'] == 'Producto API 0 & más'
+            assert products[0]['precio'] == '10.000 $' and products[0]['precio_anterior'] == '15.000 $'
+            assert products[1]['precio_anterior'] == 'N/A' and products[1]['imagen'].endswith('1.jpg')
+            assert products[4]['disponibilidad'] == 'Agotado' and products[5]['imagen'] == 'N/A'
+            print("✓ 150 productos en 2 peticiones")
+            
+            # Reanudar: la segunda ejecución sigue por la página 2 de la API
+            path = os.path.join(tmp, 'api.checkpoint.json')
+            first = list(scraper.iter_products(max_pages=1, checkpoint=CrawlCheckpoint(path)))
+            rest = list(scraper.iter_products(checkpoint=CrawlCheckpoint(path, resume=True)))
+            assert (len(first), len(rest)) == (100, 50) and first + rest == products
+            print("✓ Reanudación por la API")
+        
+        # Sin API (404): se usa el HTML de la categoría
+        server.request_log.clear()
+        scraper = DoctorPetScraper(base + '/categoria/', source='api',
+                                   rate_limiter=RateLimiter(rate=1000, burst=10))
+        assert len(scraper.scrape_category()) == 6
+        requested = [path for path, _ in server.request_log]
+        assert [p.split('?')[0] for p in requested[:2]] == ['/wp-json/wc/store/v1/products',
+                                                             '/wp-json/wc/store/products']
+        assert requested[2:] == ['/categoria/', '/categoria/page/2/']
+    finally:
+        server.shutdown()
+    print("✓ Vuelta al HTML cuando la API no responde")
+
+
+def make_sitemap(base, entries, index=False):
+    """
+    Genera un sitemap (o un índice de sitemaps si index=True) con [(ruta, lastmod)]
+    """
+    tag = 'sitemap' if index else 'url'
+    items = ''.join(f'<{tag}><loc>{base}{path}</loc>' + (f'<lastmod>{lastmod}</lastmod>' if lastmod else '')
+                    + f'</{tag}>' for path, lastmod in entries)
+    root = 'sitemapindex' if index else 'urlset'
+    return (f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<{root} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{items}</{root}>')
+
+
+def test_sitemap_discovery():
+    """
+    Prueba el descubrimiento por sitemap: índice, gzip, filtro, fichas y recrawl incremental
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Descubrimiento por Sitemap")
+    print("=" * 70)
+    
+    def product_page(name, price):
+        return (f'<html><head><meta property="og:image" content="/img/{name}.jpg"></head><body>'
+                f'<h1 class="product_title entry-title">{name}</h1><div class="summary">'
+                f'<p class="price"><del><span class="woocommerce-Price-amount amount"><bdi>'
+                f'{price + 5}.000&nbsp;<span>$</span></bdi></span></del> <ins><span class="'
+                f'woocommerce-Price-amount amount"><bdi>{price}.000&nbsp;<span>$</span></bdi></span>'
+                f'</ins></p><p class="stock out-of-stock">Agotado</p>'
+                f'<span class="sku">SKU-{name}</span></div></body></html>')
+    
+    food = [(f'/producto/alimentos/a{i}/', f'2024-09-0{i + 1}') for i in range(4)]
+    toys = [('/producto/juguetes/j0/', '2024-09-01'), ('/producto/alimentos/roto/', None)]
+    pages = {path: product_page(path.split('/')[-2], 10 + i) for i, (path, _) in enumerate(food + toys)}
+    pages.pop('/producto/alimentos/roto/')  # en el sitemap, pero la ficha da 404
+    server, base = start_test_server(pages)
+    pages.update({
+        '/wp-sitemap.xml': make_sitemap(base, [('/wp-sitemap-posts-product-1.xml', None),
+                                               ('/wp-sitemap-posts-product-2.xml.gz', None),
+                                               ('/wp-sitemap-taxonomies-product_cat-1.xml', None)],
+                                        index=True),
+        '/wp-sitemap-posts-product-1.xml': make_sitemap(base, food[:2] + toys),
+        '/wp-sitemap-posts-product-2.xml.gz': gzip.compress(make_sitemap(base, food[2:]).encode()),
+    })
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            scraper = DoctorPetScraper(base + '/producto-category/alimentos/',
+                                       rate_limiter=RateLimiter(rate=1000, burst=10))
+            entries = list(iter_sitemap([base + '/no-existe.xml', base + '/wp-sitemap.xml'],
+                                        scraper.open_stream))
+            assert [entry.loc for entry in entries] == [base + path for path, _ in
+                                                        food[:2] + toys + food[2:]]
+            assert entries[0].lastmod == '2024-09-01' and entries[3].lastmod is None
+            assert not any('product_cat' in path for path, _ in server.request_log)
+            print("✓ Índice, sitemap comprimido (gzip) y solo los sitemaps de productos")
+            
+            index = SitemapIndex(os.path.join(tmp, 'sitemap.sqlite'))
+            run = lambda: list(scraper.iter_sitemap_products(index=index, url_filter='/alimentos/'))
+            products = run()
+            assert [p['nombre'] for p in products] == ['a0', 'a1', 'a2', 'a3']
+            assert products[0]['precio'] == '10.000$' and products[0]['precio_anterior'] == '15.000$'
+            assert products[0]['disponibilidad'] == 'Agotado' and products[0]['sku'] == 'SKU-a0'
+            assert products[0]['enlace'] == base + food[0][0]
+            assert products[0]['imagen'] == '/img/a0.jpg'
+            assert len(index) == 4  # la ficha rota no se marca
+            print("✓ Primera ejecución: 4 fichas (filtro por categoría, la rota no cuenta)")
+            
+            # Sin cambios en el sitemap: solo se reintenta la ficha rota
+            server.request_log.clear()
+            assert run() == [] and index.skipped == 4
+            details = [path for path, _ in server.request_log if path.startswith('/producto/')]
+            assert details == ['/producto/alimentos/roto/']
+            
+            # Cambia el <lastmod> de un producto: solo se visita esa ficha
+            food[1] = (food[1][0], '2024-10-01')
+            pages['/wp-sitemap-posts-product-1.xml'] = make_sitemap(base, food[:2] + toys)
+            assert [p['nombre'] for p in run()] == ['a1']
+            index.close()
+            print("✓ Recrawl incremental: solo las fichas con <lastmod> nuevo")
+            
+            # --archive guarda también los sitemaps, así --replay --sitemap funciona sin red
+            archive_path = os.path.join(tmp, 'archivo.warc.gz')
+            with PageArchive(archive_path) as archive:
+                scraper.archive = archive
+                expected = list(scraper.iter_sitemap_products(url_filter='/alimentos/'))
+                scraper.archive = None
+            with PageArchive(archive_path) as replay:
+                server.request_log.clear()
+                offline = DoctorPetScraper(base + '/producto-category/alimentos/', replay=replay)
+                assert list(offline.iter_sitemap_products(url_filter='/alimentos/')) == expected
+                assert server.request_log == []
+            for options in (['--source', 'api'], ['--max-pages', '2']):
+                try:
+                    parse_args(['--sitemap'] + options)
+                    assert False, f"--sitemap con {options} debería rechazarse"
+                except SystemExit:
+                    pass
+            print("✓ Sitemaps archivados y releídos sin red; opciones sin efecto rechazadas")
+    finally:
+        server.shutdown()
+
+
+def test_rate_limiter():
+    """
+    Prueba que el token bucket permite la ráfaga y luego respeta la velocidad
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Limitador de Velocidad (Token Bucket)")
+    print("=" * 70)
+    
+    # Reloj falso: las esperas se calculan, no se duermen (test estable en CI cargado)
+    now = [0.0]
+    waits = []
+    def fake_sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+    limiter = RateLimiter(rate=20, burst=3, clock=lambda: now[0], sleep=fake_sleep)
+    
+    for _ in range(3):
+        limiter.acquire()
+    assert waits == []
+    print("✓ Ráfaga de 3 peticiones sin esperar")
+    
+    # 5 peticiones más a 20/s: cada una espera 0.05s
+    for _ in range(5):
+        limiter.acquire()
+    assert [round(w, 6) for w in waits] == [0.05] * 5
+    print(f"✓ 8 peticiones en total: {now[0]:.3f}s")
+    
+    # Tras una pausa larga el cubo se rellena, pero solo hasta 'burst'
+    now[0] += 10
+    for _ in range(4):
+        limiter.acquire()
+    assert len(waits) == 6 and round(waits[-1], 6) == 0.05
+    print("✓ El cubo no acumula más de 'burst' fichas")
+
+
+def test_sync_scraping():
+    """
+    Prueba el recorrido completo con paginación contra un servidor local
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Scraping con Paginación")
+    print("=" * 70)
+    
+    server, base = start_test_server(PAGINATED_HTML)
+    try:
+        scraper = DoctorPetScraper(base + '/categoria/',
+                                   rate_limiter=RateLimiter(rate=1000, burst=10))
+        products = scraper.scrape_category()
+        print(f"✓ Productos obtenidos: {len(products)}")
+        assert len(products) == 6
+        assert products[0]['nombre'] == 'Alimento Perro Adulto 15kg'
+    finally:
+        server.shutdown()
+
+
+def test_streaming_csv():
+    """
+    Prueba iter_products() + escritura incremental, incluyendo una interrupción
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Escritura Incremental de CSV")
+    print("=" * 70)
+    
+    server, base = start_test_server(PAGINATED_HTML)
+    test_filename = "test_streaming.csv"
+    try:
+        scraper = DoctorPetScraper(base + '/categoria/',
+                                   rate_limiter=RateLimiter(rate=1000, burst=10))
+        
+        # Las páginas llegan una a una, en orden
+        pages = list(scraper.iter_pages())
+        assert [len(page.products) for page in pages] == [3, 3]
+        assert pages[0].next_url == base + '/categoria/page/2/'
+        
+        filename = scraper.save_to_csv(scraper.iter_products(), test_filename, flush_every=1)
+        with open(filename, encoding='utf-8-sig') as f:
+            rows = f.read().splitlines()
+        print(f"✓ Filas escritas desde el generador: {len(rows) - 1}")
+        assert len(rows) == 7
+        
+        # Simulamos un Ctrl+C después de 4 productos
+        def interrupted_products():
+            for i, product in enumerate(scraper.iter_products()):
+                if i == 4:
+                    raise KeyboardInterrupt
+                yield product
+        
+        try:
+            scraper.save_to_csv(interrupted_products(), test_filename)
+        except KeyboardInterrupt:
+            pass
+        with open(test_filename, encoding='utf-8-sig') as f:
+            rows = f.read().splitlines()
+        print(f"✓ Filas conservadas tras la interrupción: {len(rows) - 1}")
+        assert len(rows) == 5
+        
+        # Modo append: no repite la cabecera
+        with CSVProductSink(test_filename, append=True) as sink:
+            sink.write(pages[0].products[0])
+        with open(test_filename, encoding='utf-8-sig') as f:
+            rows = f.read().splitlines()
+        assert len(rows) == 6 and rows.count(rows[0]) == 1
+        
+        # Un CSV con otras columnas no se amplía (las filas quedarían descolocadas)
+        try:
+            CSVProductSink(test_filename, fieldnames=CSV_FIELDNAMES + ['precio_num'], append=True)
+            assert False, "debería rechazar columnas distintas"
+        except ValueError:
+            pass
+        print("✓ Append rechazado si las columnas no coinciden")
+    finally:
+        server.shutdown()
+        if os.path.exists(test_filename):
+            os.remove(test_filename)
+
+
+def test_output_sinks():
+    """
+    Prueba los formatos de salida SQLite, JSONL comprimido y Parquet
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Formatos de Salida")
+    print("=" * 70)
+    
+    scraper = DoctorPetScraper()
+    products = scraper._parse_listing_page(SAMPLE_HTML, 'https://doctorpet.co/').products
+    output_dir = tempfile.mkdtemp()
+    
+    # SQLite: se añade en bloques y tiene índice por enlace
+    filename = os.path.join(output_dir, 'productos.sqlite')
+    scraper.save_products(iter(products), filename, 'sqlite', flush_every=2)
+    scraper.save_products(iter(products), filename, 'sqlite', append=True)
+    conn = sqlite3.connect(filename)
+    rows = conn.execute(f"SELECT {', '.join(products[0])} FROM productos ORDER BY id").fetchall()
+    indexes = [row[1] for row in conn.execute("PRAGMA index_list(productos)")]
+    conn.close()
+    assert [dict(zip(products[0], row)) for row in rows] == products * 2
+    assert 'idx_productos_enlace' in indexes
+    print(f"✓ SQLite: {len(rows)} filas, índice {indexes}")
+    
+    # JSONL comprimido: también admite añadir al final
+    filename = os.path.join(output_dir, 'productos.jsonl.gz')
+    scraper.save_products(iter(products), filename, 'jsonl')
+    scraper.save_products(iter(products), filename, 'jsonl', append=True)
+    with gzip.open(filename, 'rt', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == products * 2
+    print("✓ JSONL comprimido")
+    
+    # Parquet: varios archivos se leen de una vez
+    for name in ('dia1.parquet', 'dia2.parquet'):
+        scraper.save_products(iter(products), os.path.join(output_dir, name), 'parquet')
+    table = read_parquet(output_dir)
+    assert table.num_rows == 2 * len(products)
+    assert table.to_pylist()[:len(products)] == products
+    try:
+        scraper.save_products(iter(products), os.path.join(output_dir, 'dia1.parquet'),
+                              'parquet', append=True)
+        assert False, "Parquet no debería admitir append"
+    except ValueError:
+        pass
+    print(f"✓ Parquet: {table.num_rows} filas leídas de 2 archivos")
+
+
+def test_price_normalization():
+    """
+    Prueba la conversión de precios de texto a números (prices.py)
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Normalización de Precios")
+    print("=" * 70)
+    
+    # El extractor guarda el precio tachado (<del>) de las ofertas
+    scraper = DoctorPetScraper()
+    products = scraper._parse_listing_page(SAMPLE_HTML, 'https://doctorpet.co/').products
+    assert [p['precio_anterior'] for p in products] == ['N/A', '35.000\xa0$', 'N/A']
+    
+    texts = ['45.000\xa0$', '$ 1.250.000', '12.500,50 $', 'N/A', '', '35.000 $28.000 $', 'COP 9.900']
+    expected = [45000.0, 1250000.0, 12500.5, None, None, 28000.0, 9900.0]
+    result = parse_price_array(texts).tolist()
+    assert [None if math.isnan(v) else v for v in result] == expected
+    print(f"✓ Textos convertidos: {dict(zip(texts, result))}")
+    
+    # Más decimales de los habituales no rompe la conversión
+    assert abs(parse_price_array(['1,' + '5' * 30])[0] - 1.5556) < 1e-3
+    
+    normalized = add_normalized_prices(products)
+    assert normalized[1]['precio_num'] == 28000.0
+    assert normalized[1]['precio_anterior_num'] == 35000.0
+    assert normalized[1]['descuento_pct'] == 20.0
+    assert normalized[0]['descuento_pct'] is None
+    assert {p['moneda'] for p in normalized} == {'COP'}
+    
+    # Por lotes: mismo resultado y mismo orden
+    assert list(iter_normalized(iter(products * 5), batch_size=2)) == normalized * 5
+    print(f"✓ Oferta detectada: {normalized[1]['descuento_pct']}% de descuento")
+
+
+def test_change_detection():
+    """
+    Prueba que solo se entregan los productos nuevos, modificados o eliminados
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Detección de Cambios")
+    print("=" * 70)
+    
+    scraper = DoctorPetScraper()
+    products = scraper._parse_listing_page(SAMPLE_HTML, 'https://doctorpet.co/').products
+    store = ProductStateStore(os.path.join(tempfile.mkdtemp(), 'estado.sqlite'))
+    
+    # Primera vez: todo es nuevo
+    changes = list(store.diff(products, origin='alimentos'))
+    assert [c.tipo for c in changes] == [ADDED] * 3
+    assert len(store) == 3
+    
+    # Sin cambios: no se entrega nada
+    assert list(store.diff(iter(products), origin='alimentos')) == []
+    
+    # Cambia un precio, desaparece un producto y aparece otro
+    updated = [dict(products[0], precio='47.000 $', disponibilidad='Agotado'), products[1],
+               dict(products[2], enlace='https://doctorpet.co/producto/nuevo/')]
+    changes = {c.enlace: c for c in store.diff(updated, origin='alimentos')}
+    assert changes[products[0]['enlace']].tipo == CHANGED
+    assert changes[products[0]['enlace']].campos == {
+        'precio': ('45.000$', '47.000 $'), 'disponibilidad': ('Disponible', 'Agotado')}
+    assert changes['https://doctorpet.co/producto/nuevo/'].tipo == ADDED
+    assert changes[products[2]['enlace']].tipo == REMOVED
+    assert changes[products[2]['enlace']].producto['nombre'] == products[2]['nombre']
+    assert products[1]['enlace'] not in changes
+    
+    # Un scraping de otra categoría no "elimina" los productos de esta
+    assert [c.tipo for c in store.diff(products[:1], origin='juguetes')] == [CHANGED]
+    assert len(store) == 3
+    
+    log = store.change_log(enlace=products[0]['enlace'])
+    assert [entry['tipo'] for entry in log] == [ADDED, CHANGED, CHANGED]
+    store.close()
+    print(f"✓ Cambios detectados: {sorted(c.tipo for c in changes.values())}")
+
+
+def test_price_history():
+    """
+    Prueba el histórico de precios: series por producto y fotos por día
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Histórico de Precios")
+    print("=" * 70)
+    
+    scraper = DoctorPetScraper()
+    products = scraper._parse_listing_page(SAMPLE_HTML, 'https://doctorpet.co/').products
+    output_dir = tempfile.mkdtemp()
+    history = PriceHistory(os.path.join(output_dir, 'historico.sqlite'))
+    
+    assert history.record(products, datetime(2024, 9, 1, 10)) == 3
+    cheaper = [dict(p, precio='40.000 $') if p is products[0] else p for p in products]
+    assert list(history.iter_record(iter(cheaper), datetime(2024, 9, 2, 10))) == cheaper
+    assert parse_args(['--history']).history == HISTORY_DB_PATH
+    
+    # Los CSV del scraper se importan con la fecha de su nombre
+    filename = os.path.join(output_dir, 'doctorpet_alimentos_20240903_100000.csv')
+    scraper.save_to_csv(products, filename)
+    assert history.import_csv(filename) == 3
+    assert len(history) == 9
+    
+    link = products[0]['enlace']
+    series = history.series(link)
+    assert [(o.fecha[:10], o.precio) for o in series] == [
+        ('2024-09-01', 45000.0), ('2024-09-02', 40000.0), ('2024-09-03', 45000.0)]
+    assert [o.precio for o in history.series(link, since='2024-09-02', until='2024-09-03')] == [40000.0]
+    
+    offer = history.series(products[1]['enlace'])[0]
+    assert (offer.precio, offer.precio_anterior, offer.disponible) == (28000.0, 35000.0, False)
+    
+    snapshot = history.snapshot('2024-09-02')
+    assert len(snapshot) == 3
+    assert {row['enlace']: row['precio'] for row in snapshot}[link] == 40000.0
+    assert history.search('gato')[0]['enlace'] == products[1]['enlace']
+    history.close()
+    print(f"✓ Serie de {link}: {[o.precio for o in series]}")
+
+
+def test_http_cache():
+    """
+    Prueba la caché HTTP: peticiones condicionales, respuestas 304 y expulsión LRU
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Caché HTTP con ETag")
+    print("=" * 70)
+    
+    server, base = start_test_server(PAGINATED_HTML)
+    cache_path = os.path.join(tempfile.mkdtemp(), 'cache.sqlite')
+    try:
+        cache = HTTPCache(cache_path)
+        first_run = DoctorPetScraper(base + '/categoria/', http_cache=cache,
+                                     rate_limiter=RateLimiter(rate=1000, burst=10)).scrape_category()
+        
+        # Segunda ejecución: el servidor debe responder 304 y usamos la caché
+        server.request_log.clear()
+        second_scraper = DoctorPetScraper(base + '/categoria/', http_cache=HTTPCache(cache_path),
+                                          rate_limiter=RateLimiter(rate=1000, burst=10))
+        second_run = second_scraper.scrape_category()
+        assert second_run == first_run
+        assert all('If-None-Match' in headers for _, headers in server.request_log)
+        print(f"✓ {len(server.request_log)} peticiones condicionales, mismos productos")
+        
+        # Async también usa la caché
+        async_scraper = AsyncDoctorPetScraper(base + '/categoria/', http_cache=HTTPCache(cache_path),
+                                              rate_limiter=RateLimiter(rate=1000, burst=10))
+        assert asyncio.run(async_scraper.scrape_category_async()) == first_run
+        
+        # Con un límite de tamaño pequeño solo cabe la última página guardada
+        small_cache = HTTPCache(os.path.join(os.path.dirname(cache_path), 'small.sqlite'),
+                                max_bytes=len(SAMPLE_HTML.encode('utf-8')) + 10)
+        small_cache.store('a', b'x' * 100, 'utf-8', {'ETag': '"a"'})
+        small_cache.store('b', SAMPLE_HTML.encode('utf-8'), 'utf-8', {'ETag': '"b"'})
+        assert small_cache.get('a') is None and small_cache.get('b') is not None
+        # Sin validadores no se guarda nada
+        assert not small_cache.store('c', b'x', 'utf-8', {})
+        print("✓ Expulsión LRU al superar el tamaño máximo")
+        
+        # Desde la línea de comandos
+        assert parse_args([]).http_cache is None
+        assert parse_args(['--http-cache']).http_cache == HTTP_CACHE_PATH
+        options = scraper_options_from_args(parse_args(['--http-cache', cache_path]))
+        assert options['http_cache'].path == cache_path
+        close_scraper_options(options)
+        print("✓ --http-cache activa la caché desde la línea de comandos")
+    finally:
+        server.shutdown()
+
+
+def test_page_cache():
+    """
+    Prueba que un HTML idéntico no se vuelve a parsear
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Caché de Páginas Parseadas")
+    print("=" * 70)
+    
+    cache_path = os.path.join(tempfile.mkdtemp(), 'pages.sqlite')
+    scraper = DoctorPetScraper(page_cache=ParsedPageCache(cache_path, max_entries=2))
+    url = 'https://doctorpet.co/categoria/'
+    html = PAGINATED_HTML['/categoria/']
+    
+    expected = scraper._parse_listing_page(html, url)
+    
+    # Contamos cuántas veces se parsea realmente
+    parse_calls = []
+    original_parse = scraper._parse_html
+    scraper._parse_html = lambda *args: parse_calls.append(args) or original_parse(*args)
+    
+    # Otra instancia (otra "ejecución") con el mismo archivo de caché
+    scraper.page_cache = ParsedPageCache(cache_path, max_entries=2)
+    assert scraper._parse_listing_page(html, url) == expected
+    assert not parse_calls
+    print("✓ HTML idéntico: resultado leído de la caché sin parsear")
+    
+    # Si el HTML cambia, se vuelve a parsear
+    changed = scraper._parse_listing_page(html.replace('45.000', '46.000'), url)
+    assert len(parse_calls) == 1 and changed.products[0]['precio'].startswith('46.000')
+    
+    # Expulsión LRU: max_entries=2
+    scraper._parse_listing_page(SAMPLE_HTML, url)
+    assert len(scraper.page_cache) == 2
+    print("✓ HTML distinto se parsea de nuevo; expulsión LRU al llenarse")
+    
+    # Desde la línea de comandos
+    assert parse_args([]).page_cache is None
+    assert parse_args(['--page-cache']).page_cache == PAGE_CACHE_PATH
+    options = scraper_options_from_args(parse_args(['--page-cache', cache_path]))
+    assert len(options['page_cache']) == 2
+    close_scraper_options(options)
+    print("✓ --page-cache activa la caché desde la línea de comandos")
+
+
+def test_predicted_pagination():
+    """
+    Prueba el modo discovery='predict' (páginas 2..N en paralelo) y sus fallbacks
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Descubrimiento de Páginas por Predicción")
+    print("=" * 70)
+    
+    cases = [
+        ('patrón /page/N/', make_paginated_pages(5)),
+        ('paginación recortada', make_paginated_pages(5, shown_pages=3)),
+        ('patrón desconocido', make_paginated_pages(4, url_pattern='/tienda/p{}/')),
+    ]
+    for description, pages in cases:
+        server, base = start_test_server(pages)
+        try:
+            scraper = DoctorPetScraper(base + '/tienda/', rate_limiter=RateLimiter(rate=1000, burst=10))
+            expected = scraper.scrape_category(discovery='links')
+            server.request_log.clear()
+            predicted = scraper.scrape_category(discovery='predict')
+            assert predicted == expected
+            # Cada página se descarga una sola vez
+            assert sorted(path for path, _ in server.request_log) == sorted(pages)
+            
+            async_scraper = AsyncDoctorPetScraper(base + '/tienda/',
+                                                  rate_limiter=RateLimiter(rate=1000, burst=10))
+            assert asyncio.run(async_scraper.scrape_category_async(discovery='predict')) == expected
+            
+            assert len(scraper.scrape_category(max_pages=2, discovery='predict')) == 6
+            print(f"✓ {description}: {len(expected)} productos, mismo orden")
+        finally:
+            server.shutdown()
+    
+    # Parar a medias no descarga (para tirarlas) las páginas que quedan
+    server, base = start_test_server(make_paginated_pages(30))
+    try:
+        scraper = DoctorPetScraper(base + '/tienda/', rate_limiter=RateLimiter(rate=1000, burst=10))
+        pages_iter = scraper.iter_pages(discovery='predict', workers=2)
+        next(pages_iter), next(pages_iter), next(pages_iter)
+        pages_iter.close()
+        assert len(server.request_log) <= 3 + 2 * PREDICTED_PAGES_PER_WORKER
+        print(f"✓ Parar tras 3 de 30 páginas: {len(server.request_log)} peticiones")
+    finally:
+        server.shutdown()
+
+
+def test_parser_pool():
+    """
+    Prueba el parseo en otros procesos: mismos resultados que en el mismo hilo
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Parseo en Varios Procesos")
+    print("=" * 70)
+    
+    pages = make_paginated_pages(6)
+    server, base = start_test_server({**pages, **PAGINATED_HTML})
+    try:
+        with ParserPool(workers=2, max_pending=2) as pool:
+            for engine in PARSER_ENGINES:
+                for discovery in DISCOVERY_MODES:
+                    scraper = DoctorPetScraper(base + '/tienda/', engine=engine,
+                                               rate_limiter=RateLimiter(rate=1000, burst=10))
+                    expected = scraper.scrape_category(discovery=discovery)
+                    scraper.parser_pool = pool
+                    assert scraper.scrape_category(discovery=discovery) == expected
+            print(f"✓ Mismos productos con ambos motores y modos ({len(expected)} productos)")
+            
+            # Varias categorías a la vez compartiendo los procesos
+            output_dir = tempfile.mkdtemp()
+            crawler = BatchCrawler([base + '/tienda/', base + '/categoria/'], workers=2,
+                                   rate_limiter=RateLimiter(rate=1000, burst=10), parser_pool=pool)
+            assert all(crawler.run(output_dir=output_dir).values())
+            
+            # Reprocesar páginas ya descargadas (bytes), en orden
+            archived = [(base + path, html.encode('utf-8'), 'utf-8') for path, html in pages.items()]
+            parser = DoctorPetScraper(base + '/tienda/')
+            parsed = list(pool.imap(iter(archived)))
+            assert parsed == [parser._parse_listing_page(html.decode('utf-8'), url)
+                              for url, html, _ in archived]
+            assert all(type(p) is Product for page in parsed for p in page.products)
+            print(f"✓ imap: {len(parsed)} páginas reprocesadas en orden")
+        
+        # Sin charset en la respuesta se adivina la codificación, igual que requests
+        response = requests.Response()
+        response._content = ('<p>Alimento húmedo para perros pequeños, sabor salmón y '
+                             'ñame. Envío a Bogotá, Medellín y Cúcuta.</p>' * 5).encode('cp1252')
+        response.encoding = None
+        assert _decode_html(response.content, None) == response.text
+        print("✓ Sin charset: misma decodificación que response.text")
+    finally:
+        server.shutdown()
+
+
+def test_page_archive():
+    """
+    Prueba el archivo de páginas descargadas y el modo replay (sin red)
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Archivo de Páginas y Modo Replay")
+    print("=" * 70)
+    
+    pages = make_paginated_pages(4)
+    path = os.path.join(tempfile.mkdtemp(), 'archivo.warc.gz')
+    server, base = start_test_server(pages)
+    try:
+        with PageArchive(path) as archive:
+            scraper = DoctorPetScraper(base + '/tienda/', archive=archive,
+                                       rate_limiter=RateLimiter(rate=1000, burst=10))
+            expected = scraper.scrape_category()
+            assert len(archive) == len(pages)
+    finally:
+        server.shutdown()
+    
+    # Es un WARC comprimido estándar: un registro por página
+    with gzip.open(path, 'rb') as f:
+        assert f.read().count(b'WARC/1.1\r\nWARC-Type: response') == len(pages)
+    
+    # El servidor ya no existe: todo sale del archivo
+    with PageArchive(path) as replay:
+        for discovery in DISCOVERY_MODES:
+            scraper = DoctorPetScraper(base + '/tienda/', replay=replay)
+            assert scraper.scrape_category(discovery=discovery) == expected
+        async_scraper = AsyncDoctorPetScraper(base + '/tienda/', replay=replay)
+        assert asyncio.run(async_scraper.scrape_category_async()) == expected
+        assert DoctorPetScraper(base + '/no-archivada/', replay=replay).scrape_category() == []
+        print(f"✓ Replay sin red: {len(expected)} productos, iguales a los descargados")
+        
+        # Varias versiones de una URL: la más reciente, o la de una fecha
+        first = replay.get(base + '/tienda/')
+        replay.store(base + '/tienda/', b'<html>nueva</html>', 'utf-8', {'Content-Type': 'text/html'},
+                     fetched_at=datetime(2099, 1, 2, 10, 30))
+        assert replay.get(base + '/tienda/').body == b'<html>nueva</html>'
+        assert replay.get(base + '/tienda/', as_of='2099-01-01').body == first.body
+        assert first.to_response().text == pages['/tienda/']
+        assert [p.url for p in replay.iter_pages(since='2099-01-02')] == [base + '/tienda/']
+    
+    # Sin índice (o con un último bloque a medias) se reconstruye desde el archivo
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(b'WARC/1.1 cortado')[:20])
+    os.remove(path + '.idx.sqlite')
+    with PageArchive(path) as archive:
+        assert len(archive) == len(pages) + 1
+        assert archive.get(base + '/tienda/', as_of='2099-01-01').body == first.body
+    print(f"✓ Índice reconstruido: {len(pages) + 1} páginas")
+
+
+def test_benchmark_suite():
+    """
+    Prueba las piezas del benchmark: páginas sintéticas, servidor y escenarios
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Benchmark con Servidor Local")
+    print("=" * 70)
+    
+    for style in PAGINATION_STYLES:
+        pages = make_category_pages(pages=4, products_per_page=5, sale_ratio=0.5,
+                                    out_of_stock_ratio=0.3, pagination=style)
+        assert make_category_pages(pages=4, products_per_page=5, sale_ratio=0.5,
+                                   out_of_stock_ratio=0.3, pagination=style) == pages
+        html = ''.join(pages.values())
+        with FixtureServer(pages) as server:
+            for name in ('bs4', 'lxml-predict'):
+                result = run_scenario(server.url + '/tienda/', name)
+                assert (result.paginas, result.productos) == (4, 20)
+                assert result.p99_ms >= result.p50_ms > 0
+            products = DoctorPetScraper(server.url + '/tienda/', engine='lxml',
+                                        rate_limiter=RateLimiter(rate=1000, burst=10)).scrape_category()
+        assert sum(p['precio_anterior'] != 'N/A' for p in products) == html.count('<del>')
+        assert sum(p['disponibilidad'] == 'Agotado' for p in products) == html.count('out-of-stock')
+        print(f"✓ Paginación '{style}': {len(products)} productos extraídos")
+    
+    # Latencia y errores simulados
+    with FixtureServer(pages, latency=0.02, error_rate=1.0) as server:
+        start = time.perf_counter()
+        response = requests.get(server.url + '/tienda/')
+        assert response.status_code == 503 and time.perf_counter() - start >= 0.02
+        assert (server.requests, server.errors) == (1, 1)
+    
+    # Detección de regresiones frente a una ejecución anterior
+    baseline = [result._replace(productos_s=result.productos_s * 2)._asdict()]
+    assert compare_with_baseline([result], baseline) and not compare_with_baseline([result], [])
+    print("✓ Latencia, errores y comparación con baseline")
+
+
+def test_metrics():
+    """
+    Prueba las métricas: contadores, tiempos por etapa, exportación y callback
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Métricas por Etapa")
+    print("=" * 70)
+    
+    pages = make_category_pages(pages=3, products_per_page=4, sale_ratio=0.5,
+                                out_of_stock_ratio=0.3, pagination='pretty')
+    received = []
+    metrics = Metrics(callback=lambda name, labels, value: received.append(name))
+    with FixtureServer(pages) as server, tempfile.TemporaryDirectory() as tmp:
+        scraper = DoctorPetScraper(server.url + '/tienda/', engine='lxml', metrics=metrics,
+                                   rate_limiter=RateLimiter(rate=1000, burst=10))
+        scraper.save_products(scraper.iter_products(), os.path.join(tmp, 'productos.csv'))
+        
+        assert metrics.counter('requests_total', category='tienda', status='200') == 3
+        assert metrics.counter('pages_total', category='tienda') == 3
+        assert metrics.counter('products_total', category='tienda') == 12
+        assert metrics.counter('bytes_total', category='tienda') == sum(
+            len(html.encode('utf-8')) for html in pages.values())
+        totals = metrics.stage_totals(category='tienda')
+        assert set(totals) == set(STAGES) - {'dns'}
+        assert metrics.histogram('stage_seconds', category='tienda', stage='ttfb').count == 3
+        assert 'requests_total' in received and 'stage_seconds' in received
+        print(f"✓ Etapas medidas: {', '.join(totals)}")
+        
+        # Exportación: Prometheus (texto) y JSON
+        prom_path = os.path.join(tmp, 'metricas.prom')
+        json_path = os.path.join(tmp, 'metricas.json')
+        metrics.dump(prom_path)
+        metrics.dump(json_path)
+        with open(prom_path, encoding='utf-8') as f:
+            prom = f.read()
+        assert '# TYPE doctorpet_stage_seconds histogram' in prom
+        assert 'doctorpet_requests_total{category="tienda",status="200"} 3' in prom
+        assert 'doctorpet_stage_seconds_count{category="tienda",stage="parse"} 3' in prom
+        with open(json_path, encoding='utf-8') as f:
+            data = json.load(f)
+        assert {c['name'] for c in data['counters']} >= {'doctorpet_requests_total',
+                                                          'doctorpet_bytes_total'}
+        print("✓ Exportación a Prometheus y JSON")
+        
+        # Modo asíncrono: mismas métricas con aiohttp
+        async_metrics = Metrics()
+        async_scraper = AsyncDoctorPetScraper(server.url + '/tienda/', metrics=async_metrics,
+                                              rate_limiter=RateLimiter(rate=1000, burst=10))
+        assert len(asyncio.run(async_scraper.scrape_category_async())) == 12
+        assert async_metrics.counter('requests_total', category='tienda', status='200') == 3
+        assert {'connect', 'ttfb', 'download'} <= set(async_metrics.stage_totals())
+    print("✓ Métricas también en modo asíncrono")
+
+
+def test_job_queue():
+    """
+    Prueba la cola compartida: alquileres, renovación, caducidad, muertos y varios procesos
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Cola de Trabajo Compartida")
+    print("=" * 70)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cola.sqlite')
+        with JobQueue(path, lease_seconds=0.3, max_attempts=2, retry_delay=0) as queue:
+            assert queue.enqueue(['u1', 'u2'], 'cat') == 2 and queue.enqueue(['u1'], 'cat') == 0
+            [a], [b] = queue.lease('a'), queue.lease('b')
+            assert (a.url, b.url, a.intentos) == ('u1', 'u2', 1) and queue.lease('c') == []
+            assert queue.renew(a, 'a') and not queue.renew(a, 'b')
+            
+            # 'b' muere: su alquiler caduca y 'c' retoma u2; 'a' lo mantiene renovándolo
+            with LeaseKeeper(queue, a, 'a') as keeper:
+                time.sleep(0.4)
+                [c] = queue.lease('c')
+            assert not keeper.lost and (c.url, c.intentos) == ('u2', 2)
+            assert not queue.complete(b, 'b', [{'nombre': 'duplicado'}])
+            assert queue.complete(a, 'a', [{'nombre': 'x'}], new_urls=['u1', 'u3'])
+            print("✓ Alquiler exclusivo, renovación y retomar páginas de un worker caído")
+            
+            # Fallos: se reintenta hasta max_attempts y luego va a los muertos
+            [u3] = queue.lease('a')
+            assert queue.fail(u3, 'a', 'timeout') == PENDING
+            assert queue.fail(c, 'c', '404') == DEAD
+            assert queue.fail(c, 'c', '404') is None  # ya no es suyo
+            stats = queue.stats()
+            assert (stats['hecho'], stats['pendiente'], stats['muerto'], stats['productos']) == (1, 1, 1, 1)
+            assert queue.dead_letters() == [{'url': 'u2', 'categoria': 'cat', 'intentos': 2, 'error': '404'}]
+            assert queue.retry_dead() == 1 and queue.stats()['muerto'] == 0
+            
+            # Un error que no se arregla reintentando va directo a los muertos
+            [u2] = queue.lease('a')
+            assert u2.intentos == 1 and queue.fail(u2, 'a', '410', retryable=False) == DEAD
+            print("✓ Reintentos y cola de muertos (dead-letter)")
+        
+        # El límite de velocidad es el total de todas las conexiones a la cola
+        with JobQueue(path) as first, JobQueue(path) as second:
+            limiters = [SharedRateLimiter(first, rate=10, burst=1),
+                        SharedRateLimiter(second, rate=10, burst=1)]
+            waits = [limiters[i % 2]._reserve() for i in range(3)]
+            assert waits[0] == 0 and all(abs(wait - expected) < 0.05
+                                         for wait, expected in zip(waits[1:], [0.1, 0.2]))
+        print("✓ Límite de velocidad compartido entre workers")
+    
+    # Solo un 404/410 va directo a los muertos; un 403 puede ser temporal
+    server, base = start_test_server({'/prohibido/': (403, {}), '/borrado/': (410, {})})
+    try:
+        with tempfile.TemporaryDirectory() as tmp, \
+                JobQueue(os.path.join(tmp, 'cola.sqlite'), max_attempts=2, retry_delay=0) as queue:
+            queue.enqueue([base + '/prohibido/'], base + '/prohibido/')
+            queue.enqueue([base + '/borrado/'], base + '/borrado/')
+            run_worker(queue, 'w', rate_limiter=RateLimiter(rate=1000, burst=10))
+            attempts = {urlparse(dead['url']).path: dead['intentos'] for dead in queue.dead_letters()}
+        assert attempts == {'/prohibido/': 2, '/borrado/': 1}
+        assert sorted(path for path, _ in server.request_log) == ['/borrado/', '/prohibido/', '/prohibido/']
+    finally:
+        server.shutdown()
+    print("✓ 403: gasta sus intentos; 410: directo a los muertos")
+    
+    # Varios procesos contra la misma cola; uno de los alquileres es de un worker "caído"
+    pages = make_category_pages(pages=12, products_per_page=3)
+    with FixtureServer(pages, latency=0.2) as server, tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cola.sqlite')
+        options = ['--db', path, '--lease', '0.6', '--intentos', '2', '--espera', '0']
+        jobqueue_main(options + ['encolar', server.url + '/tienda/', server.url + '/roto/'])
+        with JobQueue(path, lease_seconds=0.6) as queue:
+            assert queue.lease('caido')[0].url == server.url + '/tienda/'
+        
+        command = [sys.executable, 'jobqueue.py'] + options + ['trabajar', '--rate', '1000']
+        workers = [subprocess.Popen(command + ['--id', f'w{i}'], stderr=subprocess.DEVNULL,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)))
+                   for i in range(3)]
+        assert [worker.wait(timeout=60) for worker in workers] == [0, 0, 0]
+        
+        with JobQueue(path) as queue:
+            stats = queue.stats()
+            assert (stats['hecho'], stats['muerto'], stats['productos']) == (12, 1, 36)
+            [dead] = queue.dead_letters()
+            assert (dead['url'], dead['intentos']) == (server.url + '/roto/', 1)
+            with sqlite3.connect(path) as conn:
+                owners = {row[0] for row in conn.execute(
+                    "SELECT trabajador FROM trabajos WHERE estado = 'hecho'")}
+        # Cada página se descargó UNA vez (la rota es un 404: un solo intento)
+        assert server.requests == 13 and len(owners) >= 2
+        
+        # La exportación lee los productos por lotes, en el orden de la cola
+        batch_size, jobqueue.EXPORT_BATCH_SIZE = jobqueue.EXPORT_BATCH_SIZE, 5
+        try:
+            with JobQueue(path) as queue:
+                links = [product['enlace'] for product in queue.iter_products()]
+        finally:
+            jobqueue.EXPORT_BATCH_SIZE = batch_size
+        assert len(links) == len(set(links)) == 36
+        
+        filename = os.path.join(tmp, 'productos.csv')
+        jobqueue_main(['--db', path, 'exportar', filename])
+        with open(filename, encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 36 and len({row['enlace'] for row in rows}) == 36
+        assert {row['categoria'] for row in rows} == {'tienda'}
+    print(f"✓ 3 procesos: 12 páginas sin duplicados ni pérdidas ({len(owners)} workers)")
+
+
+def test_batch_crawler():
+    """
+    Prueba el scraping de varias categorías con sesión y límite compartidos
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Scraping por Lotes de Varias Categorías")
+    print("=" * 70)
+    
+    server, base = start_test_server({**PAGINATED_HTML, **make_paginated_pages(3)})
+    output_dir = tempfile.mkdtemp()
+    try:
+        urls = [base + '/categoria/', base + '/tienda/', base + '/no-existe/']
+        crawler = BatchCrawler(urls, workers=3, rate_limiter=RateLimiter(rate=1000, burst=10))
+        
+        # Un CSV por categoría; la categoría que no existe no genera archivo
+        results = crawler.run(output_dir=output_dir)
+        assert os.path.basename(results[urls[0]]).startswith('doctorpet_categoria_')
+        assert os.path.basename(results[urls[1]]).startswith('doctorpet_tienda_')
+        assert results[urls[2]] == ""
+        print(f"✓ Un CSV por categoría: {len([f for f in results.values() if f])} archivos")
+        
+        # Un único CSV con la columna 'categoria'
+        results = crawler.run(output_dir=output_dir, combined=True)
+        with open(results[urls[0]], encoding='utf-8-sig') as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 6 + 9
+        assert {row['categoria'] for row in rows} == {'categoria', 'tienda'}
+        print(f"✓ CSV combinado: {len(rows)} productos")
+    finally:
+        server.shutdown()
+
+
+def test_checkpoint_resume():
+    """
+    Prueba que un scraping interrumpido se reanuda sin perder ni repetir productos
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Checkpoint y Reanudación")
+    print("=" * 70)
+    
+    pages = make_paginated_pages(5)
+    server, base = start_test_server(pages)
+    output_dir = tempfile.mkdtemp()
+    try:
+        for discovery in ('links', 'predict'):
+            checkpoint_file = os.path.join(output_dir, f'{discovery}.checkpoint.json')
+            filename = os.path.join(output_dir, f'{discovery}.csv')
+            scraper = DoctorPetScraper(base + '/tienda/', rate_limiter=RateLimiter(rate=1000, burst=10))
+            
+            # Chain of Thought: Simulamos una caída quitando la página 4 del servidor
+            missing_page = pages.pop('/tienda/page/4/')
+            checkpoint = CrawlCheckpoint(checkpoint_file)
+            scraper.save_to_csv(scraper.iter_products(discovery=discovery, checkpoint=checkpoint),
+                                filename, checkpoint=checkpoint)
+            assert not checkpoint.state['finished']
+            
+            # Al reanudar solo se descarga lo que faltaba
+            pages['/tienda/page/4/'] = missing_page
+            server.request_log.clear()
+            checkpoint = CrawlCheckpoint(checkpoint_file, resume=True)
+            scraper.save_to_csv(scraper.iter_products(discovery=discovery, checkpoint=checkpoint),
+                                filename, append=True, checkpoint=checkpoint)
+            assert checkpoint.state['finished']
+            assert '/tienda/' not in [path for path, _ in server.request_log]
+            
+            with open(filename, encoding='utf-8-sig') as f:
+                rows = list(csv.DictReader(f))
+            links = [row['enlace'] for row in rows]
+            assert len(links) == len(set(links)) == 15
+            
+            # Un checkpoint terminado no vuelve a descargar nada
+            checkpoint = CrawlCheckpoint(checkpoint_file, resume=True)
+            assert list(scraper.iter_products(discovery=discovery, checkpoint=checkpoint)) == []
+            print(f"✓ discovery={discovery}: {len(rows)} productos, sin duplicados")
+        
+        # Un Parquet no se puede ampliar: --resume se rechaza al leer las opciones
+        try:
+            parse_args(['--resume', '--format', 'parquet'])
+            assert False, "--resume con parquet debería rechazarse"
+        except SystemExit:
+            pass
+        print("✓ --resume se rechaza con formatos que no se pueden ampliar")
+    finally:
+        server.shutdown()
+
+
+def test_async_scraping():
+    """
+    Prueba que el modo asíncrono produce los mismos productos que el parseo normal
+    """
+    print("\n" + "=" * 70)
+    print("TEST: Scraping Asíncrono")
+    print("=" * 70)
+    
+    server, base = start_test_server(PAGINATED_HTML)
+    try:
+        scraper = AsyncDoctorPetScraper(base + '/categoria/',
+                                        rate_limiter=RateLimiter(rate=1000, burst=10))
+        products = asyncio.run(scraper.scrape_category_async())
+        
+        # Resultado esperado: los productos de ambas páginas, en orden
+        expected = []
+        for path, html in PAGINATED_HTML.items():
+            expected.extend(scraper._parse_listing_page(html, base + path).products)
+        
+        print(f"✓ Productos obtenidos en modo asíncrono: {len(products)}")
+        assert len(products) == 6
+        assert products == expected
+        
+        results = asyncio.run(scraper.scrape_categories_async(
+            [base + '/categoria/', base + '/categoria/page/2/']
+        ))
+        assert len(results[base + '/categoria/']) == 6
+        assert len(results[base + '/categoria/page/2/']) == 3
+        print("✓ Varias categorías en paralelo")
+    finally:
+        server.shutdown()
+
+
 def main():
     """
     Ejecuta todos los tests
@@ -173,6 +1702,34 @@ def main():
     else:
         print("\n✗ No se pudieron extraer productos del HTML de prueba")
         print("Revisa la lógica de extracción en scraper.py")
+    
+    # Tests de los modos de scraping
+    test_lxml_engine()
+    test_product_record()
+    test_partial_parse()
+    test_rate_limiter()
+    test_retry_policy()
+    test_concurrency_controller()
+    test_product_details()
+    test_store_api()
+    test_sitemap_discovery()
+    test_sync_scraping()
+    test_streaming_csv()
+    test_output_sinks()
+    test_price_normalization()
+    test_change_detection()
+    test_price_history()
+    test_http_cache()
+    test_page_cache()
+    test_predicted_pagination()
+    test_batch_crawler()
+    test_job_queue()
+    test_parser_pool()
+    test_page_archive()
+    test_benchmark_suite()
+    test_metrics()
+    test_checkpoint_resume()
+    test_async_scraping()
 
 
 if __name__ == "__main__":